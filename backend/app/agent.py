@@ -1,6 +1,7 @@
 import os
 import sys
-import re
+import asyncio
+import copy
 from dotenv import load_dotenv
 
 # --- 1. LOAD ENVIRONMENT VARIABLES FIRST ---
@@ -13,21 +14,38 @@ print(f"🔌 Loading environment from: {env_path}")
 load_dotenv(env_path)
 
 # --- 2. IMPORTS ---
-from langchain_groq import ChatGroq
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_config
+from pydantic import ValidationError
 
+from app import config
+from app import context
 from app.state import AgentState
-from app.tools.rag import retrieve_similar_projects
-from app.tools.pricing import calculate_project_price
-from app.tools.pdf_gen import create_pdf
-from app.tools.emailer import send_proposal_email
-
-# Initialize Brain
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.3
+from app.llm_gateway import get_gateway
+from app.prefetch import KnowledgePrefetcher
+from app.tools.rag import aretrieve_similar_projects, get_runtime
+from app.tools.pricing import RateCardError, calculate_project_price, get_store
+from app.tools.schemas import TOOL_SCHEMAS, LookupProjects, CalculatePrice, GenerateProposal
+from app.proposals import enqueue_proposal
+
+# Initialize Brain (through the shared gateway: pooled connections, rate limits, retries)
+llm = get_gateway().chat_model("llama-3.3-70b-versatile", temperature=0.3)
+
+# Cheap model that folds old turns into the rolling conversation summary
+summary_llm = get_gateway().chat_model(config.CONTEXT_SUMMARY_MODEL, temperature=0)
+
+# Starts a knowledge-base lookup on every user message while the model is still thinking;
+# a lookup_projects call that asks for roughly the same thing is then answered from it.
+# The lambdas resolve the module globals per call, so scripts can swap the retrieval.
+prefetcher = KnowledgePrefetcher(
+    retrieve=lambda query: aretrieve_similar_projects(query),
+    embed=lambda query: get_runtime().aembed_query(query),
+    min_similarity=config.KB_PREFETCH_MIN_SIMILARITY,
+    max_query_chars=config.KB_PREFETCH_MAX_QUERY_CHARS,
+    enabled=config.KB_PREFETCH_ENABLED,
 )
 
 # --- SYSTEM PROMPT (STRICTER) ---
@@ -41,194 +59,210 @@ You have the capability to read files. If the user uploads a PDF, the system wil
 
 YOUR PROCESS (FOLLOW STRICTLY):
 1. GATHER INFO: Ask about features, user traffic, and platform (Web/Mobile).
-2. RESEARCH: If asked about past work/pricing policies, use [LOOKUP: query].
+2. RESEARCH: If asked about past work/pricing policies, call lookup_projects.
 3. ESTIMATE: Once you understand the scope, estimate hours (e.g., Simple=50h, Mid=100h, Complex=300h) and resource level.
-4. CALCULATE: Use the tool [CALCULATE: hours, level] to get the exact price.
+4. CALCULATE: Call calculate_price with the hours and level to get the exact price.
 5. PROPOSE: Present the calculated price to the user.
-6. CLOSE: ONLY IF the user accepts the price AND provides an email, use [GENERATE_PROPOSAL].
+6. CLOSE: ONLY IF the user accepts the price AND provides an email, call generate_proposal.
 
 RULES:
-- DO NOT use [CALCULATE] until you have asked about features.
-- DO NOT use [GENERATE_PROPOSAL] if you haven't successfully calculated a price yet.
+- DO NOT call calculate_price until you have asked about features.
+- DO NOT call generate_proposal if you haven't successfully calculated a price yet.
 - If a tool fails, tell the user you are having trouble and ask for details again.
 """
 
+# Short reminder after the history; the tool specs themselves travel with the request
+INSTRUCTIONS = """
+TOOLS: use the tool-calling interface (lookup_projects, calculate_price, generate_proposal), never write tool names in your reply.
+- When you need several things at once (e.g. two lookups and a price), call all of them in the same turn.
+- A tool result starting with "Error:" means the call failed.
+"""
+
+# OpenAI-format specs, converted once (the chat model is looked up per call so scripts can swap it)
+TOOL_SPECS = [convert_to_openai_tool(schema) for schema in TOOL_SCHEMAS.values()]
+_priced_specs = (None, TOOL_SPECS)
+
+def tool_specs() -> list:
+    """TOOL_SPECS with calculate_price's levels taken from the current rate card (rebuilt when it reloads)."""
+    global _priced_specs
+    try:
+        card = get_store().get()
+    except RateCardError:
+        return TOOL_SPECS
+    if _priced_specs[0] is not card:
+        specs = copy.deepcopy(TOOL_SPECS)
+        for spec in specs:
+            if spec["function"]["name"] == "calculate_price":
+                spec["function"]["parameters"]["properties"]["level"]["enum"] = card.levels
+        _priced_specs = (card, specs)
+    return _priced_specs[1]
+
+# --- PROGRESS EVENTS (picked up by /chat/stream) ---
+async def report_progress(stage: str, message: str):
+    """Emits a tool-progress event; a no-op when the node runs outside a graph."""
+    try:
+        await adispatch_custom_event("progress", {"stage": stage, "message": message})
+    except RuntimeError:
+        pass
+
+def current_thread():
+    """Thread id of the running graph call (None outside a graph or without one)."""
+    try:
+        return get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        return None
+
 # --- NODE 1: REASONING ---
-def chatbot_node(state: AgentState):
-    messages = state['messages']
-    
-    if not messages or not isinstance(messages[0], SystemMessage):
-        messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
-
-    instructions = """
-    TOOLS AVAILABLE:
-    - [LOOKUP: search_term] -> Search past projects.
-    - [CALCULATE: hours, level] -> e.g., [CALCULATE: 50, junior] or [CALCULATE: 100, senior].
-    - [GENERATE_PROPOSAL] -> Generate PDF and email it.
-    """
-    
-    response = llm.invoke(messages + [SystemMessage(content=instructions)])
-    
-    next_step = "wait_for_user"
-    content = response.content
-    
-    if "[LOOKUP:" in content:
-        next_step = "run_rag"
-    elif "[CALCULATE:" in content:
-        next_step = "run_pricing"
-    elif "[GENERATE_PROPOSAL]" in content:
-        next_step = "draft_proposal"
-        
+async def chatbot_node(state: AgentState):
+    thread = current_thread()
+    if isinstance(state["messages"][-1], HumanMessage):
+        prefetcher.start(thread, str(state["messages"][-1].content))
+
+    # Keep the prompt under the token budget: system prompt + pinned facts + rolling
+    # summary + recent turns, instead of the whole ever-growing history
+    try:
+        memory = await context.fold_history(
+            state, summary_llm, SYSTEM_PROMPT, INSTRUCTIONS,
+            budget=config.CONTEXT_TOKEN_BUDGET, recent_turns=config.CONTEXT_RECENT_TURNS,
+        )
+        prompt = context.build_prompt(
+            {**state, **memory}, SYSTEM_PROMPT, INSTRUCTIONS,
+            budget=config.CONTEXT_TOKEN_BUDGET, max_message_tokens=config.CONTEXT_MAX_MESSAGE_TOKENS,
+        )
+        # Only a conversation's opening message goes through the response cache: its prompt
+        # is just the system prompt and that message, with no price, tool result or summary
+        opening = len(state["messages"]) == 1 and not state.get("project_price")
+        response = await llm.bind_tools(tool_specs(), response_cache=opening).ainvoke(prompt)
+    except BaseException:
+        prefetcher.discard(thread)
+        raise
+    # The prefetch lives until a response stops asking for lookups
+    if not any(call["name"] == "lookup_projects" for call in response.tool_calls):
+        prefetcher.discard(thread)
+
     return {
         "messages": [response],
-        "next_step": next_step
+        "next_step": "run_tools" if response.tool_calls else "wait_for_user",
+        "proposal_job_id": "",   # only set for the turn that queued a proposal
+        **memory
     }
 
-# --- NODE 2: ACTION (ROBUST PARSING) ---
-def tool_node(state: AgentState):
-    last_message = state['messages'][-1].content
-    
-    if "run_rag" in state['next_step']:
-        try:
-            query = last_message.split("[LOOKUP:")[1].split("]")[0].strip()
-            data = retrieve_similar_projects(query)
-            return {
-                "messages": [AIMessage(content=f"RAG RESULT: {data}")], 
-                "rag_context": data,
-                "next_step": "chatbot"
-            }
-        except Exception as e:
-             return {"messages": [AIMessage(content=f"System Error in RAG: {e}")], "next_step": "chatbot"}
+# --- TOOLS (one coroutine per tool; each returns the result text and state updates) ---
+async def lookup_projects(args: LookupProjects, state: AgentState):
+    await report_progress("lookup", f"Searching knowledge base for '{args.query}'...")
+    data = await prefetcher.claim(current_thread(), args.query, args.filters())
+    if data is None:
+        data = await aretrieve_similar_projects(args.query, args.filters())
+    return str(data), {"rag_content": str(data)}
 
-    elif "run_pricing" in state['next_step']:
-        try:
-            # ROBUST PARSING: Extract numbers using Regex
-            params_text = last_message.split("[CALCULATE:")[1].split("]")[0]
-            
-            # Find the first number in the string (hours)
-            import re
-            hours_match = re.search(r'\d+', params_text)
-            hours = int(hours_match.group()) if hours_match else 50 # Default to 50 if parsing fails
-            
-            # Find level
-            level = "mid"
-            if "senior" in params_text.lower(): level = "senior"
-            elif "junior" in params_text.lower(): level = "junior"
-            elif "expert" in params_text.lower(): level = "expert"
-
-            price = calculate_project_price(hours, level)
-            
-            result_msg = f"REQUIREMENT: Calculated Cost: ₹{price:,} (for {hours} hours @ {level} level)."
-            return {
-                "messages": [AIMessage(content=result_msg)],
-                "project_price": price,
-                "next_step": "chatbot"
-            }
-        except Exception as e:
-            return {"messages": [AIMessage(content=f"Error calculating price. Please ensure you provided hours and level. Details: {e}")], "next_step": "chatbot"}
-
-    return {"next_step": "chatbot"}
-
-# --- NODE 3: DRAFTING ---
-# ... (Imports remain the same) ...
-
-# --- NODE 3: DRAFTING (Updated) ---
-def proposal_node(state: AgentState):
-    # Fallbacks
-    price = state.get("project_price", 0) # Default to integer 0
-    reqs = "Client Project"
-    if len(state['messages']) > 2:
-        reqs = state['messages'][-2].content
-
-    # Extract email
-    recipient = "sanjuhoskal@gmail.com" 
-    for m in reversed(state['messages']):
-        if "@" in m.content and "ProCode" not in m.content:
-            email_match = re.search(r'[\w\.-]+@[\w\.-]+', m.content)
-            if email_match:
-                recipient = email_match.group(0)
-            break
-
-    # --- HTML TEMPLATE WITH LOGO AND FOOTER ---
-    # Note: price:, formats number with commas (e.g. 40,000)
-    prompt = f"""
-    Write a clean HTML proposal.
-    - Requirements Summary: {reqs}
-    - Total Price: INR {price:,}
-    - Notes: {state.get('rag_context', 'Standard terms apply.')}
-    
-    REQUIRED HTML STRUCTURE (Do strictly):
-    
-    <div class="header-container">
-        <div class="company-name">ProCode Bot</div>
-        <img src="file:///D:/ML%20Projects/Procode_Prod_Projects/procode_bot/backend/knowledge_base/procode_image.png" class="logo" alt="Company Logo">
-    </div>
-
-    <h1>Project Proposal</h1>
-    <p>Dear Customer,</p>
-    
-    [...Insert specific project details, timeline, and scope here based on requirements...]
-
-    <h2>Commercials</h2>
-    <div class="price-box">
-        Total Estimated Cost: ₹{price:,}
-    </div>
-
-    <div class="footer">
-        <b>ProCodeHub Pvt Ltd</b><br>
-        123 Kalikaparameshwari complex,Durgigudi,Shivamogga, Karnataka - 577201<br>
-        Contact: +91 98765 43210 | Email:procodehub@gmail.com
-    </div>
+async def calculate_price(args: CalculatePrice, state: AgentState):
+    await report_progress("pricing", "Calculating price...")
+    # Same matching as the legacy pricer ("Senior Developer" -> senior, unclear -> the card's default)
+    level = get_store().get().resolve_level(args.level)
+    price = calculate_project_price(args.hours, level)
+    return f"Calculated Cost: ₹{price:,} (for {args.hours} hours @ {level} level).", {"project_price": price}
+
+async def generate_proposal(args: GenerateProposal, state: AgentState):
+    price = state.get("project_price") or 0
+    if not price:
+        raise ValueError("no price has been calculated yet; call calculate_price first")
+
+    # Draft, render and email run in the background job queue (see app/proposals.py),
+    # so the chat request returns right away with a job id the client can poll
+    await report_progress("proposal", "Queuing your proposal...")
+    job_id = await asyncio.to_thread(
+        enqueue_proposal, price, context.client_requirements(state) or "Client Project", args.email,
+        state.get("rag_content") or "Standard terms apply.",
+    )
+    return f"Proposal job {job_id} queued for ₹{price:,}, to be emailed to {args.email}.", {
+        "proposal_job_id": job_id,
+        "messages": [AIMessage(content=f"Your proposal for ₹{price:,} is being prepared and will be emailed to "
+                                       f"{args.email} in a moment. (Job ID: {job_id})")],
+    }
+
+TOOL_RUNNERS = {"lookup_projects": lookup_projects, "calculate_price": calculate_price,
+                "generate_proposal": generate_proposal}
+
+async def run_tool(call: dict, state: AgentState):
+    """Validates the call against its schema and runs it; failures become an error result for the model."""
+    try:
+        schema = TOOL_SCHEMAS.get(call["name"])
+        if schema is None:
+            raise ValueError(f"unknown tool '{call['name']}'")
+        content, updates = await TOOL_RUNNERS[call["name"]](schema.model_validate(call["args"]), state)
+        status = "success"
+    except ValidationError as e:
+        print(f"Tool {call['name']} got invalid arguments: {call['args']}")
+        problems = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'arguments'}: {err['msg']}" for err in e.errors())
+        content, updates, status = f"Error: invalid arguments ({problems})", {}, "error"
+    except Exception as e:
+        print(f"Tool {call['name']} failed: {e}")
+        content, updates, status = f"Error: {e}", {}, "error"
+    return ToolMessage(content=content, tool_call_id=call["id"], name=call["name"], status=status), updates
+
+# --- NODE 2: ACTION ---
+async def tool_node(state: AgentState):
     """
-    
-    # Run LLM
-    html_response = llm.invoke([HumanMessage(content=prompt)])
-    html_content = html_response.content
-    
-    # Strip Markdown if present
-    if "```html" in html_content:
-        html_content = html_content.split("```html")[1].split("```")[0]
-
-    # Generate PDF
-    pdf_path = create_pdf(html_content)
-    
-    # Send Email
-    email_status = send_proposal_email(pdf_path, recipient)
-    
-    final_msg = f"Proposal generated for ₹{price:,} and sent to {recipient}!"
-    
+    Runs every tool call of the last response at once and returns all results together,
+    so the model sees them in a single follow-up call. generate_proposal runs after the
+    others because it needs the price they may calculate; once it has queued a job the
+    turn ends with the confirmation instead of another LLM call.
+    """
+    calls = state["messages"][-1].tool_calls
+    first = [call for call in calls if call["name"] != "generate_proposal"]
+    last = [call for call in calls if call["name"] == "generate_proposal"][:1]
+
+    results = list(await asyncio.gather(*(run_tool(call, state) for call in first)))
+    updates = {}
+    for _, result in results:
+        updates.update(result)
+    # Two lookups in one turn both stay available to the proposal
+    lookups = [r.content for r, _ in results if r.name == "lookup_projects" and r.status == "success"]
+    if len(lookups) > 1:
+        updates["rag_content"] = "\n\n".join(lookups)
+    if last:
+        results.append(await run_tool(last[0], {**state, **updates}))
+        updates.update(results[-1][1])
+    # Any further generate_proposal calls still need a result for their call id
+    for call in [call for call in calls if call["name"] == "generate_proposal"][1:]:
+        results.append((ToolMessage(content="Error: only one proposal per turn", tool_call_id=call["id"],
+                                    name=call["name"], status="error"), {}))
+
+    closing = updates.pop("messages", [])
     return {
-        "messages": [AIMessage(content=final_msg)],
-        "pdf_path": pdf_path,
-        "next_step": "end"
+        **updates,
+        "messages": [message for message, _ in results] + closing,
+        "next_step": "end" if closing else "chatbot",
     }
 
 # --- GRAPH SETUP ---
 def route_step(state: AgentState):
-    step = state.get("next_step")
-    if step in ["run_rag", "run_pricing"]: return "tools"
-    elif step == "draft_proposal": return "proposal"
-    return END
+    return "tools" if state.get("next_step") == "run_tools" else END
+
+def route_after_tools(state: AgentState):
+    return END if state.get("next_step") == "end" else "chatbot"
 
 workflow = StateGraph(AgentState)
 workflow.add_node("chatbot", chatbot_node)
 workflow.add_node("tools", tool_node)
-workflow.add_node("proposal", proposal_node)
 
 workflow.set_entry_point("chatbot")
-workflow.add_conditional_edges("chatbot", route_step, {"tools": "tools", "proposal": "proposal", END: END})
-workflow.add_edge("tools", "chatbot")
-workflow.add_edge("proposal", END)
+workflow.add_conditional_edges("chatbot", route_step, {"tools": "tools", END: END})
+workflow.add_conditional_edges("tools", route_after_tools, {"chatbot": "chatbot", END: END})
 
 app = workflow.compile()
 
-if __name__ == "__main__":
-    print("🤖 ProCode Bot is online! (Type 'quit' to exit)")
+async def _chat_loop():
+    # One event loop for the whole session so the async clients stay usable
     while True:
         try:
-            user_input = input("You: ")
+            user_input = await asyncio.to_thread(input, "You: ")
             if user_input.lower() in ["quit", "exit"]: break
-            result = app.invoke({"messages": [HumanMessage(content=user_input)]})
+            result = await app.ainvoke({"messages": [HumanMessage(content=user_input)]})
             print(f"Bot: {result['messages'][-1].content}\n")
         except Exception as e:
-            print(f"Error: {e}")
\ No newline at end of file
+            print(f"Error: {e}")
+
+if __name__ == "__main__":
+    print("🤖 ProCode Bot is online! (Type 'quit' to exit)")
+    asyncio.run(_chat_loop())
@@ -0,0 +1,355 @@
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from app import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id  TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id     TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id     TEXT,
+    type          TEXT,
+    checkpoint    BLOB,
+    metadata_type TEXT,
+    metadata      BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id     TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id       TEXT NOT NULL,
+    idx           INTEGER NOT NULL,
+    channel       TEXT NOT NULL,
+    type          TEXT,
+    value         BLOB,
+    task_path     TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer backed by a SQLite file in WAL mode.
+
+    Several uvicorn workers on one host can share the file: every OS thread gets its
+    own connection, writers take the lock up front (BEGIN IMMEDIATE) and wait up to
+    `busy_timeout` for each other, and WAL lets readers run alongside the writer.
+
+    Conversation threads expire `ttl` seconds after their last turn (expired threads
+    read as new ones). `compact()` deletes expired threads, evicts the least recently
+    active ones above `max_threads`, and keeps only the newest `keep_per_thread`
+    checkpoints of each thread; run it periodically with `run_compaction()`.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_threads: int = 50_000,
+                 keep_per_thread: int = 2, busy_timeout: float = 10.0, clock=time.time, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.last_compaction = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        # auto_vacuum only takes effect on a fresh file, before the first table exists
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.executescript(SCHEMA)
+
+    # --- Connections ---
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _write(self, statements):
+        """Runs (sql, params) pairs in one IMMEDIATE transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass   # owned by another thread; closed when that thread exits
+            self._connections.clear()
+        self._local = threading.local()
+
+    # --- Reads ---
+    def _is_expired(self, conn: sqlite3.Connection, thread_id: str) -> bool:
+        row = conn.execute("SELECT updated_at FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row is not None and bool(self.ttl) and row[0] < self._clock() - self.ttl
+
+    def _to_tuple(self, conn, thread_id, checkpoint_ns, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        writes = conn.execute(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[5]))
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v, _, _ in writes],
+            parent_config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+            }} if parent_id else None,
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        conn = self._conn()
+        if self._is_expired(conn, thread_id):
+            return None
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        else:
+            row = conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+        return self._to_tuple(conn, thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[dict] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                where.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        conn = self._conn()
+        returned = 0
+        for thread_id, checkpoint_ns, *row in conn.execute(query, params).fetchall():
+            item = self._to_tuple(conn, thread_id, checkpoint_ns, row)
+            if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield item
+            returned += 1
+            if limit is not None and returned >= limit:
+                break
+
+    # --- Writes ---
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._write([
+            ("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+             (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+              type_, blob, metadata_type, metadata_blob)),
+            ("INSERT INTO threads VALUES (?, ?) ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+             (thread_id, self._clock())),
+        ])
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        statements = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            # Special writes (errors, interrupts) replace; regular ones are written once
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            type_, blob = self.serde.dumps_typed(value)
+            statements.append((
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, blob, task_path),
+            ))
+        if statements:
+            self._write(statements)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._write([
+            (f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for table in ("writes", "checkpoints", "threads")
+        ])
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: zero-padded counter + random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Async API (SQLite calls run in worker threads) ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # --- Maintenance ---
+    def compact(self) -> dict:
+        """Deletes expired/over-cap threads and old checkpoints, then returns freed pages to the OS."""
+        start = time.perf_counter()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS doomed (thread_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM doomed")
+            if self.ttl:
+                conn.execute("INSERT OR IGNORE INTO doomed SELECT thread_id FROM threads WHERE updated_at < ?",
+                             (self._clock() - self.ttl,))
+            expired = conn.execute("SELECT COUNT(*) FROM doomed").fetchone()[0]
+            if self.max_threads:
+                conn.execute(
+                    "INSERT OR IGNORE INTO doomed SELECT thread_id FROM threads "
+                    "ORDER BY updated_at DESC LIMIT -1 OFFSET ?", (self.max_threads,))
+            evicted = conn.execute("SELECT COUNT(*) FROM doomed").fetchone()[0] - expired
+            for table in ("writes", "checkpoints", "threads"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id IN (SELECT thread_id FROM doomed)")
+
+            pruned = conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                " SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ("
+                "  PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn FROM checkpoints)"
+                " WHERE rn > ?)", (self.keep_per_thread,)).rowcount
+            conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id"
+                " AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self.last_compaction = {
+            "expired_threads": expired,
+            "evicted_threads": evicted,
+            "pruned_checkpoints": pruned,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "at": self._clock(),
+        }
+        return self.last_compaction
+
+    async def run_compaction(self, interval: float):
+        """Background loop for the server lifespan; each worker may run one (compaction is idempotent)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await asyncio.to_thread(self.compact)
+                if result["expired_threads"] or result["evicted_threads"] or result["pruned_checkpoints"]:
+                    print(f"Checkpointer: compaction {result}")
+            except sqlite3.Error as e:
+                print(f"Checkpointer: compaction failed: {e}")
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        threads, checkpoints = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM threads), (SELECT COUNT(*) FROM checkpoints)").fetchone()
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {
+            "backend": "sqlite",
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "db_bytes": size,
+            "max_threads": self.max_threads,
+            "ttl": self.ttl,
+            "last_compaction": self.last_compaction,
+        }
+
+
+def build_checkpointer():
+    """Checkpointer selected by CHECKPOINT_BACKEND: "sqlite" (default, durable) or "memory"."""
+    backend = config.CHECKPOINT_BACKEND.lower()
+    if backend == "memory":
+        return MemorySaver()
+    if backend != "sqlite":
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND '{config.CHECKPOINT_BACKEND}' (expected sqlite or memory)")
+    return SqliteCheckpointer(
+        config.CHECKPOINT_DB_PATH,
+        ttl=config.CHECKPOINT_TTL,
+        max_threads=config.CHECKPOINT_MAX_THREADS,
+        keep_per_thread=config.CHECKPOINT_KEEP_PER_THREAD,
+    )
@@ -0,0 +1,132 @@
+import os
+from dotenv import load_dotenv
+
+# Load .env from the project root (safe to call more than once)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(os.path.dirname(BASE_DIR), ".env"))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# --- RAG: query embedding cache ---
+EMBEDDING_CACHE_ENABLED = env_bool("EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_SIZE = env_int("EMBEDDING_CACHE_SIZE", 1024)          # max cached queries
+EMBEDDING_CACHE_TTL = env_float("EMBEDDING_CACHE_TTL", 3600.0)        # seconds
+
+# --- RAG: semantic result cache ---
+RESULT_CACHE_ENABLED = env_bool("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_THRESHOLD = env_float("RESULT_CACHE_THRESHOLD", 0.95)    # min cosine similarity for a hit
+RESULT_CACHE_SIZE = env_int("RESULT_CACHE_SIZE", 256)
+RESULT_CACHE_TTL = env_float("RESULT_CACHE_TTL", 900.0)               # seconds
+# How often (seconds) to re-read the collection version written by scripts/ingest.py
+RESULT_CACHE_VERSION_CHECK_INTERVAL = env_float("RESULT_CACHE_VERSION_CHECK_INTERVAL", 5.0)
+
+# --- RAG: speculative lookup on each user message (app/prefetch.py) ---
+KB_PREFETCH_ENABLED = env_bool("KB_PREFETCH_ENABLED", True)
+KB_PREFETCH_MIN_SIMILARITY = env_float("KB_PREFETCH_MIN_SIMILARITY", 0.75)  # lookup query vs user message
+KB_PREFETCH_MAX_QUERY_CHARS = env_int("KB_PREFETCH_MAX_QUERY_CHARS", 500)   # of the message, used as search text
+
+# --- Conversation context (prompt token budget) ---
+CONTEXT_TOKEN_BUDGET = env_int("CONTEXT_TOKEN_BUDGET", 6000)          # 0 = send the full history
+CONTEXT_RECENT_TURNS = env_int("CONTEXT_RECENT_TURNS", 4)             # turns always kept verbatim
+CONTEXT_MAX_MESSAGE_TOKENS = env_int("CONTEXT_MAX_MESSAGE_TOKENS", 1500)  # cap for older long messages
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+# --- Conversation checkpointer ---
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")       # sqlite | memory (single process only)
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(BASE_DIR, "data", "checkpoints.sqlite"))
+CHECKPOINT_TTL = env_float("CHECKPOINT_TTL", 7 * 24 * 3600.0)        # seconds since a thread's last turn; 0 = never
+CHECKPOINT_MAX_THREADS = env_int("CHECKPOINT_MAX_THREADS", 50_000)   # least recently active evicted beyond this
+CHECKPOINT_KEEP_PER_THREAD = env_int("CHECKPOINT_KEEP_PER_THREAD", 2)  # newest checkpoints kept by compaction
+CHECKPOINT_COMPACT_INTERVAL = env_float("CHECKPOINT_COMPACT_INTERVAL", 300.0)  # seconds
+
+# --- Chat attachments (POST /attachments) ---
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(BASE_DIR, "data", "uploads"))
+UPLOAD_MAX_BYTES = env_int("UPLOAD_MAX_BYTES", 20 * 1024 * 1024)
+UPLOAD_TTL = env_float("UPLOAD_TTL", 24 * 3600.0)                    # seconds an attachment stays referenceable
+UPLOAD_ALLOWED_TYPES = ("application/pdf", "image/png", "image/jpeg", "image/jpg")
+
+# --- Attachment PDF text extraction ---
+PDF_TEXT_MAX_CHARS = env_int("PDF_TEXT_MAX_CHARS", 10_000)            # stop once this much text is collected
+PDF_TEXT_MAX_PAGES = env_int("PDF_TEXT_MAX_PAGES", 50)                # never read more pages than this
+PDF_TEXT_MIN_PAGE_CHARS = env_int("PDF_TEXT_MIN_PAGE_CHARS", 30)      # below this a page counts as an image
+PDF_TEXT_TIMEOUT = env_float("PDF_TEXT_TIMEOUT", 20.0)                # seconds per document
+PDF_TEXT_WORKERS = env_int("PDF_TEXT_WORKERS", 2)
+
+# --- Vision (image attachments) ---
+VISION_MODEL = os.getenv("VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+VISION_MAX_SIDE = env_int("VISION_MAX_SIDE", 1280)                    # px, longer side after downscaling
+VISION_JPEG_QUALITY = env_int("VISION_JPEG_QUALITY", 85)
+VISION_CACHE_ENABLED = env_bool("VISION_CACHE_ENABLED", True)
+VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", os.path.join(BASE_DIR, "data", "vision_cache.sqlite"))
+VISION_CACHE_MAX_ENTRIES = env_int("VISION_CACHE_MAX_ENTRIES", 2000)
+
+# --- LLM gateway (app/llm_gateway.py) ---
+LLM_BASE_URL = os.getenv("GROQ_BASE_URL") or None                     # e.g. a local fake OpenAI-compatible server
+LLM_DEFAULT_CONCURRENCY = env_int("LLM_DEFAULT_CONCURRENCY", 8)       # in-flight requests per model
+LLM_DEFAULT_TPM = env_int("LLM_DEFAULT_TPM", 0)                       # tokens per minute per model; 0 = unlimited
+# Per-model overrides: "model=concurrency:tpm,..." (match your Groq plan's limits)
+LLM_MODEL_LIMITS = os.getenv("LLM_MODEL_LIMITS", "")
+LLM_MAX_RETRIES = env_int("LLM_MAX_RETRIES", 4)
+LLM_BACKOFF_BASE = env_float("LLM_BACKOFF_BASE", 0.5)                 # seconds
+LLM_BACKOFF_MAX = env_float("LLM_BACKOFF_MAX", 20.0)
+LLM_REQUEST_TIMEOUT = env_float("LLM_REQUEST_TIMEOUT", 60.0)
+LLM_COMPLETION_TOKENS_ESTIMATE = env_int("LLM_COMPLETION_TOKENS_ESTIMATE", 512)  # budgeted when max_tokens is unset
+# Response cache for calls that opt in (opening chat turns, vision, proposal drafts); off by default
+LLM_CACHE_ENABLED = env_bool("LLM_CACHE_ENABLED", False)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "data", "llm_cache.sqlite"))
+LLM_CACHE_MAX_ENTRIES = env_int("LLM_CACHE_MAX_ENTRIES", 5000)         # least recently used evicted beyond this
+LLM_CACHE_TTL = env_float("LLM_CACHE_TTL", 24 * 3600.0)               # seconds since the response was stored
+
+# --- Pricing (app/tools/pricing.py, POST /quote/batch) ---
+RATE_CARD_PATH = os.getenv("RATE_CARD_PATH", os.path.join(BASE_DIR, "app", "rate_card.json"))
+RATE_CARD_CHECK_INTERVAL = env_float("RATE_CARD_CHECK_INTERVAL", 2.0)  # seconds between file change checks
+QUOTE_BATCH_MAX_ITEMS = env_int("QUOTE_BATCH_MAX_ITEMS", 20_000)      # line items per /quote/batch request
+
+# --- Background jobs (proposal draft -> render -> email) ---
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "data", "jobs.sqlite"))
+JOBS_WORKERS = env_int("JOBS_WORKERS", 2)                             # concurrent jobs per server process
+JOBS_MAX_ATTEMPTS = env_int("JOBS_MAX_ATTEMPTS", 4)                   # per stage
+JOBS_RETRY_BASE = env_float("JOBS_RETRY_BASE", 2.0)                   # seconds, doubles per attempt
+JOBS_LEASE = env_float("JOBS_LEASE", 180.0)                           # seconds before a dead worker's job is picked up again
+JOBS_POLL_INTERVAL = env_float("JOBS_POLL_INTERVAL", 0.5)
+PROPOSAL_MAX_TOKENS = env_int("PROPOSAL_MAX_TOKENS", 900)           # cap on the drafted JSON sections
+
+# --- Proposal PDF rendering (app/pdf_renderer.py) ---
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR", os.path.join(BASE_DIR, "generated_proposals"))
+PDF_RENDER_WORKERS = env_int("PDF_RENDER_WORKERS", 2)                 # warm WeasyPrint processes
+PDF_RENDER_TIMEOUT = env_float("PDF_RENDER_TIMEOUT", 60.0)            # seconds per document before the worker is killed
+PDF_RENDER_MAX_RSS_MB = env_int("PDF_RENDER_MAX_RSS_MB", 512)         # recycle a worker once it grows past this; 0 = off
+PDF_RENDER_MAX_JOBS = env_int("PDF_RENDER_MAX_JOBS", 200)             # recycle a worker after this many renders; 0 = off
+
+# --- Generated proposals (GET /proposals/{id} and retention) ---
+PROPOSAL_MAX_AGE = env_float("PROPOSAL_MAX_AGE", 30 * 24 * 3600.0)    # seconds a PDF is kept; 0 = forever
+PROPOSAL_MAX_TOTAL_MB = env_int("PROPOSAL_MAX_TOTAL_MB", 500)         # oldest deleted beyond this; 0 = no cap
+PROPOSAL_MIN_AGE = env_float("PROPOSAL_MIN_AGE", 3600.0)              # never deleted younger (emails may still be pending)
+PROPOSAL_GC_INTERVAL = env_float("PROPOSAL_GC_INTERVAL", 3600.0)      # seconds between retention passes
+PROPOSAL_CACHE_MAX_AGE = env_int("PROPOSAL_CACHE_MAX_AGE", 86400)     # Cache-Control max-age for downloads
+
+# --- Email outbox (app/outbox.py) ---
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", os.path.join(BASE_DIR, "data", "outbox.sqlite"))
+OUTBOX_BATCH_SIZE = env_int("OUTBOX_BATCH_SIZE", 20)                 # emails claimed per dispatcher pass
+OUTBOX_CONCURRENCY = env_int("OUTBOX_CONCURRENCY", 4)                # API calls in flight
+OUTBOX_MAX_ATTEMPTS = env_int("OUTBOX_MAX_ATTEMPTS", 8)
+OUTBOX_RETRY_BASE = env_float("OUTBOX_RETRY_BASE", 5.0)              # seconds, doubles per attempt
+OUTBOX_RETRY_MAX = env_float("OUTBOX_RETRY_MAX", 600.0)
+OUTBOX_LEASE = env_float("OUTBOX_LEASE", 120.0)                      # seconds before an unfinished send is claimable again
+OUTBOX_POLL_INTERVAL = env_float("OUTBOX_POLL_INTERVAL", 2.0)
@@ -0,0 +1,184 @@
+import re
+import json
+from typing import List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Rough token estimate (~4 characters per token for English text). Good enough
+# for budgeting; we never need the exact count the provider will bill.
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """You maintain the running summary of a sales conversation between a client and ProCode Bot.
+Update the summary below with the new messages. Keep every concrete fact: requested features,
+platform, expected traffic, attached document highlights, hour estimates, resource levels,
+quoted prices, decisions and contact details. Drop greetings and repetition.
+Answer with the updated summary only, at most 250 words.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{messages}
+"""
+
+EMAIL_PATTERN = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(m.content) + _tool_calls_text(m)) + 4 for m in messages)
+
+
+def _tool_calls_text(message: BaseMessage) -> str:
+    calls = getattr(message, "tool_calls", None) or []
+    return " ".join(f"{call['name']}({json.dumps(call['args'])})" for call in calls)
+
+
+def recent_window_start(messages: List[BaseMessage], recent_turns: int) -> int:
+    """Index where the last `recent_turns` turns begin (a turn starts at a user message)."""
+    seen = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            seen += 1
+            if seen == recent_turns:
+                return i
+    return 0
+
+
+def client_requirements(state: dict) -> str:
+    """The project requirements: the attached project document, else the client's opening message."""
+    if state.get("user_requirements"):
+        return state["user_requirements"]
+    messages = [m for m in state.get("messages", []) if isinstance(m, HumanMessage)]
+    if not messages:
+        return ""
+    attached = [m for m in messages if "<ATTACHED_PROJECT_DOCUMENT>" in str(m.content)]
+    return str((attached[-1] if attached else messages[0]).content)
+
+
+def pinned_facts(state: dict) -> str:
+    """Facts that must survive summarisation verbatim: price, email, core requirements."""
+    messages = [m for m in state.get("messages", []) if isinstance(m, HumanMessage)]
+    facts = []
+
+    price = state.get("project_price")
+    if price:
+        facts.append(f"- Calculated price: ₹{price:,}")
+
+    email = state.get("user_email")
+    if not email:
+        for m in reversed(messages):
+            match = EMAIL_PATTERN.search(str(m.content))
+            if match:
+                email = match.group(0)
+                break
+    if email:
+        facts.append(f"- Client email: {email}")
+
+    requirements = client_requirements(state)
+    if requirements:
+        facts.append(f"- Requirements (excerpt): {truncate(requirements, 1500)}")
+
+    return "PINNED FACTS:\n" + "\n".join(facts) if facts else ""
+
+
+def truncate(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars] + " …[truncated]"
+
+
+def _frame(system_prompt: str, state: dict) -> List[BaseMessage]:
+    frame = [SystemMessage(content=system_prompt)]
+    memory = "\n\n".join(part for part in (
+        pinned_facts(state),
+        f"CONVERSATION SUMMARY (older turns):\n{state['conversation_summary']}"
+        if state.get("conversation_summary") else "",
+    ) if part)
+    if memory:
+        frame.append(SystemMessage(content=memory))
+    return frame
+
+
+def build_prompt(state: dict, system_prompt: str, instructions: str,
+                 budget: int, max_message_tokens: int) -> List[BaseMessage]:
+    """
+    Assembles the LLM prompt under `budget` tokens.
+
+    Layout: system prompt, pinned facts + rolling summary, the not-yet-summarised
+    history, then the tool instructions. If that is still over budget, long older
+    messages are truncated first and then the oldest are dropped; the latest user
+    message is always kept. A budget of 0 disables all of this (full history).
+    """
+    history = [m for m in state.get("messages", []) if not isinstance(m, SystemMessage)]
+    tail = [SystemMessage(content=instructions)]
+    if not budget:
+        return [SystemMessage(content=system_prompt)] + history + tail
+
+    frame = _frame(system_prompt, state)
+    history = history[state.get("summarized_upto", 0):]
+    available = budget - message_tokens(frame) - message_tokens(tail)
+
+    if message_tokens(history) > available:
+        # Older messages (not the latest turn) lose their bulk first, e.g. document dumps
+        keep_from = recent_window_start(history, 1)
+        max_chars = max_message_tokens * CHARS_PER_TOKEN
+        history = [
+            m if i >= keep_from or len(str(m.content)) <= max_chars
+            else m.model_copy(update={"content": truncate(str(m.content), max_chars)})
+            for i, m in enumerate(history)
+        ]
+        while len(history) > 1 and message_tokens(history) > available and keep_from > 0:
+            history.pop(0)
+            keep_from -= 1
+            # A tool result can't open the history without the call that asked for it
+            while keep_from > 0 and isinstance(history[0], ToolMessage):
+                history.pop(0)
+                keep_from -= 1
+
+    return frame + history + tail
+
+
+def _transcript_line(message: BaseMessage) -> str:
+    if isinstance(message, HumanMessage):
+        speaker = "Client"
+    elif isinstance(message, ToolMessage):
+        speaker = f"Tool {message.name}"
+    else:
+        speaker = "ProCode Bot"
+    text = " ".join(part for part in (str(message.content), _tool_calls_text(message)) if part)
+    return f"{speaker}: {truncate(text, 2000)}"
+
+
+async def fold_history(state: dict, llm, system_prompt: str, instructions: str,
+                       budget: int, recent_turns: int) -> dict:
+    """
+    Folds turns older than the last `recent_turns` into the rolling summary, but only
+    once the prompt would exceed `budget`. Incremental: only messages not folded yet
+    are sent, together with the previous summary. Returns state updates (or {}).
+    """
+    if not budget:
+        return {}
+    messages = [m for m in state.get("messages", []) if not isinstance(m, SystemMessage)]
+    done = state.get("summarized_upto", 0)
+    start = recent_window_start(messages, recent_turns)
+    if start <= done:
+        return {}
+
+    frame = _frame(system_prompt, state)
+    total = message_tokens(frame) + message_tokens(messages[done:]) + estimate_tokens(instructions)
+    if total <= budget:
+        return {}
+
+    transcript = "\n".join(_transcript_line(m) for m in messages[done:start])
+    prompt = SUMMARY_PROMPT.format(summary=state.get("conversation_summary") or "(none yet)", messages=transcript)
+    try:
+        # Tagged "internal" so /chat/stream doesn't forward the summary tokens to the client
+        response = await llm.ainvoke([HumanMessage(content=prompt)], config={"tags": ["internal"]})
+    except Exception as e:
+        # Keep answering; build_prompt still enforces the budget by truncating
+        print(f"Context: summary update failed: {e}")
+        return {}
+    return {"conversation_summary": response.content.strip(), "summarized_upto": start}
@@ -0,0 +1,345 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app import config
+from app.metrics import LatencyRecorder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    status       TEXT NOT NULL,            -- queued | running | succeeded | failed
+    stage        TEXT,                     -- next stage to run (kept across retries and restarts)
+    payload      TEXT NOT NULL,
+    result       TEXT NOT NULL DEFAULT '{}',
+    error        TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after    REAL NOT NULL,
+    locked_by    TEXT,
+    locked_until REAL,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+# A stage gets (payload, results so far) and returns new result fields
+Stage = Callable[[dict, dict], Awaitable[dict]]
+
+
+class JobStageError(Exception):
+    """Raised by a stage; retryable=False fails the job immediately (e.g. bad configuration)."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class JobQueue:
+    """
+    Persistent job queue in a SQLite file (WAL), safe to share between uvicorn workers.
+
+    Jobs are claimed with a lease that the worker renews while it runs them: a worker
+    that dies mid-job (crash, restart) stops renewing it, and once `lease` seconds pass
+    the job is claimable again, resuming at the stage it was on. Reclaiming an expired
+    lease counts as a failed attempt, so a stage that keeps killing its worker runs out
+    of attempts. Updates made with a lease another worker has since taken match no rows
+    and return 0. Completed stage results are stored on the job, so a retry never
+    repeats a stage that already succeeded.
+    """
+
+    def __init__(self, path: str, lease: float = 120.0, clock=time.time):
+        self.path = path
+        self.lease = lease
+        self._clock = clock
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"])
+        return job
+
+    def enqueue(self, kind: str, payload: dict, first_stage: str, max_attempts: int = 3,
+                job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        now = self._clock()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, stage, payload, max_attempts, run_after, created_at) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, first_stage, json.dumps(payload), max_attempts, now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self, worker_id: str, kinds: List[str]) -> Optional[dict]:
+        """Atomically takes the oldest runnable job (or one whose lease expired, as another attempt)."""
+        now = self._clock()
+        marks = ",".join("?" for _ in kinds)
+        row = self._conn().execute(
+            f"UPDATE jobs SET status = 'running', locked_by = ?, locked_until = ?, "
+            f" attempts = attempts + (status = 'running'), started_at = COALESCE(started_at, ?) "
+            f"WHERE id = (SELECT id FROM jobs WHERE kind IN ({marks}) AND ("
+            f"  (status = 'queued' AND run_after <= ?) OR (status = 'running' AND locked_until < ?)) "
+            f" ORDER BY run_after LIMIT 1) "
+            f"RETURNING *",
+            (worker_id, now + self.lease, now, *kinds, now, now),
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def renew(self, job_id: str, worker_id: str) -> int:
+        """Extends the lease of a running job; 0 when this worker no longer holds it."""
+        return self._conn().execute(
+            "UPDATE jobs SET locked_until = ? WHERE id = ? AND locked_by = ? AND status = 'running'",
+            (self._clock() + self.lease, job_id, worker_id)).rowcount
+
+    def advance(self, job_id: str, worker_id: str, next_stage: Optional[str], result: dict) -> int:
+        """Records a finished stage: stores its results and moves on (or completes the job)."""
+        now = self._clock()
+        if next_stage is None:
+            return self._conn().execute(
+                "UPDATE jobs SET status = 'succeeded', stage = NULL, result = ?, error = NULL, finished_at = ?, "
+                "locked_by = NULL, locked_until = NULL WHERE id = ? AND locked_by = ?",
+                (json.dumps(result), now, job_id, worker_id)).rowcount
+        # Renew the lease for the next stage; each stage starts with a fresh attempt budget
+        return self._conn().execute(
+            "UPDATE jobs SET stage = ?, result = ?, attempts = 0, locked_until = ? WHERE id = ? AND locked_by = ?",
+            (next_stage, json.dumps(result), now + self.lease, job_id, worker_id)).rowcount
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float]) -> int:
+        """Either schedules another attempt of the current stage or marks the job failed."""
+        now = self._clock()
+        if retry_in is None:
+            return self._conn().execute(
+                "UPDATE jobs SET status = 'failed', error = ?, attempts = attempts + 1, finished_at = ?, "
+                "locked_by = NULL, locked_until = NULL WHERE id = ? AND locked_by = ?",
+                (error, now, job_id, worker_id)).rowcount
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'queued', error = ?, attempts = attempts + 1, run_after = ?, "
+            "locked_by = NULL, locked_until = NULL WHERE id = ? AND locked_by = ?",
+            (error, now + retry_in, job_id, worker_id)).rowcount
+
+    def stats(self, window: float = 300.0) -> dict:
+        now = self._clock()
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        finished, oldest = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM jobs WHERE status = 'succeeded' AND finished_at >= ?),"
+            "       (SELECT MIN(created_at) FROM jobs WHERE status = 'queued')", (now - window,)).fetchone()
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "succeeded": counts.get("succeeded", 0),
+            "failed": counts.get("failed", 0),
+            "backlog": counts.get("queued", 0) + counts.get("running", 0),
+            "oldest_queued_age_s": round(now - oldest, 1) if oldest else 0.0,
+            "throughput_per_min": round(finished / (window / 60.0), 2),
+        }
+
+
+class JobWorkerPool:
+    """
+    `concurrency` asyncio workers that claim jobs and run their stages in order.
+
+    `pipelines` maps a job kind to its [(stage name, coroutine function)] list. A stage
+    failure is retried with jittered exponential backoff up to the job's max_attempts.
+    The lease is renewed every third of its length while a stage runs; if it is lost
+    anyway (e.g. the database was unreachable for a whole lease) the stage is cancelled
+    and the job left to the worker that took it over.
+    """
+
+    def __init__(self, queue: JobQueue, pipelines: Dict[str, List[Tuple[str, Stage]]], concurrency: int = 2,
+                 poll_interval: float = 0.5, retry_base: float = 2.0, retry_max: float = 60.0):
+        self.queue = queue
+        self.pipelines = pipelines
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.worker_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks = []
+        self._wakeup = None
+        self.stage_latency = {}
+        self.queue_wait = LatencyRecorder()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.leases_lost = 0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"{self.worker_prefix}-{i}")) for i in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wakes idle workers right away instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, worker_id: str):
+        kinds = list(self.pipelines)
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, worker_id, kinds)
+            except sqlite3.Error as e:
+                print(f"Jobs: claim failed: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(worker_id, job)
+            except Exception as e:
+                # The job's lease runs out and another attempt picks it up; this worker keeps going
+                print(f"Jobs: worker {worker_id} failed running {job['kind']} {job['id']}: {e!r}")
+
+    async def _heartbeat(self, job_id: str, worker_id: str, stage_task: asyncio.Future) -> bool:
+        """Renews the job's lease until cancelled; cancels the stage and returns True if it was lost."""
+        while True:
+            await asyncio.sleep(self.queue.lease / 3)
+            try:
+                renewed = await asyncio.to_thread(self.queue.renew, job_id, worker_id)
+            except sqlite3.Error as e:
+                print(f"Jobs: lease renewal for {job_id} failed: {e}")
+                continue
+            if not renewed:
+                stage_task.cancel()
+                return True
+
+    def _lost_lease(self, job: dict, name: str):
+        self.leases_lost += 1
+        print(f"Jobs: {job['kind']} {job['id']} stage '{name}' lost its lease to another worker, stopping")
+
+    async def _run(self, worker_id: str, job: dict):
+        stages = self.pipelines.get(job["kind"], [])
+        names = [name for name, _ in stages]
+        if job["stage"] not in names:
+            # e.g. a stage renamed by a deploy: no attempt will ever succeed, don't let it come back
+            self.failed += 1
+            print(f"Jobs: {job['kind']} {job['id']} has unknown stage '{job['stage']}', giving up")
+            await asyncio.to_thread(self.queue.fail, job["id"], worker_id,
+                                    f"unknown stage '{job['stage']}' for kind '{job['kind']}'", None)
+            return
+        if job["attempts"] >= job["max_attempts"]:
+            # Every attempt so far lost its worker mid-stage (OOM, killed process)
+            self.failed += 1
+            print(f"Jobs: {job['kind']} {job['id']} stage '{job['stage']}' lost its worker "
+                  f"{job['attempts']} times, giving up")
+            await asyncio.to_thread(self.queue.fail, job["id"], worker_id,
+                                    f"{job['stage']}: worker lost {job['attempts']} times", None)
+            return
+        if job["attempts"] == 0 and job["stage"] == names[0]:
+            self.queue_wait.record((time.time() - job["created_at"]) * 1000)
+        result = job["result"]
+        for index in range(names.index(job["stage"]), len(stages)):
+            name, stage = stages[index]
+            start = time.perf_counter()
+            stage_task = asyncio.ensure_future(stage(job["payload"], result))
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"], worker_id, stage_task))
+            try:
+                result = {**result, **(await stage_task or {})}
+            except asyncio.CancelledError:
+                if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                    self._lost_lease(job, name)
+                    return
+                raise
+            except Exception as e:
+                retryable = getattr(e, "retryable", True)
+                attempts = job["attempts"] + 1
+                retry_in = None
+                if retryable and attempts < job["max_attempts"]:
+                    retry_in = random.uniform(0.5, 1.0) * min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+                    self.retried += 1
+                else:
+                    self.failed += 1
+                print(f"Jobs: {job['kind']} {job['id']} stage '{name}' failed (attempt {attempts}): {e}"
+                      + (f", retrying in {retry_in:.1f}s" if retry_in is not None else ", giving up"))
+                if not await asyncio.to_thread(self.queue.fail, job["id"], worker_id, f"{name}: {e}", retry_in):
+                    self._lost_lease(job, name)
+                return
+            finally:
+                heartbeat.cancel()
+            self.stage_latency.setdefault(name, LatencyRecorder()).record((time.perf_counter() - start) * 1000)
+            next_stage = names[index + 1] if index + 1 < len(names) else None
+            if not await asyncio.to_thread(self.queue.advance, job["id"], worker_id, next_stage, result):
+                self._lost_lease(job, name)
+                return
+            job["attempts"] = 0
+        self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.queue.stats(),
+            "workers": len(self._tasks),
+            "completed_here": self.completed,
+            "failed_here": self.failed,
+            "retried_here": self.retried,
+            "leases_lost_here": self.leases_lost,
+            "queue_wait": self.queue_wait.summary(),
+            "stage_latency": {name: rec.summary() for name, rec in self.stage_latency.items()},
+        }
+
+
+_queue = None
+_pool = None
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(config.JOBS_DB_PATH, lease=config.JOBS_LEASE)
+    return _queue
+
+
+def start_workers(pipelines: Dict[str, List[Tuple[str, Stage]]]) -> JobWorkerPool:
+    """Starts this process's worker pool (call from inside the running event loop)."""
+    global _pool
+    _pool = JobWorkerPool(get_queue(), pipelines, concurrency=config.JOBS_WORKERS,
+                          poll_interval=config.JOBS_POLL_INTERVAL, retry_base=config.JOBS_RETRY_BASE)
+    _pool.start()
+    return _pool
+
+
+def get_pool() -> Optional[JobWorkerPool]:
+    return _pool
+
+
+def notify():
+    if _pool is not None:
+        _pool.notify()
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import Counter
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+
+def _canonical_content(content):
+    # Whitespace differences don't change the answer; everything else does
+    if isinstance(content, str):
+        return re.sub(r"\s+", " ", content).strip()
+    return content
+
+
+def canonical_messages(messages: List[BaseMessage]) -> list:
+    """The parts of each message the model sees, without ids or response metadata."""
+    canonical = []
+    for m in messages:
+        item = {"type": m.type, "content": _canonical_content(m.content)}
+        if getattr(m, "tool_calls", None):
+            item["tool_calls"] = [[call["name"], call["args"], call.get("id")] for call in m.tool_calls]
+        if getattr(m, "tool_call_id", None):
+            item["tool_call_id"] = m.tool_call_id
+        if m.name:
+            item["name"] = m.name
+        canonical.append(item)
+    return canonical
+
+
+def cache_key(model_name: str, temperature, messages: List[BaseMessage], params: dict) -> str:
+    """sha256 over model, temperature, request parameters (tools, response format...) and messages."""
+    blob = json.dumps(
+        {"model": model_name, "temperature": temperature, "params": params,
+         "messages": canonical_messages(messages)},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Chat model responses in SQLite (WAL), shared by every process on the host.
+
+    Entries expire `ttl` seconds after they were written; beyond `max_entries` the
+    least recently used are evicted. Only the reply's content and tool calls are
+    stored, so a hit is replayed as a fresh AIMessage. Thread-safe.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 86400.0, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str, model: str) -> Optional[AIMessage]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] + self.ttl <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses[model] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits[model] += 1
+        data = json.loads(row[0])
+        return AIMessage(content=data["content"], tool_calls=data.get("tool_calls", []),
+                         response_metadata={"cached": True})
+
+    def put(self, key: str, model: str, message: BaseMessage):
+        response = json.dumps({
+            "content": message.content,
+            "tool_calls": [{"name": c["name"], "args": c["args"], "id": c.get("id")}
+                           for c in getattr(message, "tool_calls", None) or []],
+        }, ensure_ascii=False)
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                               (key, model, response, now, now))
+            self.expired += self._conn.execute(
+                "DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)).rowcount
+            self.evictions += self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+
+    def discard(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hits": hits,
+                "misses": misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "by_model": {
+                    model: {"hits": self.hits[model], "misses": self.misses[model],
+                            "hit_rate": round(self.hits[model] / (self.hits[model] + self.misses[model]), 4)}
+                    for model in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
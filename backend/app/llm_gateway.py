@@ -0,0 +1,545 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import email.utils
+from collections import deque
+from typing import Any, AsyncIterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolCallChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_groq import ChatGroq
+
+from app import config
+from app.llm_cache import LLMResponseCache, cache_key
+from app.metrics import LatencyRecorder
+
+CHARS_PER_TOKEN = 4
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def parse_model_limits(spec: str) -> dict:
+    """'model=concurrency:tpm,other=2:6000' -> {model: (concurrency, tpm)}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.rpartition("=")
+        concurrency, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(concurrency or 0), int(tpm or 0))
+    return limits
+
+
+def estimate_request_tokens(messages: List[BaseMessage], max_tokens: Optional[int], completion_estimate: int) -> int:
+    prompt_chars = 0
+    for m in messages:
+        if isinstance(m.content, str):
+            prompt_chars += len(m.content)
+        else:
+            # Multimodal parts: count the text, not the base64 image payload
+            prompt_chars += sum(len(p.get("text", "")) for p in m.content if isinstance(p, dict))
+    return prompt_chars // CHARS_PER_TOKEN + (max_tokens or completion_estimate)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads Retry-After (seconds or HTTP date) from an API error's response, if present."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Connection resets / timeouts from the SDK or httpx
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError") or isinstance(error, httpx.TransportError)
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget refilled continuously; `reserve` takes a request's tokens
+    when they fit, or says how long until they do. Thread-safe, so async and sync
+    callers can share one bucket.
+    """
+
+    def __init__(self, tokens_per_minute: int, clock=time.monotonic):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._mutex = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float) -> float:
+        """Takes `tokens` and returns 0 if they fit now, else returns the wait and takes nothing."""
+        with self._mutex:
+            self._refill()
+            tokens = min(tokens, self.capacity)   # an oversized request waits for a full bucket, not forever
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def adjust(self, tokens: float):
+        """Positive gives tokens back (over-estimate), negative charges more (under-estimate)."""
+        with self._mutex:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class SharedSlots:
+    """
+    Concurrency slots shared by async and sync callers. Waiters queue in arrival
+    order and a freed slot is handed straight to the next one, whichever kind it is,
+    so the cap holds across both. Async waiters don't tie up executor threads.
+    """
+
+    def __init__(self, slots: int):
+        self._free = slots
+        self._waiters = deque()    # threading.Event for sync waiters, Future for async ones
+        self._mutex = threading.Lock()
+
+    async def acquire(self):
+        with self._mutex:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._mutex:
+                try:
+                    self._waiters.remove(future)
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            if handed_over:
+                # release() already gave us the slot; pass it on
+                self.release()
+            raise
+
+    def acquire_sync(self):
+        with self._mutex:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    def release(self):
+        with self._mutex:
+            if not self._waiters:
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            waiter.get_loop().call_soon_threadsafe(self._hand_over, waiter)
+
+    @staticmethod
+    def _hand_over(future: asyncio.Future):
+        # A cancelled waiter releases the slot itself in acquire()
+        if not future.done():
+            future.set_result(None)
+
+
+class ModelLane:
+    """
+    Per-model concurrency slot pool, TPM bucket, pooled HTTP clients and stats.
+
+    Async callers take slots with `acquire`; sync callers (scripts, the CLI loop, code
+    in worker threads) with `acquire_sync`. Both draw from the same `concurrency`
+    slots and share the TPM bucket and any Retry-After pause.
+    """
+
+    def __init__(self, model_name: str, concurrency: int, tokens_per_minute: int, timeout: float):
+        self.model_name = model_name
+        self.concurrency = max(1, concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.timeout = timeout
+        self.bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0     # set from Retry-After so every caller backs off together
+        self._loop = None
+        self._slots = SharedSlots(self.concurrency)
+        self._sync_bucket_lock = threading.Lock()
+        # One connection pool per model, shared by every chat model created for it
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self.async_client = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self.sync_client = httpx.Client(timeout=timeout, limits=limits)
+        self.queue_wait = LatencyRecorder()
+        self.latency = LatencyRecorder()
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.tokens_used = 0
+
+    def _bind_loop(self):
+        # The lock belongs to one event loop (scripts may call asyncio.run twice)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._bucket_lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> float:
+        """Waits for a concurrency slot, any Retry-After pause and TPM budget; returns the wait in ms."""
+        self._bind_loop()
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+            try:
+                while (pause := self.blocked_until - time.monotonic()) > 0:
+                    await asyncio.sleep(pause)
+                if self.bucket is not None:
+                    async with self._bucket_lock:
+                        while (wait := self.bucket.reserve(tokens)) > 0:
+                            await asyncio.sleep(wait)
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+        return self._admitted(start)
+
+    def acquire_sync(self, tokens: int) -> float:
+        """Blocking `acquire` for sync callers; returns the wait in ms."""
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            self._slots.acquire_sync()
+            try:
+                while (pause := self.blocked_until - time.monotonic()) > 0:
+                    time.sleep(pause)
+                if self.bucket is not None:
+                    with self._sync_bucket_lock:
+                        while (wait := self.bucket.reserve(tokens)) > 0:
+                            time.sleep(wait)
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+        return self._admitted(start)
+
+    def _admitted(self, start: float) -> float:
+        self.in_flight += 1
+        self.requests += 1
+        waited = (time.perf_counter() - start) * 1000
+        self.queue_wait.record(waited)
+        return waited
+
+    def release(self, estimated: int, actual: Optional[int], elapsed_ms: float):
+        self.in_flight -= 1
+        self._slots.release()
+        self.latency.record(elapsed_ms)
+        used = actual if actual is not None else estimated
+        self.tokens_used += used
+        if self.bucket is not None and actual is not None:
+            self.bucket.adjust(estimated - actual)
+
+    def backoff(self, attempt: int, error: Exception, base: float, cap: float) -> float:
+        retry_after = retry_after_seconds(error)
+        if getattr(error, "status_code", None) == 429:
+            self.rate_limited += 1
+        if retry_after is not None:
+            # Server told us when: wait that long plus a little jitter so callers don't stampede
+            delay = retry_after + random.uniform(0, base)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        else:
+            delay = random.uniform(0, min(cap, base * 2 ** attempt))   # full jitter
+        self.retries += 1
+        return delay
+
+    async def aclose(self):
+        await self.async_client.aclose()
+        self.sync_client.close()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "tokens_per_minute": self.tokens_per_minute or None,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "tokens_used": self.tokens_used,
+            "queue_wait": self.queue_wait.summary(),
+            "latency": self.latency.summary(),
+        }
+
+
+def _cacheable(message) -> bool:
+    # Truncated replies (max_tokens hit) and empty ones are not worth replaying
+    finish_reason = (message.response_metadata or {}).get("finish_reason")
+    return finish_reason != "length" and bool(message.content or getattr(message, "tool_calls", None))
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Chat model that routes every call for `inner` (a ChatGroq) through its model lane.
+
+    Streaming is supported: a failed attempt is retried only if it failed before the
+    first token, so callers never see duplicated output.
+
+    Calls made with `response_cache=True` (e.g. `.bind(response_cache=True)`) are
+    answered from the gateway's response cache when it is enabled, keyed on model,
+    temperature, request parameters and messages. Callers opt in only where the
+    prompt fully determines a good answer.
+    """
+
+    inner: Any
+    gateway: Any
+    model_name: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "groq-gateway"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "temperature": getattr(self.inner, "temperature", None)}
+
+    def _estimate(self, messages, kwargs) -> int:
+        return estimate_request_tokens(
+            messages, kwargs.get("max_tokens") or self.inner.max_tokens, self.gateway.completion_estimate)
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        """Binds OpenAI-format tool specs; they reach Groq as request parameters through `_agenerate`."""
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    @staticmethod
+    def _usage(message) -> Optional[int]:
+        usage = getattr(message, "usage_metadata", None)
+        return usage.get("total_tokens") if usage else None
+
+    def _response_cache_key(self, messages, stop, kwargs) -> Optional[str]:
+        """Pops the per-call `response_cache` flag; the cache key when this call uses the cache."""
+        wanted = kwargs.pop("response_cache", False)
+        if not wanted or self.gateway.response_cache is None:
+            return None
+        return cache_key(self.model_name, getattr(self.inner, "temperature", None), messages, {"stop": stop, **kwargs})
+
+    def forget_cached(self, messages: List[BaseMessage], stop=None, **kwargs):
+        """Drops the cached response for this exact call, e.g. one the caller found unusable."""
+        key = self._response_cache_key(messages, stop, {**kwargs, "response_cache": True})
+        if key is not None:
+            self.gateway.response_cache.discard(key)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        cache = self.gateway.response_cache
+        key = self._response_cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = await asyncio.to_thread(cache.get, key, self.model_name)
+            if cached is not None:
+                return ChatResult(generations=[ChatGeneration(message=cached)])
+        result = await self._agenerate_through_lane(messages, stop, **kwargs)
+        if key is not None and _cacheable(result.generations[0].message):
+            await asyncio.to_thread(cache.put, key, self.model_name, result.generations[0].message)
+        return result
+
+    async def _agenerate_through_lane(self, messages: List[BaseMessage], stop=None, **kwargs) -> ChatResult:
+        lane = self.gateway.lane(self.model_name)
+        estimated = self._estimate(messages, kwargs)
+        for attempt in range(self.gateway.max_retries + 1):
+            await lane.acquire(estimated)
+            start, actual = time.perf_counter(), None
+            try:
+                result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+                actual = self._usage(result.generations[0].message)
+                return result
+            except Exception as e:
+                if attempt == self.gateway.max_retries or not is_retryable(e):
+                    lane.errors += 1
+                    raise
+                delay = lane.backoff(attempt, e, self.gateway.backoff_base, self.gateway.backoff_max)
+            finally:
+                lane.release(estimated, actual, (time.perf_counter() - start) * 1000)
+            print(f"LLM gateway: {self.model_name} attempt {attempt + 1} failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        cache = self.gateway.response_cache
+        key = self._response_cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = await asyncio.to_thread(cache.get, key, self.model_name)
+            if cached is not None:
+                # Replayed as one chunk: the client still gets its token and tool-call events
+                yield ChatGenerationChunk(message=AIMessageChunk(
+                    content=cached.content, response_metadata=cached.response_metadata,
+                    tool_call_chunks=[ToolCallChunk(name=call["name"], args=json.dumps(call["args"]),
+                                                    id=call["id"], index=i)
+                                      for i, call in enumerate(cached.tool_calls)]))
+                return
+        full = None
+        async for chunk in self._astream_through_lane(messages, stop, **kwargs):
+            full = chunk.message if full is None else full + chunk.message
+            yield chunk
+        if key is not None and full is not None and _cacheable(full):
+            await asyncio.to_thread(cache.put, key, self.model_name, full)
+
+    async def _astream_through_lane(self, messages: List[BaseMessage], stop=None,
+                                    **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        lane = self.gateway.lane(self.model_name)
+        estimated = self._estimate(messages, kwargs)
+        for attempt in range(self.gateway.max_retries + 1):
+            await lane.acquire(estimated)
+            start, actual, started = time.perf_counter(), None, False
+            try:
+                # The base class reports tokens to the callbacks; don't pass run_manager down twice
+                async for chunk in self.inner._astream(messages, stop=stop, **kwargs):
+                    started = True
+                    actual = self._usage(chunk.message) or actual
+                    yield chunk
+                return
+            except Exception as e:
+                if started or attempt == self.gateway.max_retries or not is_retryable(e):
+                    lane.errors += 1
+                    raise
+                delay = lane.backoff(attempt, e, self.gateway.backoff_base, self.gateway.backoff_max)
+            finally:
+                lane.release(estimated, actual, (time.perf_counter() - start) * 1000)
+            print(f"LLM gateway: {self.model_name} stream attempt {attempt + 1} failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # Sync callers (scripts, the CLI loop) get the same limits through the lane's threading slots
+        cache = self.gateway.response_cache
+        key = self._response_cache_key(messages, stop, kwargs)
+        if key is not None:
+            cached = cache.get(key, self.model_name)
+            if cached is not None:
+                return ChatResult(generations=[ChatGeneration(message=cached)])
+        lane = self.gateway.lane(self.model_name)
+        estimated = self._estimate(messages, kwargs)
+        for attempt in range(self.gateway.max_retries + 1):
+            lane.acquire_sync(estimated)
+            start, actual = time.perf_counter(), None
+            try:
+                result = self.inner._generate(messages, stop=stop, **kwargs)
+                actual = self._usage(result.generations[0].message)
+                break
+            except Exception as e:
+                if attempt == self.gateway.max_retries or not is_retryable(e):
+                    lane.errors += 1
+                    raise
+                delay = lane.backoff(attempt, e, self.gateway.backoff_base, self.gateway.backoff_max)
+            finally:
+                lane.release(estimated, actual, (time.perf_counter() - start) * 1000)
+            print(f"LLM gateway: {self.model_name} attempt {attempt + 1} failed, retrying in {delay:.1f}s")
+            time.sleep(delay)
+        if key is not None and _cacheable(result.generations[0].message):
+            cache.put(key, self.model_name, result.generations[0].message)
+        return result
+
+
+class LLMGateway:
+    """
+    Single owner of LLM access for the process.
+
+    `chat_model(model, ...)` returns a LangChain chat model whose calls share that
+    model's lane: pooled HTTP connections, a concurrency cap, a tokens-per-minute
+    token bucket, and Retry-After aware retries with jittered backoff (SDK-level
+    retries are disabled so the two don't multiply). The async HTTP pools belong to
+    the event loop that first uses them: build one gateway per loop. With a
+    `response_cache`, calls that opt in are answered from it (see GatewayChatModel).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 default_concurrency: int = 8, default_tpm: int = 0, model_limits: Optional[dict] = None,
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 timeout: float = 60.0, completion_estimate: int = 512,
+                 response_cache: Optional[LLMResponseCache] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.default_concurrency = default_concurrency
+        self.default_tpm = default_tpm
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.completion_estimate = completion_estimate
+        self.response_cache = response_cache
+        self._lanes = {}
+
+    def lane(self, model_name: str) -> ModelLane:
+        if model_name not in self._lanes:
+            concurrency, tpm = self.model_limits.get(model_name, (0, 0))
+            self._lanes[model_name] = ModelLane(
+                model_name, concurrency or self.default_concurrency, tpm or self.default_tpm, self.timeout)
+        return self._lanes[model_name]
+
+    def chat_model(self, model_name: str, temperature: float = 0.3, **kwargs) -> GatewayChatModel:
+        lane = self.lane(model_name)
+        inner = ChatGroq(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            model_name=model_name,
+            temperature=temperature,
+            max_retries=0,
+            http_client=lane.sync_client,
+            http_async_client=lane.async_client,
+            **kwargs,
+        )
+        return GatewayChatModel(inner=inner, gateway=self, model_name=model_name)
+
+    def stats(self) -> dict:
+        return {
+            "models": {name: lane.stats() for name, lane in self._lanes.items()},
+            "response_cache": self.response_cache.stats() if self.response_cache else {"enabled": False},
+        }
+
+    async def aclose(self):
+        for lane in self._lanes.values():
+            await lane.aclose()
+
+
+_gateway = None
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=config.LLM_BASE_URL,
+            default_concurrency=config.LLM_DEFAULT_CONCURRENCY,
+            default_tpm=config.LLM_DEFAULT_TPM,
+            model_limits=parse_model_limits(config.LLM_MODEL_LIMITS),
+            max_retries=config.LLM_MAX_RETRIES,
+            backoff_base=config.LLM_BACKOFF_BASE,
+            backoff_max=config.LLM_BACKOFF_MAX,
+            timeout=config.LLM_REQUEST_TIMEOUT,
+            completion_estimate=config.LLM_COMPLETION_TOKENS_ESTIMATE,
+            response_cache=LLMResponseCache(
+                config.LLM_CACHE_PATH, max_entries=config.LLM_CACHE_MAX_ENTRIES, ttl=config.LLM_CACHE_TTL,
+            ) if config.LLM_CACHE_ENABLED else None,
+        )
+    return _gateway
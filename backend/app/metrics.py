@@ -0,0 +1,34 @@
+import threading
+from collections import deque
+
+
+class LatencyRecorder:
+    """Keeps the last `window` samples (milliseconds) and summarises them for /metrics."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 1)
+
+        return {
+            "count": count,
+            "mean_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(samples[-1], 1),
+        }
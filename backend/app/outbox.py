@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import sqlite3
+import threading
+from typing import List, Optional
+
+from app import config
+from app.metrics import LatencyRecorder
+from app.tools.emailer import get_client
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              TEXT PRIMARY KEY,          -- dedupe key: the proposal (job) id
+    recipients      TEXT NOT NULL,             -- JSON list of addresses
+    attachment_path TEXT NOT NULL,
+    status          TEXT NOT NULL,             -- pending | sending | sent | failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    locked_until    REAL,
+    locked_by       TEXT,                      -- claim token of the current lease
+    message_id      TEXT,
+    error           TEXT,
+    created_at      REAL NOT NULL,
+    sent_at         REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class EmailOutbox:
+    """
+    Durable queue of emails to send, in a SQLite file (WAL) shared by all server workers.
+
+    Rows are keyed by proposal id, so enqueueing the same proposal twice (a retried
+    job, a double click) sends one email. Claims take a lease; a send left unfinished
+    by a crashed worker is picked up again once the lease runs out. Every claim gets its
+    own token: `mark_*` only update a row still leased under that token and return the
+    number of rows changed, so a sender whose lease was taken over can't overwrite the
+    newer claim's state.
+    """
+
+    def __init__(self, path: str, lease: float = 120.0, clock=time.time):
+        self.path = path
+        self.lease = lease
+        self._clock = clock
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # Outbox files created before claim tokens
+        if "locked_by" not in {row["name"] for row in conn.execute("PRAGMA table_info(outbox)")}:
+            conn.execute("ALTER TABLE outbox ADD COLUMN locked_by TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        email = dict(row)
+        email["recipients"] = json.loads(email["recipients"])
+        return email
+
+    def enqueue(self, key: str, recipients: List[str], attachment_path: str) -> bool:
+        """Adds an email unless one with this key exists; returns False for a duplicate."""
+        now = self._clock()
+        return self._conn().execute(
+            "INSERT OR IGNORE INTO outbox (id, recipients, attachment_path, status, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, 'pending', ?, ?)",
+            (key, json.dumps(recipients), attachment_path, now, now),
+        ).rowcount == 1
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM outbox WHERE id = ?", (key,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self, limit: int) -> List[dict]:
+        """Atomically leases up to `limit` due emails (oldest first) under a new claim token (`locked_by`)."""
+        now = self._clock()
+        rows = self._conn().execute(
+            "UPDATE outbox SET status = 'sending', locked_until = ?, locked_by = ? "
+            "WHERE id IN (SELECT id FROM outbox WHERE (status = 'pending' AND next_attempt_at <= ?) "
+            "  OR (status = 'sending' AND locked_until < ?) ORDER BY next_attempt_at LIMIT ?) "
+            "RETURNING *",
+            (now + self.lease, uuid.uuid4().hex, now, now, limit),
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def mark_sent(self, key: str, token: str, message_id: str) -> int:
+        return self._conn().execute(
+            "UPDATE outbox SET status = 'sent', message_id = ?, error = NULL, attempts = attempts + 1, "
+            "sent_at = ?, locked_until = NULL, locked_by = NULL WHERE id = ? AND locked_by = ?",
+            (message_id, self._clock(), key, token)).rowcount
+
+    def mark_retry(self, key: str, token: str, error: str, delay: float) -> int:
+        return self._conn().execute(
+            "UPDATE outbox SET status = 'pending', error = ?, attempts = attempts + 1, next_attempt_at = ?, "
+            "locked_until = NULL, locked_by = NULL WHERE id = ? AND locked_by = ?",
+            (error, self._clock() + delay, key, token)).rowcount
+
+    def mark_failed(self, key: str, token: str, error: str) -> int:
+        return self._conn().execute(
+            "UPDATE outbox SET status = 'failed', error = ?, attempts = attempts + 1, locked_until = NULL, "
+            "locked_by = NULL WHERE id = ? AND locked_by = ?", (error, key, token)).rowcount
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_unsent_age_s": round(self._clock() - oldest, 1) if oldest else 0.0,
+        }
+
+
+class EmailDispatcher:
+    """
+    Drains the outbox with one shared email client.
+
+    Each pass claims up to `batch_size` due emails and sends each one in its own API
+    call (every proposal has its own PDF, so there is nothing to share between them).
+    Up to `concurrency` calls run at once in threads, because the Brevo SDK is
+    blocking. Rate limits (429), 5xx and network errors are retried with jittered
+    exponential backoff, or after the API's Retry-After. A Retry-After also pauses
+    the whole dispatcher for that long. Other errors fail the email straight away.
+    """
+
+    def __init__(self, outbox: EmailOutbox, client, batch_size: int = 20, concurrency: int = 4,
+                 max_attempts: int = 8, retry_base: float = 5.0, retry_max: float = 600.0,
+                 poll_interval: float = 2.0):
+        self.outbox = outbox
+        self.client = client
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self._concurrency = concurrency
+        self._gate = None
+        self._wakeup = None
+        self._task = None
+        self._paused_until = 0.0
+        self.api_calls = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.leases_lost = 0
+        self.send_latency = LatencyRecorder()
+
+    def start(self):
+        self._gate = asyncio.Semaphore(self._concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                sent_any = await self.drain_once()
+            except Exception as e:
+                # Claimed emails go back to the queue when their lease runs out
+                print(f"Outbox: dispatcher pass failed: {e!r}")
+                sent_any = False
+            if not sent_any:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> bool:
+        """One pass: claim a batch and send it. Returns False when nothing was due."""
+        emails = await asyncio.to_thread(self.outbox.claim, self.batch_size)
+        if not emails:
+            return False
+        await asyncio.gather(*(self._send(email) for email in emails))
+        return True
+
+    async def _send(self, email: dict):
+        async with self._gate:
+            # After a 429 every send waits, instead of each one probing the limit separately
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            start = time.perf_counter()
+            self.api_calls += 1
+            try:
+                message_id = (await asyncio.to_thread(
+                    self.client.send, [email["recipients"]], email["attachment_path"]))[0]
+            except Exception as e:
+                await asyncio.to_thread(self._record_failure, email, e)
+                return
+            finally:
+                self.send_latency.record((time.perf_counter() - start) * 1000)
+        if not await asyncio.to_thread(self.outbox.mark_sent, email["id"], email["locked_by"], message_id):
+            self._lost_lease(email)
+        self.sent += 1
+
+    def _lost_lease(self, email: dict):
+        # The send outlived OUTBOX_LEASE and another dispatcher re-claimed the email; its state wins
+        self.leases_lost += 1
+        print(f"Outbox: email {email['id']} lease was taken over during the send (OUTBOX_LEASE too short?)")
+
+    def _record_failure(self, email: dict, error: Exception):
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        attempts = email["attempts"] + 1
+        if getattr(error, "retryable", False) and attempts < self.max_attempts:
+            delay = random.uniform(0.5, 1.0) * min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if not self.outbox.mark_retry(email["id"], email["locked_by"], str(error), delay):
+                self._lost_lease(email)
+            self.retried += 1
+            print(f"Outbox: email {email['id']} attempt {attempts} failed ({error}), retrying in {delay:.1f}s")
+        else:
+            if not self.outbox.mark_failed(email["id"], email["locked_by"], str(error)):
+                self._lost_lease(email)
+            self.failed += 1
+            print(f"Outbox: email {email['id']} failed, giving up: {error}")
+
+    def stats(self) -> dict:
+        return {
+            **self.outbox.stats(),
+            "api_calls": self.api_calls,
+            "sent_here": self.sent,
+            "retried_here": self.retried,
+            "failed_here": self.failed,
+            "leases_lost_here": self.leases_lost,
+            "send_latency": self.send_latency.summary(),
+        }
+
+
+_outbox = None
+_dispatcher = None
+
+
+def get_outbox() -> EmailOutbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = EmailOutbox(config.OUTBOX_DB_PATH, lease=config.OUTBOX_LEASE)
+    return _outbox
+
+
+def start_dispatcher() -> EmailDispatcher:
+    """Starts this process's dispatcher (call from inside the running event loop)."""
+    global _dispatcher
+    _dispatcher = EmailDispatcher(
+        get_outbox(), get_client(),
+        batch_size=config.OUTBOX_BATCH_SIZE,
+        concurrency=config.OUTBOX_CONCURRENCY,
+        max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+        retry_base=config.OUTBOX_RETRY_BASE,
+        retry_max=config.OUTBOX_RETRY_MAX,
+        poll_interval=config.OUTBOX_POLL_INTERVAL,
+    )
+    _dispatcher.start()
+    return _dispatcher
+
+
+def get_dispatcher() -> Optional[EmailDispatcher]:
+    return _dispatcher
+
+
+def notify():
+    if _dispatcher is not None:
+        _dispatcher.notify()
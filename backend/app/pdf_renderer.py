@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import uuid
+import asyncio
+import multiprocessing
+from collections import Counter
+from typing import Optional
+
+from app import config
+from app.metrics import LatencyRecorder
+
+# Rendered once when a worker starts, so Pango/fontconfig and the stylesheet's fonts are loaded before real work
+WARMUP_HTML = """
+<div class="header-container"><div class="company-name">ProCode Bot</div></div>
+<h1>Warm-up</h1><h2>Commercials</h2><div class="price-box">Total Estimated Cost: ₹1</div>
+<div class="footer"><b>ProCodeHub Pvt Ltd</b></div>
+"""
+
+
+class PdfRenderError(Exception):
+    """A render failed. retryable=False means the same HTML will fail again (bad markup, missing asset)."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class PdfRenderTimeout(PdfRenderError):
+    pass
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB (None where it can't be measured cheaply, e.g. Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS, which is good enough to decide on recycling
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _worker_main(conn):
+    """Render worker: loads WeasyPrint, the parsed DEFAULT_CSS and a font configuration once, then serves jobs."""
+    try:
+        from weasyprint import HTML
+        from weasyprint.text.fonts import FontConfiguration
+        from app.tools.pdf_gen import BASE_DIR, DEFAULT_CSS, write_atomic
+
+        font_config = FontConfiguration()
+
+        def render(html: str) -> bytes:
+            # base_url is needed for the local logo image
+            return HTML(string=html, base_url=BASE_DIR).write_pdf(stylesheets=[DEFAULT_CSS], font_config=font_config)
+
+        render(WARMUP_HTML)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}", current_rss_mb()))
+        return
+    conn.send(("ready", os.getpid(), current_rss_mb()))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        html, path = job
+        start = time.perf_counter()
+        try:
+            write_atomic(path, render(html))
+            conn.send(("ok", path, (time.perf_counter() - start) * 1000, current_rss_mb()))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", (time.perf_counter() - start) * 1000, current_rss_mb()))
+
+
+class _Worker:
+    """One render process and the parent's end of its pipe."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), name="pdf-render", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.rss_mb = None
+
+    def wait_ready(self, timeout: float):
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise PdfRenderError(f"PDF render worker did not start within {timeout:.0f}s")
+        try:
+            status, detail, self.rss_mb = self.conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise PdfRenderError("PDF render worker exited during start-up")
+        if status != "ready":
+            self.kill()
+            raise PdfRenderError(f"PDF render worker failed to start: {detail}")
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self, timeout: float = 5.0):
+        """Asks the worker to exit after its current job; kills it if it doesn't."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1.0)
+        self.conn.close()
+
+
+class PdfRenderer:
+    """
+    Renders proposal PDFs in a pool of pre-warmed WeasyPrint processes.
+
+    WeasyPrint is CPU-bound and holds the GIL, so rendering in the server process
+    stalls every other request on that worker. Here each render process loads
+    WeasyPrint, the parsed stylesheet and fonts once and then serves many jobs.
+
+    A render that exceeds `timeout` gets its process killed. A process is also
+    recycled after `max_jobs` renders or once its RSS passes `max_rss_mb`, which
+    bounds slow leaks from fonts or images. Replacements start in the background.
+    Output goes to `output_dir` through a temp file and rename.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 60.0, max_rss_mb: int = 512, max_jobs: int = 200,
+                 output_dir: str = config.PDF_OUTPUT_DIR, start_timeout: float = 60.0):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.max_jobs = max_jobs
+        self.output_dir = output_dir
+        self.start_timeout = start_timeout
+        # spawn, not fork: a forked child would share (and report as resident) the server's embedding
+        # model and other state, and forking a process with live threads can deadlock
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = None           # asyncio.Queue of _Worker, or None for a slot that still needs a process
+        self._live = set()
+        self._replacing = set()
+        self.rendered = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = Counter()
+        self.latency = LatencyRecorder()
+        self.queue_wait = LatencyRecorder()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _spawn(self) -> _Worker:
+        """Blocking: starts a process and waits until it has warmed up."""
+        worker = _Worker(self._ctx)
+        worker.wait_ready(self.start_timeout)
+        self._live.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker, kill: bool):
+        self._live.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    async def start(self):
+        """Starts and warms all workers (a failed start is retried on first use instead of failing here)."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        started = await asyncio.gather(*(asyncio.to_thread(self._spawn) for _ in range(self.workers)),
+                                       return_exceptions=True)
+        for worker in started:
+            if isinstance(worker, Exception):
+                print(f"PDF renderer: {worker}")
+                worker = None
+            self._idle.put_nowait(worker)
+        print(f"PDF renderer: {len(self._live)}/{self.workers} workers ready")
+
+    async def _replace(self, old: Optional[_Worker], kill: bool):
+        if old is not None:
+            await asyncio.to_thread(self._discard, old, kill)
+        new = None
+        try:
+            new = await asyncio.to_thread(self._spawn)
+        except PdfRenderError as e:
+            print(f"PDF renderer: {e}")
+        finally:
+            # Whatever went wrong, the slot goes back (None is respawned on next use)
+            self._idle.put_nowait(new)
+
+    def _release(self, worker: Optional[_Worker], recycle: Optional[str] = None, kill: bool = False):
+        if recycle is None:
+            self._idle.put_nowait(worker)
+            return
+        self.recycled[recycle] += 1
+        task = asyncio.create_task(self._replace(worker, kill))
+        self._replacing.add(task)
+        task.add_done_callback(self._replacing.discard)
+
+    def _recycle_reason(self, worker: _Worker) -> Optional[str]:
+        if self.max_jobs and worker.jobs >= self.max_jobs:
+            return "max_jobs"
+        if self.max_rss_mb and worker.rss_mb is not None and worker.rss_mb > self.max_rss_mb:
+            return "max_rss"
+        return None
+
+    async def render(self, html: str, filename: Optional[str] = None) -> str:
+        """Renders `html` to a PDF in output_dir and returns its path."""
+        await self.start()
+        filename = filename or f"proposal_{uuid.uuid4().hex[:8]}.pdf"
+        if not filename.endswith(".pdf"):
+            filename += ".pdf"
+        path = os.path.join(self.output_dir, filename)
+        wait_start = time.perf_counter()
+        worker = await self._idle.get()
+        self.queue_wait.record((time.perf_counter() - wait_start) * 1000)
+
+        if worker is None or not worker.alive():
+            try:
+                if worker is not None:
+                    self.crashes += 1
+                    await asyncio.to_thread(self._discard, worker, True)
+                worker = await asyncio.to_thread(self._spawn)
+            except BaseException:
+                self._idle.put_nowait(None)
+                raise
+
+        start = time.perf_counter()
+        try:
+            worker.conn.send((html, path))
+            finished = await asyncio.to_thread(worker.conn.poll, self.timeout)
+        except BaseException:
+            # Cancelled or broken pipe: the worker's state is unknown, replace it
+            self._release(worker, "interrupted", kill=True)
+            raise
+        if not finished:
+            self.timeouts += 1
+            try:
+                await asyncio.to_thread(self._discard, worker, True)
+                tmp_path = f"{path}.{worker.process.pid}.tmp"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            finally:
+                self._release(None, "timeout")
+            raise PdfRenderTimeout(f"PDF rendering took longer than {self.timeout:.0f}s")
+        try:
+            status, detail, _, worker.rss_mb = worker.conn.recv()
+        except (EOFError, OSError):
+            # The process died mid-render (segfault, OOM killer)
+            self.crashes += 1
+            self._release(worker, "crashed", kill=True)
+            raise PdfRenderError("PDF render worker died while rendering")
+
+        worker.jobs += 1
+        self._release(worker, self._recycle_reason(worker))
+        if status != "ok":
+            self.errors += 1
+            raise PdfRenderError(f"PDF rendering failed: {detail}", retryable=False)
+        self.rendered += 1
+        self.latency.record((time.perf_counter() - start) * 1000)
+        return path
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for w in self._live if w.alive()),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "rendered": self.rendered,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "recycled": dict(self.recycled),
+            "worker_rss_mb": sorted(round(w.rss_mb, 1) for w in self._live if w.rss_mb is not None),
+            "queue_wait": self.queue_wait.summary(),
+            "latency": self.latency.summary(),
+        }
+
+    async def aclose(self):
+        for task in list(self._replacing):
+            task.cancel()
+        await asyncio.gather(*self._replacing, return_exceptions=True)
+        workers, self._live = list(self._live), set()
+        await asyncio.gather(*(asyncio.to_thread(w.stop) for w in workers))
+        self._idle = None
+
+
+_renderer = None
+
+
+def get_renderer() -> PdfRenderer:
+    global _renderer
+    if _renderer is None:
+        _renderer = PdfRenderer(
+            workers=config.PDF_RENDER_WORKERS,
+            timeout=config.PDF_RENDER_TIMEOUT,
+            max_rss_mb=config.PDF_RENDER_MAX_RSS_MB,
+            max_jobs=config.PDF_RENDER_MAX_JOBS,
+            output_dir=config.PDF_OUTPUT_DIR,
+        )
+    return _renderer
@@ -0,0 +1,189 @@
+import io
+import asyncio
+import multiprocessing
+from typing import Optional
+
+from pypdf import PdfReader
+
+from app import config
+
+
+class PdfExtractionError(Exception):
+    pass
+
+
+class PdfExtractionTimeout(PdfExtractionError):
+    pass
+
+
+def extract_text(source, max_chars: int, max_pages: int, min_page_chars: int) -> dict:
+    """
+    Worker-process job: text of a PDF (file path or bytes), page by page.
+
+    Stops as soon as `max_chars` characters are collected or `max_pages` pages were
+    read, so a 300-page spec costs about as much as the pages we actually keep.
+    A page with fewer than `min_page_chars` non-blank characters counts as an image
+    page (scan or screenshot).
+    """
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    total_pages = len(reader.pages)
+    parts, collected, pages_read, image_pages = [], 0, 0, 0
+    for page in reader.pages[:max_pages]:
+        text = page.extract_text() or ""
+        pages_read += 1
+        if len("".join(text.split())) < min_page_chars:
+            image_pages += 1
+            continue
+        parts.append(text)
+        collected += len(text)
+        if collected >= max_chars:
+            break
+    text = "\n".join(parts)
+    return {
+        "text": text[:max_chars],
+        "truncated": len(text) > max_chars or pages_read < total_pages,
+        "total_pages": total_pages,
+        "pages_read": pages_read,
+        "image_pages": image_pages,
+        "image_only": pages_read > 0 and image_pages == pages_read,
+    }
+
+
+def _worker_main(conn):
+    """Extraction worker: serves `extract_text` jobs until told to stop."""
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            conn.send(("ok", extract_text(*job)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """One extraction process and the parent's end of its pipe."""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), name="pdf-text", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self, timeout: float = 5.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1.0)
+        self.conn.close()
+
+
+class PdfTextExtractor:
+    """
+    Runs `extract_text` in a few worker processes with a per-document timeout.
+
+    Each document is sent to one idle worker. A malformed PDF that hangs or spins in
+    pypdf only costs that worker: on timeout (or a crash) it is killed and a fresh one
+    is started on the next call, while extractions in the other workers carry on.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 20.0, max_chars: int = 10_000,
+                 max_pages: int = 50, min_page_chars: int = 30):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.min_page_chars = min_page_chars
+        # spawn, not fork: forking the server (live threads, the embedding model) is unsafe and wasteful
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = None           # asyncio.Queue of _Worker, or None for a slot that still needs a process
+        self._live = set()
+        self.timeouts = 0
+        self.crashes = 0
+
+    def _slots(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._idle.put_nowait(None)
+        return self._idle
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx)
+        self._live.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker):
+        self._live.discard(worker)
+        worker.kill()
+
+    def _run(self, worker: _Worker, job: tuple):
+        """Blocking: sends one document to `worker` and waits up to `timeout` for its reply."""
+        worker.conn.send(job)
+        if not worker.conn.poll(self.timeout):
+            self.timeouts += 1
+            raise PdfExtractionTimeout(f"PDF text extraction took longer than {self.timeout:.0f}s")
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            # The process died mid-document (segfault, OOM killer)
+            self.crashes += 1
+            raise PdfExtractionError("PDF text worker died while extracting")
+
+    async def extract(self, source, max_chars: Optional[int] = None) -> dict:
+        idle = self._slots()
+        worker = await idle.get()
+        try:
+            if worker is None or not worker.alive():
+                if worker is not None:
+                    self._discard(worker)
+                worker = await asyncio.to_thread(self._spawn)
+            status, detail = await asyncio.to_thread(
+                self._run, worker, (source, max_chars or self.max_chars, self.max_pages, self.min_page_chars))
+        except BaseException:
+            # Timed out, crashed or cancelled mid-document: its worker's state is unknown, replace it
+            if worker is not None:
+                self._discard(worker)
+            worker = None
+            raise
+        finally:
+            idle.put_nowait(worker)
+        if status != "ok":
+            raise PdfExtractionError(f"PDF text extraction failed: {detail}")
+        return detail
+
+    def close(self):
+        workers, self._live = list(self._live), set()
+        for worker in workers:
+            worker.stop()
+        self._idle = None
+
+
+_extractor = None
+
+
+def get_extractor() -> PdfTextExtractor:
+    global _extractor
+    if _extractor is None:
+        _extractor = PdfTextExtractor(
+            workers=config.PDF_TEXT_WORKERS,
+            timeout=config.PDF_TEXT_TIMEOUT,
+            max_chars=config.PDF_TEXT_MAX_CHARS,
+            max_pages=config.PDF_TEXT_MAX_PAGES,
+            min_page_chars=config.PDF_TEXT_MIN_PAGE_CHARS,
+        )
+    return _extractor
@@ -0,0 +1,140 @@
+import time
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from app.metrics import LatencyRecorder
+
+DOCUMENT_TAG = "<ATTACHED_PROJECT_DOCUMENT>"
+
+
+def prefetch_query(message: str, max_chars: int) -> str:
+    """Search text for a user message: what they typed, else the start of the attached document."""
+    typed, _, document = message.partition(DOCUMENT_TAG)
+    text = " ".join((typed.strip() or document).split())
+    return text[:max_chars]
+
+
+def cosine(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+class _Prefetch:
+    def __init__(self, query: str):
+        self.query = query
+        self.started = time.perf_counter()
+        self.finished = None
+        self.vector = None        # task: embedding of `query`
+        self.result = None        # task: formatted results for `query` (None on failure)
+        self.used = False
+        self.saved_ms = 0.0
+
+
+class KnowledgePrefetcher:
+    """
+    Speculative knowledge-base lookup for each new user message.
+
+    `start(key, message)` begins a retrieval on the message text while the reasoning
+    call runs. If the model then calls lookup_projects without filters and with a
+    query close enough to the message (cosine >= min_similarity), `claim` hands over
+    the prefetched result, finished or still running, instead of searching again.
+    `discard` ends the turn's prefetch and cancels it if it is still running.
+    Keys are conversation thread ids; one prefetch per thread at a time.
+    """
+
+    def __init__(self, retrieve, embed, min_similarity: float = 0.75, max_query_chars: int = 500,
+                 enabled: bool = True):
+        self.retrieve = retrieve
+        self.embed = embed
+        self.min_similarity = min_similarity
+        self.max_query_chars = max_query_chars
+        self.enabled = enabled
+        self._pending = {}
+        self.started = 0
+        self.unused = 0
+        self.failed = 0
+        self.lookups = 0
+        self.served = 0
+        self.saved = LatencyRecorder()            # per served lookup
+        self.saved_per_turn = LatencyRecorder()   # per prefetching turn, 0 when nothing was served
+
+    def start(self, key, message: str):
+        self.discard(key)
+        query = prefetch_query(message, self.max_query_chars)
+        if not self.enabled or not query:
+            return
+        prefetch = _Prefetch(query)
+        prefetch.vector = asyncio.create_task(self._embed(query))
+        prefetch.result = asyncio.create_task(self._retrieve(prefetch))
+        self._pending[key] = prefetch
+        self.started += 1
+
+    async def _embed(self, query: str):
+        try:
+            return await self.embed(query)
+        except Exception as e:
+            print(f"Prefetch: embedding failed: {e}")
+            return None
+
+    async def _retrieve(self, prefetch: _Prefetch) -> Optional[str]:
+        # After the embedding, so the retrieval finds it in the embedding cache
+        if await prefetch.vector is None:
+            return None
+        try:
+            result = await self.retrieve(prefetch.query)
+        except Exception as e:
+            print(f"Prefetch: retrieval failed: {e}")
+            result = None
+        prefetch.finished = time.perf_counter()
+        if result is None or str(result).startswith("Error retrieving"):
+            self.failed += 1
+            return None
+        return result
+
+    async def claim(self, key, query: str, filters: dict = None) -> Optional[str]:
+        """The prefetched result if it answers this lookup, else None (the caller searches)."""
+        self.lookups += 1
+        prefetch = self._pending.get(key)
+        if prefetch is None or filters:
+            return None
+        asked = time.perf_counter()
+        vector, prefetched_vector = await asyncio.gather(self._embed(query), prefetch.vector)
+        if vector is None or prefetched_vector is None or cosine(vector, prefetched_vector) < self.min_similarity:
+            return None
+        result = await prefetch.result
+        if result is None:
+            return None
+        # What a fresh search would have cost, minus the time spent here waiting for this one
+        saved = (prefetch.finished - prefetch.started) - (time.perf_counter() - asked)
+        prefetch.used = True
+        prefetch.saved_ms += max(0.0, saved * 1000)
+        self.saved.record(max(0.0, saved * 1000))
+        self.served += 1
+        return result
+
+    def discard(self, key):
+        prefetch = self._pending.pop(key, None)
+        if prefetch is None:
+            return
+        if not prefetch.used:
+            for task in (prefetch.vector, prefetch.result):
+                task.cancel()
+            self.unused += 1
+        self.saved_per_turn.record(prefetch.saved_ms)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "in_flight": len(self._pending),
+            "unused": self.unused,
+            "failed": self.failed,
+            "lookups": self.lookups,
+            "served_by_prefetch": self.served,
+            "served_fraction": round(self.served / self.lookups, 4) if self.lookups else 0.0,
+            "saved_per_lookup": self.saved.summary(),
+            "saved_per_turn": self.saved_per_turn.summary(),
+        }
@@ -0,0 +1,98 @@
+import html
+from string import Template
+from typing import List
+
+from pydantic import BaseModel, Field
+
+# --- COMPANY DETAILS (fixed parts of every proposal, never generated by the model) ---
+COMPANY_NAME = "ProCode Bot"
+COMPANY_LEGAL_NAME = "ProCodeHub Pvt Ltd"
+COMPANY_ADDRESS = "123 Kalikaparameshwari complex,Durgigudi,Shivamogga, Karnataka - 577201"
+COMPANY_CONTACT = "Contact: +91 98765 43210 | Email:procodehub@gmail.com"
+# Relative to the renderer's base_url (backend/), so it works on any machine
+LOGO_PATH = "knowledge_base/procode_image.png"
+
+
+# --- WHAT THE MODEL RETURNS ---
+class Milestone(BaseModel):
+    title: str = Field(min_length=1, max_length=120)
+    weeks: int = Field(ge=1, le=104)
+    deliverables: List[str] = Field(default_factory=list, max_length=8)
+
+
+class ProposalContent(BaseModel):
+    overview: str = Field(min_length=1, max_length=1500)
+    scope: List[str] = Field(min_length=1, max_length=12)
+    milestones: List[Milestone] = Field(min_length=1, max_length=10)
+    assumptions: List[str] = Field(default_factory=list, max_length=10)
+
+    @property
+    def total_weeks(self) -> int:
+        return sum(m.weeks for m in self.milestones)
+
+
+# Shape shown to the model: much shorter than the JSON Schema and enough for JSON mode
+CONTENT_SHAPE = """{
+  "overview": "2-4 sentences on the client's goal and the solution",
+  "scope": ["feature or work item", "..."],
+  "milestones": [{"title": "phase name", "weeks": 2, "deliverables": ["...", "..."]}],
+  "assumptions": ["...", "..."]
+}"""
+
+
+# --- HTML TEMPLATE (parsed once; header, logo, price box and footer are fixed) ---
+PROPOSAL_TEMPLATE = Template(f"""
+<div class="header-container">
+    <div class="company-name">{html.escape(COMPANY_NAME)}</div>
+    <img src="{LOGO_PATH}" class="logo" alt="Company Logo">
+</div>
+
+<h1>Project Proposal</h1>
+<p>Dear Customer,</p>
+<p>$overview</p>
+
+<h2>Scope of Work</h2>
+<ul>$scope</ul>
+
+<h2>Timeline</h2>
+<p>Estimated duration: <b>$duration</b></p>
+<ol>$milestones</ol>
+$assumptions
+<h2>Commercials</h2>
+<div class="price-box">
+    Total Estimated Cost: ₹$price
+</div>
+
+<div class="footer">
+    <b>{html.escape(COMPANY_LEGAL_NAME)}</b><br>
+    {html.escape(COMPANY_ADDRESS)}<br>
+    {html.escape(COMPANY_CONTACT)}
+</div>
+""")
+
+
+def _weeks(n: int) -> str:
+    return f"{n} week{'s' if n != 1 else ''}"
+
+
+def _items(values: List[str]) -> str:
+    return "".join(f"<li>{html.escape(v)}</li>" for v in values)
+
+
+def render_proposal_html(content: ProposalContent, price: int) -> str:
+    """Fills the template; every model-written string is escaped, so it can't inject markup."""
+    milestones = "".join(
+        f"<li><b>{html.escape(m.title)}</b> ({_weeks(m.weeks)})"
+        + (f"<ul>{_items(m.deliverables)}</ul>" if m.deliverables else "")
+        + "</li>"
+        for m in content.milestones
+    )
+    assumptions = f"\n<h2>Assumptions</h2>\n<ul>{_items(content.assumptions)}</ul>\n" if content.assumptions else ""
+    return PROPOSAL_TEMPLATE.substitute(
+        overview=html.escape(content.overview),
+        scope=_items(content.scope),
+        duration=_weeks(content.total_weeks),
+        milestones=milestones,
+        assumptions=assumptions,
+        price=f"{price:,}",
+    )
@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+from pydantic import ValidationError
+
+from app import config, jobs, outbox
+from app.jobs import JobStageError
+from app.llm_gateway import get_gateway
+from app.pdf_renderer import PdfRenderError, get_renderer
+from app.proposal_template import CONTENT_SHAPE, ProposalContent, render_proposal_html
+
+PROPOSAL_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Same model and temperature the chat uses, so proposals read like the conversation.
+# JSON mode: the model only writes the variable sections, the template supplies the rest.
+# Drafts may come from the response cache: the prompt carries the price and everything else it depends on
+llm = get_gateway().chat_model("llama-3.3-70b-versatile", temperature=0.3)
+draft_llm = llm.bind(response_format={"type": "json_object"}, max_tokens=config.PROPOSAL_MAX_TOKENS,
+                     response_cache=True)
+
+
+def build_prompt(payload: dict) -> str:
+    # Note: price:, formats number with commas (e.g. 40,000)
+    return f"""Write the content of a software project proposal for this client.
+    - Requirements Summary: {payload["requirements"]}
+    - Total Price: INR {payload["price"]:,} (fixed; the document shows it separately, do not repeat it)
+    - Notes: {payload["notes"]}
+
+    Reply with ONLY a JSON object of this shape. Keep every item to one short sentence, no HTML or markdown:
+    {CONTENT_SHAPE}
+    """
+
+
+# --- STAGES (each gets the job payload and the results of earlier stages) ---
+async def draft_stage(payload: dict, results: dict) -> dict:
+    messages = [HumanMessage(content=build_prompt(payload))]
+    response = await draft_llm.ainvoke(messages)
+    try:
+        content = ProposalContent.model_validate_json(response.content)
+    except ValidationError as e:
+        # Usually a truncated or off-shape reply; a fresh attempt tends to fix it,
+        # so don't let the retry be answered with the same cached reply
+        await asyncio.to_thread(llm.forget_cached, messages, **draft_llm.kwargs)
+        raise JobStageError(f"Proposal content did not match the expected shape: {e.error_count()} error(s)")
+    return {
+        "content": content.model_dump(),
+        "html": render_proposal_html(content, payload["price"]),
+    }
+
+
+async def render_stage(payload: dict, results: dict) -> dict:
+    # Warm WeasyPrint worker process, keeps the CPU-bound render off this process's GIL
+    try:
+        pdf_path = await get_renderer().render(results["html"], proposal_filename(payload["proposal_id"]))
+    except PdfRenderError as e:
+        raise JobStageError(str(e), retryable=e.retryable)
+    return {"pdf_path": pdf_path, "proposal_id": payload["proposal_id"]}
+
+
+async def email_stage(payload: dict, results: dict) -> dict:
+    # Hand off to the durable outbox; its dispatcher sends (and retries) in the background.
+    # Keyed by proposal id, so a retried job never emails the client twice
+    key = payload["proposal_id"]
+    added = await asyncio.to_thread(outbox.get_outbox().enqueue, key, [payload["recipient"]], results["pdf_path"])
+    outbox.notify()
+    return {"email": {"status": "queued" if added else "duplicate", "outbox_id": key}}
+
+
+PROPOSAL_PIPELINE = [("draft", draft_stage), ("render", render_stage), ("email", email_stage)]
+
+
+def enqueue_proposal(price: int, requirements: str, recipient: str, notes: str) -> str:
+    """Queues a proposal job and returns its id (blocking SQLite insert: call via a thread)."""
+    proposal_id = uuid.uuid4().hex
+    job_id = jobs.get_queue().enqueue(
+        "proposal",
+        {"proposal_id": proposal_id, "price": price, "requirements": requirements,
+         "recipient": recipient, "notes": notes},
+        first_stage=PROPOSAL_PIPELINE[0][0],
+        max_attempts=config.JOBS_MAX_ATTEMPTS,
+        job_id=proposal_id,
+    )
+    jobs.notify()
+    return job_id
+
+
+# --- GENERATED FILES (served by GET /proposals/{id}) ---
+def proposal_filename(proposal_id: str) -> str:
+    return f"proposal_{proposal_id}.pdf"
+
+
+def proposal_file(proposal_id: str) -> Optional[str]:
+    """Path of a proposal's PDF, or None for an id that isn't one of ours (no path tricks)."""
+    if not PROPOSAL_ID.match(proposal_id):
+        return None
+    return os.path.join(config.PDF_OUTPUT_DIR, proposal_filename(proposal_id))
+
+
+def prune_proposals(directory: str, max_age: float, max_total_bytes: int, min_age: float, now: float = None) -> dict:
+    """
+    Retention for generated PDFs: deletes files older than `max_age`, then the oldest
+    ones until the folder fits in `max_total_bytes`. Files younger than `min_age` are
+    always kept (their email may still be waiting in the outbox). Leftover temp files
+    from killed renders are removed once they pass `min_age`.
+    """
+    now = now or time.time()
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith((".pdf", ".tmp")):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    deleted = freed = 0
+    for mtime, size, path in files:
+        age = now - mtime
+        if age < min_age:
+            break
+        expired = path.endswith(".tmp") or (max_age and age > max_age)
+        if not expired and not (max_total_bytes and total > max_total_bytes):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        deleted += 1
+        freed += size
+    return {"deleted": deleted, "freed_bytes": freed, "kept": len(files) - deleted, "total_bytes": total}
+
+
+last_retention = {}
+
+
+async def run_retention(interval: float):
+    """Background task: applies the PROPOSAL_* retention settings every `interval` seconds."""
+    global last_retention
+    while True:
+        try:
+            last_retention = await asyncio.to_thread(
+                prune_proposals, config.PDF_OUTPUT_DIR, config.PROPOSAL_MAX_AGE,
+                config.PROPOSAL_MAX_TOTAL_MB * 1024 * 1024, config.PROPOSAL_MIN_AGE,
+            )
+            if last_retention["deleted"]:
+                print(f"Proposals: retention removed {last_retention['deleted']} file(s), "
+                      f"{last_retention['freed_bytes'] / 2**20:.1f} MB")
+        except OSError as e:
+            print(f"Proposals: retention pass failed: {e}")
+        await asyncio.sleep(interval)
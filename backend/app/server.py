@@ -1,22 +1,65 @@
 import os
 import base64
-import io
+import json
+import asyncio
+import time
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import numpy as np
+from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_groq import ChatGroq
-from pypdf import PdfReader
-from typing import Optional
+from typing import List, Optional
 
 # Import the workflow from your agent
 # we use relative import since this file is inside the 'app' package
-from app.agent import workflow
+from app.agent import workflow, prefetcher
+from app.config import (
+    CHECKPOINT_COMPACT_INTERVAL, PROPOSAL_CACHE_MAX_AGE, PROPOSAL_GC_INTERVAL, QUOTE_BATCH_MAX_ITEMS,
+    UPLOAD_ALLOWED_TYPES, UPLOAD_MAX_BYTES,
+)
+from app.checkpoint import SqliteCheckpointer, build_checkpointer
+from app.llm_gateway import get_gateway
+from app import jobs, outbox, pdf_renderer, pdf_text, proposals, uploads, vision
+from app.proposals import PROPOSAL_PIPELINE
+from app.tools import pricing, rag
+from app.metrics import LatencyRecorder
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model and open the Qdrant connection once, before traffic
+    await rag.awarm_up()
+    durable = isinstance(memory, SqliteCheckpointer)
+    if durable:
+        # Prune expired threads and old checkpoints in the background
+        compaction = asyncio.create_task(memory.run_compaction(CHECKPOINT_COMPACT_INTERVAL))
+    # Warm WeasyPrint processes for the proposal render stage
+    await pdf_renderer.get_renderer().start()
+    # Proposal jobs queued by any worker (or left over from before a restart)
+    job_pool = jobs.start_workers({"proposal": PROPOSAL_PIPELINE})
+    # Proposal emails (sent, or left pending before a restart) go out from the outbox
+    dispatcher = outbox.start_dispatcher()
+    # Prune generated PDFs by age and total size
+    retention = asyncio.create_task(proposals.run_retention(PROPOSAL_GC_INTERVAL))
+    yield
+    retention.cancel()
+    await job_pool.stop()
+    await dispatcher.stop()
+    await pdf_renderer.get_renderer().aclose()
+    if durable:
+        compaction.cancel()
+        memory.close()
+    pdf_text.get_extractor().close()
+    await get_gateway().aclose()
+    await rag.get_runtime().aclose()
+
 
 # Initialize FastAPI
-app=FastAPI(title="ProCode Bot API", version="1.1")
+app=FastAPI(title="ProCode Bot API", version="1.1", lifespan=lifespan)
 
 # add CORS (Allows your streamlit frontend to talk to this backend)
 app.add_middleware(
@@ -28,27 +71,35 @@ app.add_middleware(
 )
 
 # Add Memory (So the bot remembers context like "Price is $40k")
-memory = MemorySaver()
+# SQLite (WAL) by default, so conversations survive restarts and can be served by several workers
+memory = build_checkpointer()
 # we compile the graph HERE with checkpointer
 agent_app = workflow.compile(checkpointer=memory)
 
 # Vision and PDF helper
-def process_file(file_data: str, file_type: str) -> str:
-    try:
-        decoded_file = base64.b64decode(file_data)
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
 
+async def process_file(file_type: str, path: Optional[str] = None, file_data: Optional[str] = None) -> str:
+    """Turns an attachment (stored file `path`, or legacy base64 `file_data`) into prompt context."""
+    try:
         # 1. Handle PDF (Architecture/Requirements Docs)
         if "pdf" in file_type.lower():
-            pdf_file = io.BytesIO(decoded_file)
-            reader = PdfReader(pdf_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() or ""
-
+            source = path if path else base64.b64decode(file_data)
+            try:
+                # Worker process, bounded by PDF_TEXT_MAX_CHARS / PDF_TEXT_MAX_PAGES / PDF_TEXT_TIMEOUT
+                extracted = await pdf_text.get_extractor().extract(source)
+            except pdf_text.PdfExtractionTimeout:
+                return """
+                \n[SYSTEM WARNING: The user uploaded a PDF, but it could not be read in time (it may be damaged or unusually complex).
+                INSTRUCTION: Tell the user the PDF could not be processed and ask them to paste the key requirements as text or upload a smaller export.]
+                """
 
             # --- LOGIC FIX: Detect Image-Only PDF ---
-            # If extracted text is too short, it's likely a scan/screenshot
-            if len(text.strip()) < 50:
+            # Decided per page: no page read had enough text, so it's a scan/screenshot
+            if extracted["image_only"]:
                 return """
                 \n[SYSTEM WARNING: The user uploaded a PDF, but it appears to be an image-only file (scanned or screenshot) because no text could be extracted.
                 INSTRUCTION: Tell the user: "I noticed you uploaded a PDF that seems to be a screenshot or scanned image. I cannot read text from image-based PDFs. Please upload the original Image file (JPG/PNG) directly so my Vision system can analyze it for you."]
@@ -56,30 +107,25 @@ def process_file(file_data: str, file_type: str) -> str:
             
             # Formatting: Wrap in tags so the LLM knows what this is
             # We increase the limit to 10k chars to capture full architecture details
+            scanned_note = ""
+            if extracted["image_pages"]:
+                scanned_note = (f"\n[SYSTEM NOTE: {extracted['image_pages']} of the {extracted['pages_read']} pages read "
+                                "contain only images; their content is missing from the text above.]")
             return f"""
             \n<ATTACHED_PROJECT_DOCUMENT>
-            {text[:10000]}
+            {extracted["text"]}
             </ATTACHED_PROJECT_DOCUMENT>
-            \n[SYSTEM NOTE: The text above is the content of the PDF uploaded by the user. Use this as the primary source for requirements.]
+            \n[SYSTEM NOTE: The text above is the content of the PDF uploaded by the user. Use this as the primary source for requirements.]{scanned_note}
             """
 
         
         # Handle images (Using Groq vision)
         elif any(x in file_type.lower() for x in ["png","jpg","jpeg"]):
             print(" Analysing Image...")
-            vision_llm = ChatGroq(
-                api_key = os.getenv("GROQ_API_KEY"),
-                model_name = "meta-llama/llama-4-scout-17b-16e-instruct",     #vision model
-                temperature=0.1
-            )
-
-            # Create a vision message
-            msg = HumanMessage(content=[
-                {"type":"text", "text": "Describe this UI/Screenshot in technical details for a developer."},
-                {"type":"image_url","image_url":{"url":f"data:image/jpeg;base64,{file_data}"}}
-                ])
-            response = vision_llm.invoke([msg])
-            return f"\n[IMAGE ANALYSIS]: The user uploaded a screenshot. Description:\n{response.content}"
+            data = await run_in_threadpool(read_bytes, path) if path else base64.b64decode(file_data)
+            # Downscaled, cached by content hash, one shared vision client
+            description = await vision.get_analyzer().describe(data)
+            return f"\n[IMAGE ANALYSIS]: The user uploaded a screenshot. Description:\n{description}"
         
         return ""  # If not a supported file type
     except Exception as e:
@@ -91,19 +137,50 @@ def process_file(file_data: str, file_type: str) -> str:
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = "default_user"   #unique id for each conversation
-    file_data: Optional[str] = None              #base64 encoded string of file data
-    file_type: Optional[str] = None             #mime type of the file
+    attachment_id: Optional[str] = None          #id returned by POST /attachments
+    file_data: Optional[str] = None              #deprecated: base64 encoded file, use attachment_id
+    file_type: Optional[str] = None             #mime type of the file (with file_data)
+
+
+async def attachment_context(request: ChatRequest) -> str:
+    """Prompt context for the request's attachment, if any."""
+    if request.attachment_id:
+        found = uploads.get_store().get(request.attachment_id)
+        if found is None:
+            raise HTTPException(status_code=404, detail="Attachment not found or expired, please upload it again")
+        path, meta = found
+        return await process_file(meta["content_type"], path=path)
+    if request.file_data and request.file_type:
+        return await process_file(request.file_type, file_data=request.file_data)
+    return ""
+
+
+@app.post("/attachments")
+async def upload_attachment(request: Request):
+    """
+    Multipart upload of one chat attachment (field name is free, e.g. "file").
+    Returns {"attachment_id", "filename", "content_type", "size"}; pass the id to /chat.
+    """
+    upload = await uploads.receive_upload(request, UPLOAD_MAX_BYTES)
+    try:
+        content_type = (upload.content_type or "").lower()
+        if content_type not in UPLOAD_ALLOWED_TYPES:
+            raise HTTPException(status_code=415, detail=f"Unsupported attachment type '{content_type}'")
+        store = uploads.get_store()
+        meta = await run_in_threadpool(store.save, upload.file, upload.filename or "attachment", content_type)
+    finally:
+        await upload.close()
+    await run_in_threadpool(store.purge_expired)
+    return {k: meta[k] for k in ("attachment_id", "filename", "content_type", "size")}
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     try:
-            # Process file if provided
-        file_context = ""
-        if request.file_data and request.file_type:
-            file_context = process_file(request.file_data, request.file_type)
- 
+        # Process the attachment if provided
+        file_context = await attachment_context(request)
+
         # Combine user messages + file context
-            full_input = request.message + file_context
+        full_input = request.message + file_context
 
         # Define config with thread_id to maintain state
         config = {"configurable": {"thread_id": request.thread_id}}
@@ -112,27 +189,228 @@ async def chat_endpoint(request: ChatRequest):
         #input_message = HumanMessage(content=request.message)
 
         # Run the agent and get response
-        result = agent_app.invoke(
+        result = await agent_app.ainvoke(
             {"messages": [HumanMessage(content=full_input)]}, config=config
         )
 
         # extract the bot's last response
         last_message = result["messages"][-1].content
 
-        # Check for PDF in the state
-        pdf_path = result.get("pdf_path", None)
-
         # Return structured response
         return {
             "response": last_message,
-            "pdf_path": pdf_path               # will be None unless a PDF was generated
+            "job_id": result.get("proposal_job_id") or None,   # poll GET /jobs/{job_id} for the proposal
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Server Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
 
+# --- STREAMING CHAT (Server-Sent Events) ---
+ttft_recorder = LatencyRecorder()        # time to first token, per streamed request
+stream_total_recorder = LatencyRecorder()
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Same contract as /chat, but streams the answer as server-sent events:
+      progress -> {"stage", "message"}  tool/proposal steps as they start
+      token    -> {"text"}              LLM tokens from the reasoning node
+      done     -> {"response", "job_id", "ttft_ms", "total_ms"}
+      error    -> {"detail"}
+    """
+    start = time.perf_counter()
+
+    async def event_stream():
+        first_token_ms = None
+        try:
+            if request.attachment_id or request.file_data:
+                yield sse_event("progress", {"stage": "file", "message": "Reading attachment..."})
+            file_context = await attachment_context(request)
+            full_input = request.message + file_context
+            config = {"configurable": {"thread_id": request.thread_id}}
+
+            async for event in agent_app.astream_events(
+                {"messages": [HumanMessage(content=full_input)]}, config=config, version="v2"
+            ):
+                kind = event["event"]
+                if (kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "chatbot"
+                        and "internal" not in event.get("tags", [])):
+                    text = event["data"]["chunk"].content
+                    if not text:
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start) * 1000
+                        ttft_recorder.record(first_token_ms)
+                    yield sse_event("token", {"text": text})
+                elif kind == "on_custom_event" and event["name"] == "progress":
+                    yield sse_event("progress", event["data"])
+
+            state = await agent_app.aget_state(config)
+            total_ms = (time.perf_counter() - start) * 1000
+            stream_total_recorder.record(total_ms)
+            print(f"Stream done: thread={request.thread_id} ttft={first_token_ms or 0:.0f}ms total={total_ms:.0f}ms")
+            yield sse_event("done", {
+                "response": state.values["messages"][-1].content,
+                "job_id": state.values.get("proposal_job_id") or None,
+                "ttft_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                "total_ms": round(total_ms, 1),
+            })
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+        except Exception as e:
+            print(f"Server Error (stream): {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of a background job (proposal: draft -> render -> email) and its result once done."""
+    job = await run_in_threadpool(jobs.get_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = {k: v for k, v in job["result"].items() if k != "html"}
+    if "proposal_id" in result:
+        result["proposal_url"] = f"/proposals/{result['proposal_id']}"
+    if "email" in result:
+        # The email itself goes out through the outbox after the job finishes
+        email = await run_in_threadpool(outbox.get_outbox().get, result["email"]["outbox_id"])
+        if email is not None:
+            result["email"] = {**result["email"], "status": email["status"], "message_id": email["message_id"],
+                               "attempts": email["attempts"], "error": email["error"]}
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "result": result,
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+@app.get("/proposals/{proposal_id}")
+async def download_proposal(proposal_id: str, request: Request):
+    """
+    Serves a generated proposal PDF. Files never change once written, so the ETag
+    lets clients revalidate with If-None-Match (304, no body), and Range requests
+    (handled by FileResponse) let an interrupted download resume.
+    """
+    path = proposals.proposal_file(proposal_id)
+    try:
+        stat = await run_in_threadpool(os.stat, path) if path else None
+    except FileNotFoundError:
+        stat = None
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Proposal not found (it may have expired)")
+
+    etag = f'"{proposal_id}-{stat.st_size}-{int(stat.st_mtime)}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={PROPOSAL_CACHE_MAX_AGE}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="application/pdf", filename="ProCode_Proposal.pdf",
+                        stat_result=stat, headers=headers)
+
+
+# --- BATCH QUOTES ---
+class QuoteLineItem(BaseModel):
+    hours: float = Field(ge=0, le=100_000)
+    level: str                                    #a level on the rate card, e.g. "senior"
+    module: Optional[str] = None                  #free label, not used for pricing
+
+
+class QuoteScenario(BaseModel):
+    name: Optional[str] = None
+    items: List[QuoteLineItem]
+    contingency: float = Field(0.0, ge=0, le=1)  #fraction added to the subtotal
+    discount: float = Field(0.0, ge=0, le=1)     #fraction off subtotal + contingency
+    include_gst: bool = True
+
+
+class QuoteBatchRequest(BaseModel):
+    scenarios: List[QuoteScenario] = Field(min_length=1)
+    include_lines: bool = False                   #also return every line item's amount
+
+
+@app.post("/quote/batch")
+async def quote_batch(request: QuoteBatchRequest):
+    """
+    Prices every scenario (line items at rate-card rates, then contingency, discount and
+    GST) in one vectorized pass against the current rate card, whose version is returned.
+    """
+    scenarios = request.scenarios
+    counts = [len(scenario.items) for scenario in scenarios]
+    if sum(counts) > QUOTE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {QUOTE_BATCH_MAX_ITEMS} line items per request")
+    try:
+        card = pricing.get_store().get()
+    except pricing.RateCardError as e:
+        raise HTTPException(status_code=503, detail=f"Rate card unavailable: {e}")
+    try:
+        quote = pricing.quote_scenarios(
+            card,
+            hours=[item.hours for scenario in scenarios for item in scenario.items],
+            levels=[item.level for scenario in scenarios for item in scenario.items],
+            scenario_ids=np.repeat(np.arange(len(scenarios)), counts),
+            scenarios=len(scenarios),
+            contingency=[scenario.contingency for scenario in scenarios],
+            discount=[scenario.discount for scenario in scenarios],
+            include_gst=[scenario.include_gst for scenario in scenarios],
+        )
+    except pricing.RateCardError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    columns = {key: quote[key].astype(np.int64).tolist()
+               for key in ("subtotal", "contingency", "discount", "taxable", "gst", "total")}
+    results = [{"name": scenario.name, "items": count, **{key: values[i] for key, values in columns.items()}}
+               for i, (scenario, count) in enumerate(zip(scenarios, counts))]
+    if request.include_lines:
+        lines = np.split(quote["lines"].astype(np.int64), np.cumsum(counts)[:-1])
+        for result, amounts in zip(results, lines):
+            result["lines"] = amounts.tolist()
+    return {"rate_card": card.info(), "scenarios": results}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # The checkpointer counts rows in SQLite; keep that off the event loop
+    checkpointer = (await asyncio.to_thread(memory.stats) if isinstance(memory, SqliteCheckpointer)
+                    else {"backend": "memory"})
+    return {
+        "rag": rag.get_stats(),
+        "kb_prefetch": prefetcher.stats(),
+        "rate_card": pricing.get_store().stats(),
+        "llm": get_gateway().stats(),
+        "vision": vision.get_analyzer().stats(),
+        "jobs": jobs.get_pool().stats() if jobs.get_pool() else jobs.get_queue().stats(),
+        "pdf_renderer": pdf_renderer.get_renderer().stats(),
+        "proposal_retention": proposals.last_retention,
+        "email_outbox": outbox.get_dispatcher().stats() if outbox.get_dispatcher() else outbox.get_outbox().stats(),
+        "checkpointer": checkpointer,
+        "chat_stream": {
+            "ttft": ttft_recorder.summary(),
+            "total": stream_total_recorder.summary(),
+        },
+    }
+
+
 # 6. Run server (Optional: for debugging purposes only)
 if __name__ == "__main__":
     print(" Starting server...")
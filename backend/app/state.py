@@ -22,7 +22,12 @@ class AgentState(TypedDict):
 
     #Artifacts
     pdf_path: str                      #path to generated PDF file
+    proposal_job_id: str               #background job drafting/rendering/emailing the proposal
 
     #Control Flags
     next_step: str                     #Tells the graph where to go next
 
+    #Context management (see app/context.py)
+    conversation_summary: str          #Rolling summary of turns folded out of the prompt
+    summarized_upto: int               #How many messages the summary already covers
+
@@ -1,5 +1,6 @@
 import os
 import base64
+import urllib3
 from dotenv import load_dotenv
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
@@ -13,11 +14,110 @@ load_dotenv(ENV_PATH)
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_NAME = os.getenv("SENDER_NAME", "Procode Bot")
+BREVO_API_HOST = os.getenv("BREVO_API_HOST")  # optional, e.g. http://127.0.0.1:8120/v3 for scripts/fake_brevo_server.py
+
+
+SUBJECT = "Your Custom Project Proposal - ProCode Bot"
+HTML_BODY = """
+            <html>
+                <body>
+                    <h2>Hello!</h2>
+                    <p>Please find attached the project proposal generated based on your requirements.</p>
+                    <p>Best regards,<br>ProCode Team</p>
+                </body>
+            </html>
+        """
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class EmailSendError(Exception):
+    """A failed send. retryable=True for rate limits, 5xx and network errors; retry_after comes from the API."""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: float = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _retry_after(headers) -> float:
+    # Brevo sends Retry-After on some 429s and x-sib-ratelimit-reset (seconds) on others
+    for name in ("Retry-After", "x-sib-ratelimit-reset"):
+        value = headers.get(name) if headers else None
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class BrevoClient:
+    """
+    One Brevo transactional-email client shared by every send: the configuration,
+    ApiClient and its urllib3 connection pool are built once. Thread-safe.
+
+    `host` points it at another endpoint (e.g. scripts/fake_brevo_server.py).
+    """
+
+    def __init__(self, api_key: str = BREVO_API_KEY, sender_email: str = SENDER_EMAIL,
+                 sender_name: str = SENDER_NAME, host: str = None):
+        self.api_key = api_key
+        self.sender = {"name": sender_name, "email": sender_email}
+        configuration = sib_api_v3_sdk.Configuration()
+        configuration.api_key["api-key"] = api_key
+        if host:
+            configuration.host = host
+        self.api = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+
+    def send(self, recipient_groups: list, pdf_path: str) -> list:
+        """
+        Sends `pdf_path` to each group of recipients in one API call (one message
+        version per group, so groups don't see each other's addresses). Reads and
+        encodes the PDF in the calling thread. Returns one message id per group.
+        """
+        if not self.api_key or not self.sender["email"]:
+            raise EmailSendError("Missing API keys or sender email in .env")
+        try:
+            with open(pdf_path, "rb") as f:
+                encoded_content = base64.b64encode(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise EmailSendError(f'File "{pdf_path}" not found.')
+
+        email = sib_api_v3_sdk.SendSmtpEmail(
+            sender=self.sender,
+            subject=SUBJECT,
+            html_content=HTML_BODY,
+            attachment=[{"content": encoded_content, "name": os.path.basename(pdf_path)}],
+        )
+        if len(recipient_groups) == 1:
+            email.to = [{"email": e} for e in recipient_groups[0]]
+        else:
+            email.message_versions = [{"to": [{"email": e} for e in group]} for group in recipient_groups]
+
+        try:
+            response = self.api.send_transac_email(email)
+        except ApiException as e:
+            raise EmailSendError(f"Brevo API error {e.status}: {e.reason}",
+                                 retryable=e.status in RETRYABLE_STATUS, retry_after=_retry_after(e.headers))
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            # Connection refused / reset / timeout
+            raise EmailSendError(f"Brevo API unreachable: {e}", retryable=True)
+        return response.message_ids or [response.message_id] * len(recipient_groups)
+
+
+_client = None
+
+
+def get_client() -> BrevoClient:
+    global _client
+    if _client is None:
+        _client = BrevoClient(host=BREVO_API_HOST)
+    return _client
 
 
 def send_proposal_email(pdf_path: str, recipient_email):
     """
-    Sends the proposal PDF to one or multiple users via Brevo (Sendinblue).
+    Sends the proposal PDF to one or multiple users via Brevo (Sendinblue), right now.
+    The proposal jobs go through the durable outbox (app/outbox.py) instead.
 
     Args:
         pdf_path (str): Path to the generated PDF.
@@ -27,10 +127,6 @@ def send_proposal_email(pdf_path: str, recipient_email):
         dict: API response or error status.
     """
 
-    # Validate API key
-    if not BREVO_API_KEY or not SENDER_EMAIL:
-        return {"status": "error", "message": "Missing API keys or sender email in .env"}
-
     # Normalize email input (single or multiple)
     if isinstance(recipient_email, str):
         recipient_list = [recipient_email]
@@ -41,54 +137,14 @@ def send_proposal_email(pdf_path: str, recipient_email):
 
     print(f"Preparing to send email to: {recipient_list}")
 
-    # Configure API client
-    configuration = sib_api_v3_sdk.Configuration()
-    configuration.api_key["api-key"] = BREVO_API_KEY
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-        sib_api_v3_sdk.ApiClient(configuration)
-    )
-
-    # Prepare attachment
-    try:
-        with open(pdf_path, "rb") as f:
-            pdf_content = f.read()
-            encoded_content = base64.b64encode(pdf_content).decode("utf-8")
-
-        filename = os.path.basename(pdf_path)
-
-    except FileNotFoundError:
-        return {"status": "error", "message": f'File "{pdf_path}" not found.'}
-
-    # Construct email object
-    send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-        to=[{"email": email} for email in recipient_list],
-        sender={"name": SENDER_NAME, "email": SENDER_EMAIL},
-        subject="Your Custom Project Proposal - ProCode Bot",
-        html_content="""
-            <html>
-                <body>
-                    <h2>Hello!</h2>
-                    <p>Please find attached the project proposal generated based on your requirements.</p>
-                    <p>Best regards,<br>ProCode Team</p>
-                </body>
-            </html>
-        """,
-        attachment=[
-            {
-                "content": encoded_content,
-                "name": filename
-            }
-        ],
-    )
-
     # Send email via Brevo
     try:
-        api_response = api_instance.send_transac_email(send_smtp_email)
-        print(f"Email sent successfully! Message ID: {api_response.message_id}")
+        message_id = get_client().send([recipient_list], pdf_path)[0]
+        print(f"Email sent successfully! Message ID: {message_id}")
 
-        return {"status": "success", "message_id": api_response.message_id}
+        return {"status": "success", "message_id": message_id}
 
-    except ApiException as e:
+    except EmailSendError as e:
         print(f"Error sending email: {e}")
         return {"status": "error", "message": str(e)}
 
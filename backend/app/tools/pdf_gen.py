@@ -2,9 +2,11 @@ import os
 import uuid
 from weasyprint import HTML, CSS
 
+from app import config
+
 # Path to save the pdf
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-OUTPUT_FOLDER = os.path.join(BASE_DIR, "generated_proposals")
+OUTPUT_FOLDER = config.PDF_OUTPUT_DIR
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 # --- UPDATED CSS ---
@@ -70,7 +72,21 @@ DEFAULT_CSS = CSS(string="""
     }
 """)
 
+def write_atomic(file_path:str, data:bytes):
+    """Writes via a temp file + rename, so readers (download, email) never see a half-written PDF."""
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def create_pdf(html_content:str, filename:str=None) -> str:
+    """Renders in the calling process. The proposal jobs use the warm pool in app/pdf_renderer.py instead."""
     if not filename:
         filename = f"proposal_{uuid.uuid4().hex[:8]}.pdf"
     if not filename.endswith(".pdf"):
@@ -80,7 +96,8 @@ def create_pdf(html_content:str, filename:str=None) -> str:
     print(f"Generating pdf: {filename}...")
     try:
         # base_url is needed if you use local images
-        HTML(string=html_content, base_url=BASE_DIR).write_pdf(file_path, stylesheets=[DEFAULT_CSS])
+        pdf_bytes = HTML(string=html_content, base_url=BASE_DIR).write_pdf(stylesheets=[DEFAULT_CSS])
+        write_atomic(file_path, pdf_bytes)
         print(f"PDF saved at: {file_path}")
         return file_path
     except Exception as e:
@@ -1,3 +1,203 @@
+import os
+import json
+import time
+import threading
+from typing import Sequence
+
+import numpy as np
+
+from app import config
+
+
+class RateCardError(ValueError):
+    """The rate card file is missing or invalid, or a quote names a level it doesn't have."""
+
+
+class RateCard:
+    """
+    One version of the rate card: hourly rate per resource level plus tax settings.
+
+    Loaded from JSON like
+        {"version": "2026-10-01", "currency": "INR", "default_level": "mid", "gst_rate": 0.18,
+         "rates": {"junior": 100, "mid": 250, "senior": 500, "expert": 1000}}
+    """
+
+    def __init__(self, version: str, rates: dict, default_level: str, gst_rate: float = 0.0,
+                 currency: str = "INR"):
+        if not isinstance(rates, dict) or not rates:
+            raise RateCardError("rate card needs a non-empty 'rates' object")
+        for level, rate in rates.items():
+            if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate < 0:
+                raise RateCardError(f"rate for '{level}' must be a non-negative number, got {rate!r}")
+        if default_level not in rates:
+            raise RateCardError(f"default level '{default_level}' has no rate")
+        if not isinstance(gst_rate, (int, float)) or not 0 <= gst_rate < 1:
+            raise RateCardError(f"gst_rate must be in [0, 1), got {gst_rate!r}")
+        self.version = str(version)
+        self.currency = currency
+        self.rates = {level.lower(): rate for level, rate in rates.items()}
+        self.default_level = default_level.lower()
+        self.gst_rate = float(gst_rate)
+        self.levels = list(self.rates)
+        self.rate_array = np.array([self.rates[level] for level in self.levels], dtype=np.float64)
+        self._index = {level: i for i, level in enumerate(self.levels)}
+
+    @classmethod
+    def from_file(cls, path: str) -> "RateCard":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            fields = dict(version=data["version"], rates=data["rates"], default_level=data.get("default_level", "mid"),
+                          gst_rate=data.get("gst_rate", 0.0), currency=data.get("currency", "INR"))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            raise RateCardError(f"can't load rate card {path}: {e!r}") from e
+        return cls(**fields)
+
+    def resolve_level(self, text: str) -> str:
+        """
+        Free-text level to a card level, the way pricing always did it: an exact name,
+        else the first level named inside the text (most expensive first, e.g. 'Senior
+        Developer' -> senior), else the default level.
+        """
+        level = text.lower().strip()
+        if level in self.rates:
+            return level
+        for name in sorted(self.levels, key=lambda name: -self.rates[name]):
+            if name != self.default_level and name in level:
+                return name
+        return self.default_level
+
+    def level_indices(self, levels: Sequence[str]) -> np.ndarray:
+        """Level names to indices into `rate_array`; unknown names raise RateCardError."""
+        index = self._index
+        try:
+            return np.fromiter((index[level] for level in levels), dtype=np.int64, count=len(levels))
+        except KeyError:
+            pass
+        # Slow path only for odd input: any casing, and a useful error for unknown names
+        unknown = sorted({str(level) for level in levels if str(level).lower() not in index})
+        if unknown:
+            raise RateCardError(f"unknown level(s) {', '.join(unknown)}; "
+                                f"rate card {self.version} has {', '.join(self.levels)}")
+        return np.fromiter((index[str(level).lower()] for level in levels), dtype=np.int64, count=len(levels))
+
+    def info(self) -> dict:
+        return {"version": self.version, "currency": self.currency, "rates": self.rates,
+                "default_level": self.default_level, "gst_rate": self.gst_rate}
+
+
+class RateCardStore:
+    """
+    The current rate card, reloaded when its file changes.
+
+    The file's mtime and size are checked at most once every `check_interval`
+    seconds. A file that fails to load keeps the previous card in service; the
+    error shows up in `stats()` until a good version is written.
+    """
+
+    def __init__(self, path: str, check_interval: float = 2.0, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._card = None
+        self._signature = None
+        self._checked_at = None
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.loaded_at = None
+        self.get()
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> RateCard:
+        now = self._clock()
+        if self._card is not None and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._card
+        with self._lock:
+            self._checked_at = now
+            try:
+                signature = self._file_signature()
+                if signature != self._signature:
+                    card = RateCard.from_file(self.path)
+                    if self._card is not None:
+                        print(f"Pricing: rate card reloaded, version {self._card.version} -> {card.version}")
+                        self.reloads += 1
+                    self._card, self._signature = card, signature
+                    self.loaded_at = time.time()
+                    self.last_error = None
+            except (OSError, RateCardError) as e:
+                if self._card is None:
+                    raise RateCardError(str(e)) from e
+                if str(e) != self.last_error:     # once per broken version, not on every check
+                    print(f"Pricing: keeping rate card {self._card.version}, reload failed: {e}")
+                    self.errors += 1
+                self.last_error = str(e)
+            return self._card
+
+    def stats(self) -> dict:
+        card = self._card
+        return {
+            "path": self.path,
+            "version": card.version if card else None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reload_errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def quote_scenarios(card: RateCard, hours, levels, scenario_ids, scenarios: int,
+                    contingency=0.0, discount=0.0, include_gst=True) -> dict:
+    """
+    Prices many line items across many scenarios in a few array operations.
+
+    `hours`, `levels` and `scenario_ids` have one entry per line item; `contingency`,
+    `discount` and `include_gst` are scalars or one value per scenario. Per scenario:
+        subtotal    = sum of hours x rate over its lines
+        contingency = subtotal x contingency
+        discount    = (subtotal + contingency) x discount
+        taxable     = subtotal + contingency - discount
+        gst         = taxable x card.gst_rate (when included)
+        total       = taxable + gst
+    Amounts are rounded to whole currency units (half to even) at each step, so the
+    parts always add up to the total. Returns arrays keyed by those names, plus "lines".
+    """
+    hours = np.asarray(hours, dtype=np.float64)
+    scenario_ids = np.asarray(scenario_ids, dtype=np.int64)
+    if hours.shape != scenario_ids.shape or len(levels) != len(hours):
+        raise ValueError("hours, levels and scenario_ids need one entry per line item")
+    if np.any(hours < 0) or not np.all(np.isfinite(hours)):
+        raise ValueError("hours must be finite and non-negative")
+    if len(scenario_ids) and (scenario_ids.min() < 0 or scenario_ids.max() >= scenarios):
+        raise ValueError("scenario id out of range")
+
+    lines = np.rint(hours * card.rate_array[card.level_indices(levels)]) if len(hours) else np.zeros(0)
+    subtotal = np.bincount(scenario_ids, weights=lines, minlength=scenarios)
+    contingency = np.rint(subtotal * np.broadcast_to(np.asarray(contingency, dtype=np.float64), (scenarios,)))
+    discount = np.rint((subtotal + contingency) * np.broadcast_to(np.asarray(discount, dtype=np.float64), (scenarios,)))
+    taxable = subtotal + contingency - discount
+    gst = np.rint(taxable * card.gst_rate) * np.broadcast_to(np.asarray(include_gst, dtype=bool), (scenarios,))
+    return {"lines": lines, "subtotal": subtotal, "contingency": contingency, "discount": discount,
+            "taxable": taxable, "gst": gst, "total": taxable + gst}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> RateCardStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RateCardStore(config.RATE_CARD_PATH, check_interval=config.RATE_CARD_CHECK_INTERVAL)
+    return _store
+
+
 def calculate_project_price(estimated_hours: int, resource_levl: str="mid") -> int:
     """
     calculates the total cost based on hours and developer seniority.
@@ -8,26 +208,11 @@ def calculate_project_price(estimated_hours: int, resource_levl: str="mid") -> i
         int: The total calculated price in INR.
     """
 
-# Define hourly rates for different levels
-    RATES={
-        "junior":100,
-        "mid":250,
-        "senior":500,
-        "expert":1000
-    }
-
-    # Normalize input
-    level=resource_levl.lower().strip()
-
-    # partial matching: if 'senior' is in string. map it to 'senior'
-    if "expert" in level:
-        rate=RATES["expert"]
-    elif "senior" in level:
-        rate=RATES["senior"]
-    elif "junior" in level:
-        rate=RATES["junior"]
-    else:
-        rate=RATES["mid"] #default to mid if unclear
+    # Hourly rates come from the rate card (app/rate_card.json, reloaded when it changes)
+    card = get_store().get()
+
+    # partial matching: if 'senior' is in string. map it to 'senior'; default to mid if unclear
+    rate = card.rates[card.resolve_level(resource_levl)]
 
     # Price calculator
 
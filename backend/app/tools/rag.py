@@ -1,53 +1,408 @@
 import os
+import time
+import asyncio
+import uuid
+import threading
 from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+
+from app import config
+from app.tools.rag_cache import EmbeddingCache, SemanticResultCache
 
 # Load env vars
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = "procode_knowledge"
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+# --- PAYLOAD SCHEMA ---
+# scripts/ingest.py stores these under `metadata` and indexes them; lookups can filter on them,
+# e.g. lookup_projects(query="refund terms", type="pricing_policy", year=2024)
+FILTER_FIELDS = {
+    "type": ("metadata.doc_type", str),
+    "domain": ("metadata.domain", str),
+    "year": ("metadata.year", int),
+    "page": ("metadata.page", int),
+}
+
+# Document type is decided per file (file name first, then text)
+DOC_TYPE_KEYWORDS = {
+    "pricing_policy": ["pricing", "price list", "rate card", "payment terms", "policy"],
+    "catalog": ["catalog", "catalogue"],
+    "proposal": ["proposal", "quotation"],
+    "case_study": ["case study", "case-study", "portfolio"],
+}
+
+# Project domain is decided per chunk
+DOMAIN_KEYWORDS = {
+    "ecommerce": ["e-commerce", "ecommerce", "online store", "shopping cart", "marketplace"],
+    "healthcare": ["hospital", "clinic", "patient", "health", "pharmacy"],
+    "education": ["school", "student", "learning", "course", "lms"],
+    "finance": ["bank", "fintech", "loan", "accounting", "invoice", "payroll"],
+    "hospitality": ["hotel", "restaurant", "travel", "booking"],
+    "logistics": ["delivery", "fleet", "logistics", "warehouse", "inventory"],
+    "real_estate": ["real estate", "property", "rental", "tenant"],
+}
+
+
+def build_filter(filters: dict):
+    """Turns lookup_projects filters into a Qdrant Filter (None when there are none)."""
+    if not filters:
+        return None
+    return models.Filter(must=[
+        models.FieldCondition(key=FILTER_FIELDS[key][0], match=models.MatchValue(value=value))
+        for key, value in sorted(filters.items())
+    ])
+
+
+def filter_scope(filters: dict) -> str:
+    """Stable cache key for a set of filters."""
+    return ",".join(f"{key}={value}" for key, value in sorted((filters or {}).items()))
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str = COLLECTION_NAME):
+    """Creates the keyword/integer payload indexes used by filtered lookups (idempotent)."""
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field, cast in FILTER_FIELDS.values():
+        if field in existing:
+            continue
+        schema = models.PayloadSchemaType.INTEGER if cast is int else models.PayloadSchemaType.KEYWORD
+        client.create_payload_index(collection_name=collection_name, field_name=field, field_schema=schema)
+        print(f" Created payload index on '{field}' ({schema.value}).")
+
+
+# Knowledge-base version marker: a single point in a tiny side collection.
+# scripts/ingest.py bumps it after every write so result caches can drop stale answers.
+VERSION_POINT_ID = 1
+
+
+def version_collection_name(collection_name: str = COLLECTION_NAME) -> str:
+    return f"{collection_name}__version"
+
+
+def bump_collection_version(client: QdrantClient, collection_name: str = COLLECTION_NAME) -> str:
+    """Records that `collection_name` changed. Returns the new version id."""
+    marker = version_collection_name(collection_name)
+    if not client.collection_exists(marker):
+        client.create_collection(
+            collection_name=marker,
+            vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+        )
+    version = uuid.uuid4().hex
+    client.upsert(
+        collection_name=marker,
+        points=[models.PointStruct(
+            id=VERSION_POINT_ID,
+            vector=[1.0],
+            payload={"collection": collection_name, "version": version, "updated_at": time.time()},
+        )],
+        wait=True,
+    )
+    return version
+
+
+def read_collection_version(client: QdrantClient, collection_name: str = COLLECTION_NAME):
+    """Returns the current version id, or None if ingest has never written one."""
+    marker = version_collection_name(collection_name)
+    if not client.collection_exists(marker):
+        return None
+    points = client.retrieve(collection_name=marker, ids=[VERSION_POINT_ID])
+    return points[0].payload.get("version") if points else None
+
+
+async def aread_collection_version(client: AsyncQdrantClient, collection_name: str = COLLECTION_NAME):
+    """Async twin of `read_collection_version`."""
+    marker = version_collection_name(collection_name)
+    if not await client.collection_exists(marker):
+        return None
+    points = await client.retrieve(collection_name=marker, ids=[VERSION_POINT_ID])
+    return points[0].payload.get("version") if points else None
+
 
-def retrieve_similar_projects(query:str):
+class RetrievalRuntime:
     """
-    Searches the knowledge base for relevant past projects or policies.
+    Owns the embedding model and the Qdrant client for the life of the process.
+
+    Both are created lazily on first use (or eagerly via `warm_up`) and then shared
+    by every lookup. Creation is guarded by a lock so concurrent /chat requests
+    never load the ONNX model twice; after that, QdrantClient (pooled HTTP) and the
+    FastEmbed session are safe to call from several threads at once.
+
+    The async path (`aretrieve`) uses an AsyncQdrantClient and runs the CPU-bound
+    embedding in a worker thread, so lookups never block the event loop.
     """
-    print(f"RAG Tool Called: Searching for '{query}'...")
-    try:
-        #1. Connect to qdrant
-        client=QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
 
-        #2. Initialise embeddings model
-        embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
+    def __init__(self, url=None, api_key=None, model_name=EMBEDDING_MODEL,
+                 collection_name=COLLECTION_NAME, client=None, async_client=None,
+                 embedding_cache=None, result_cache=None, version_check_interval=5.0):
+        self.url = url
+        self.api_key = api_key
+        self.model_name = model_name
+        self.collection_name = collection_name
+        self.embedding_cache = embedding_cache
+        self.result_cache = result_cache
+        self.version_check_interval = version_check_interval
+        self._client = client
+        self._async_client = async_client
+        self._embeddings = None
+        self._lock = threading.Lock()
+        self._version_checked_at = None
+
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = QdrantClient(url=self.url, api_key=self.api_key)
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncQdrantClient(url=self.url, api_key=self.api_key)
+        return self._async_client
+
+    @property
+    def embeddings(self) -> FastEmbedEmbeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = FastEmbedEmbeddings(model_name=self.model_name)
+        return self._embeddings
+
+    def warm_up(self):
+        """Loads the model, runs one embedding and opens the Qdrant connection."""
+        self.embeddings.embed_query("warm up")
+        self.client.collection_exists(self.collection_name)
+
+    async def awarm_up(self):
+        await asyncio.to_thread(self.warm_up)
+        await self.async_client.collection_exists(self.collection_name)
+
+    def embed_query(self, query: str):
+        if self.embedding_cache is None:
+            return self.embeddings.embed_query(query)
 
-        #3. Create Query vector
-        query_vector = embeddings.embed_query(query)
+        vector = self.embedding_cache.get(query)
+        if vector is None:
+            vector = self.embedding_cache.put(query, self.embeddings.embed_query(query))
+        return vector
 
-        #4. Perform Search (Using new query_points API)
-        search_result = client.query_points(
-            collection_name=COLLECTION_NAME,
+    async def aembed_query(self, query: str):
+        if self.embedding_cache is not None:
+            vector = self.embedding_cache.get(query)
+            if vector is not None:
+                return vector
+        # ONNX inference is CPU-bound: keep it off the event loop
+        return await asyncio.to_thread(self.embed_query, query)
+
+    def search(self, query: str, limit: int = 3, query_vector=None, filters=None):
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+        return self.client.query_points(
+            collection_name=self.collection_name,
             query=query_vector,
-            limit=3,
+            query_filter=build_filter(filters),
+            limit=limit,
         ).points
 
+    # Re-read the version marker at most once per interval, not on every lookup
+    def _sync_result_cache(self):
+        if self._version_check_due():
+            self.result_cache.sync_version(read_collection_version(self.client, self.collection_name))
+
+    async def _async_sync_result_cache(self):
+        if self._version_check_due():
+            version = await aread_collection_version(self.async_client, self.collection_name)
+            self.result_cache.sync_version(version)
+
+    def _version_check_due(self) -> bool:
+        now = time.monotonic()
+        if (self._version_checked_at is not None
+                and now - self._version_checked_at < self.version_check_interval):
+            return False
+        self._version_checked_at = now
+        return True
+
+    def retrieve(self, query: str, limit: int = 3, filters=None) -> str:
+        """Embeds, searches and formats, serving near-duplicate queries from the result cache."""
+        start = time.perf_counter()
+        scope = filter_scope(filters)
+        query_vector = self.embed_query(query)
+
+        if self.result_cache is not None:
+            self._sync_result_cache()
+            cached = self.result_cache.get(query_vector, lookup_ms=(time.perf_counter() - start) * 1000,
+                                           scope=scope)
+            if cached is not None:
+                return cached
+
+        search_result = self.search(query, limit=limit, query_vector=query_vector, filters=filters)
         if not search_result:
             return f"No results found for {query}"
-        
-        # 5. Format the Output
-        results = []
-        for hit in search_result:
-            #Safely get content from payload
-            content = hit.payload.get("page_content","No content available")
-            source=hit.payload.get("metadata",{}).get("source","Unknown")
-            results.append(f"--- Snippet from {source} ---\n{content}")
-
-        return "\n\n".join(results)
+
+        formatted = format_results(search_result)
+        if self.result_cache is not None:
+            self.result_cache.put(query_vector, formatted, (time.perf_counter() - start) * 1000, scope=scope)
+        return formatted
+
+    async def aretrieve(self, query: str, limit: int = 3, filters=None) -> str:
+        """Async twin of `retrieve`."""
+        start = time.perf_counter()
+        scope = filter_scope(filters)
+        query_vector = await self.aembed_query(query)
+
+        if self.result_cache is not None:
+            await self._async_sync_result_cache()
+            cached = self.result_cache.get(query_vector, lookup_ms=(time.perf_counter() - start) * 1000,
+                                           scope=scope)
+            if cached is not None:
+                return cached
+
+        search_result = (await self.async_client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            query_filter=build_filter(filters),
+            limit=limit,
+        )).points
+        if not search_result:
+            return f"No results found for {query}"
+
+        formatted = format_results(search_result)
+        if self.result_cache is not None:
+            self.result_cache.put(query_vector, formatted, (time.perf_counter() - start) * 1000, scope=scope)
+        return formatted
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> RetrievalRuntime:
+    """Returns the process-wide retrieval runtime, creating it on first call."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                embedding_cache = None
+                if config.EMBEDDING_CACHE_ENABLED:
+                    embedding_cache = EmbeddingCache(
+                        max_size=config.EMBEDDING_CACHE_SIZE,
+                        ttl=config.EMBEDDING_CACHE_TTL,
+                    )
+                result_cache = None
+                if config.RESULT_CACHE_ENABLED:
+                    result_cache = SemanticResultCache(
+                        threshold=config.RESULT_CACHE_THRESHOLD,
+                        max_size=config.RESULT_CACHE_SIZE,
+                        ttl=config.RESULT_CACHE_TTL,
+                    )
+                _runtime = RetrievalRuntime(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY,
+                    embedding_cache=embedding_cache,
+                    result_cache=result_cache,
+                    version_check_interval=config.RESULT_CACHE_VERSION_CHECK_INTERVAL,
+                )
+    return _runtime
+
+
+def set_runtime(runtime: RetrievalRuntime):
+    """Swaps the shared runtime (benchmarks point it at an in-memory Qdrant)."""
+    global _runtime
+    with _runtime_lock:
+        _runtime = runtime
+
+
+def warm_up():
+    """Startup hook: pay the model load and connection cost before the first request."""
+    print("RAG Runtime: warming up embedding model and Qdrant connection...")
+    try:
+        get_runtime().warm_up()
+        print("RAG Runtime: ready.")
+    except Exception as e:
+        # Don't block startup; the first lookup will retry lazily.
+        print(f"RAG Runtime: warm-up failed: {e}")
+
+
+async def awarm_up():
+    """Async startup hook; also opens the AsyncQdrantClient used by /chat."""
+    print("RAG Runtime: warming up embedding model and Qdrant connections...")
+    try:
+        await get_runtime().awarm_up()
+        print("RAG Runtime: ready.")
+    except Exception as e:
+        print(f"RAG Runtime: warm-up failed: {e}")
+
+
+def get_stats() -> dict:
+    """Cache counters for the /metrics endpoint."""
+    runtime = get_runtime()
+    disabled = {"enabled": False}
+    return {
+        "embedding_cache": runtime.embedding_cache.stats() if runtime.embedding_cache else disabled,
+        "result_cache": runtime.result_cache.stats() if runtime.result_cache else disabled,
+    }
+
+
+def format_results(search_result) -> str:
+    results = []
+    for hit in search_result:
+        #Safely get content from payload
+        content = hit.payload.get("page_content","No content available")
+        metadata = hit.payload.get("metadata",{})
+        source = metadata.get("source","Unknown")
+        if metadata.get("page"):
+            source = f"{source}, page {metadata['page']}"
+        results.append(f"--- Snippet from {source} ---\n{content}")
+    return "\n\n".join(results)
+
+
+def retrieve_similar_projects(query:str, filters: dict = None):
+    """
+    Searches the knowledge base for relevant past projects or policies.
+
+    Args:
+        query (str): Free-text search.
+        filters (dict): Optional payload filters, keys from FILTER_FIELDS (see LookupProjects.filters).
+    """
+    print(f"RAG Tool Called: Searching for '{query}' {filters or ''}...")
+    try:
+        return get_runtime().retrieve(query, limit=3, filters=filters)
+    except Exception as e:
+        print(f"RAG Error: {e}")
+        return f"Error retrieving similar projects: {str(e)}"
+
+
+async def aretrieve_similar_projects(query: str, filters: dict = None):
+    """
+    Async version of `retrieve_similar_projects`, used by the graph.
+    """
+    print(f"RAG Tool Called: Searching for '{query}' {filters or ''}...")
+    try:
+        return await get_runtime().aretrieve(query, limit=3, filters=filters)
     except Exception as e:
         print(f"RAG Error: {e}")
         return f"Error retrieving similar projects: {str(e)}"
-    
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
     #Fix path to load .env correctly for testing
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     load_dotenv(os.path.join(os.path.dirname(BASE_DIR), ".env"))
-    print(retrieve_similar_projects('Project pricing'))
\ No newline at end of file
+    QDRANT_URL = os.getenv("QDRANT_URL")
+    QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+    print(retrieve_similar_projects('Project pricing'))
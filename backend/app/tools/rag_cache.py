@@ -0,0 +1,178 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases and collapses whitespace so trivially different queries share a key."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU + TTL cache of query embeddings.
+
+    Vectors are stored as float32 numpy arrays (1.5 KB for a 384-d BGE vector)
+    and keyed on the normalized query text. Thread-safe.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, query: str):
+        key = normalize_query(query)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, vector = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector):
+        key = normalize_query(query)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SemanticResultCache:
+    """
+    Reuses formatted top-k results for queries that are semantically close to a cached one.
+
+    A lookup is a hit when the cosine similarity between the new query vector and a
+    cached query vector is at least `threshold` and both used the same `scope`
+    (the lookup's payload filters). Every entry belongs to one
+    knowledge-base version; `sync_version` drops everything when ingest bumps it.
+    Thread-safe.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 256, ttl: float = 900.0,
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)   # unit vectors, one row per entry
+        self._entries = []                                    # [expires_at, result, latency_ms, scope]
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_latency_ms = 0.0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def sync_version(self, version):
+        """Clears the cache if the knowledge base changed since entries were stored."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._reset()
+                self.version = version
+
+    def _reset(self):
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._entries = []
+
+    def _drop(self, keep: np.ndarray):
+        self._vectors = self._vectors[keep]
+        self._entries = [e for e, k in zip(self._entries, keep) if k]
+
+    def get(self, vector, lookup_ms: float = 0.0, scope: str = ""):
+        """Returns the cached result for the nearest same-scope query within the threshold, or None."""
+        query = self._unit(vector)
+        now = self._clock()
+        with self._lock:
+            if self._entries:
+                alive = np.array([e[0] > now for e in self._entries])
+                if not alive.all():
+                    self._drop(alive)
+            if self._entries:
+                scores = self._vectors @ query
+                scores[[e[3] != scope for e in self._entries]] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    _, result, latency_ms, _ = self._entries[best]
+                    self.hits += 1
+                    self.saved_latency_ms += max(latency_ms - lookup_ms, 0.0)
+                    return result
+            self.misses += 1
+            return None
+
+    def put(self, vector, result: str, latency_ms: float, scope: str = ""):
+        query = self._unit(vector)
+        with self._lock:
+            if not self._entries:
+                self._vectors = query[np.newaxis, :]
+            else:
+                self._vectors = np.vstack([self._vectors, query])
+            self._entries.append([self._clock() + self.ttl, result, latency_ms, scope])
+            if len(self._entries) > self.max_size:
+                keep = np.ones(len(self._entries), dtype=bool)
+                keep[: len(self._entries) - self.max_size] = False   # oldest first
+                self._drop(keep)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_latency_ms": round(self.saved_latency_ms, 1),
+            }
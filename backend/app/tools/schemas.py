@@ -0,0 +1,47 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.tools.rag import DOC_TYPE_KEYWORDS, DOMAIN_KEYWORDS
+
+# --- TOOL ARGUMENTS (bound to the chat model with bind_tools) ---
+# The class docstrings and field descriptions are what the model sees as the tool spec;
+# the titles are the tool names it calls.
+EMAIL_PATTERN = r"^[\w\.+-]+@[\w-]+(\.[\w-]+)+$"
+
+
+class LookupProjects(BaseModel):
+    """Search the knowledge base: past projects, catalogs, case studies, proposals and pricing policies."""
+
+    model_config = ConfigDict(title="lookup_projects")
+
+    query: str = Field(min_length=1, max_length=300, description="What to search for, e.g. 'hospital booking app'")
+    type: Optional[Literal[tuple(DOC_TYPE_KEYWORDS)]] = Field(None, description="Only documents of this type")
+    domain: Optional[Literal[tuple(DOMAIN_KEYWORDS)]] = Field(None, description="Only projects in this domain")
+    year: Optional[int] = Field(None, ge=2000, le=2100, description="Only documents from this year")
+
+    def filters(self) -> dict:
+        """The payload filters understood by `aretrieve_similar_projects`."""
+        return {key: value for key, value in (("type", self.type), ("domain", self.domain), ("year", self.year))
+                if value is not None}
+
+
+class CalculatePrice(BaseModel):
+    """Calculate the exact project price in INR from the estimated hours and resource level."""
+
+    model_config = ConfigDict(title="calculate_price")
+
+    hours: int = Field(ge=1, le=20000, description="Estimated effort, e.g. simple=50, mid=100, complex=300")
+    # Any text: resolved against the current rate card, whose levels the agent lists in the spec
+    level: str = Field("mid", min_length=1, max_length=40, description="Seniority of the team, a rate card level")
+
+
+class GenerateProposal(BaseModel):
+    """Draft the proposal PDF for the calculated price and email it to the client."""
+
+    model_config = ConfigDict(title="generate_proposal")
+
+    email: str = Field(pattern=EMAIL_PATTERN, description="The client's email address, as they gave it")
+
+
+TOOL_SCHEMAS = {schema.model_config["title"]: schema for schema in (LookupProjects, CalculatePrice, GenerateProposal)}
@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import contextlib
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app import config
+
+ATTACHMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class AttachmentStore:
+    """
+    Uploaded chat attachments on local disk, addressed by a random attachment ID.
+
+    Each attachment is `<id>.bin` plus a `<id>.json` sidecar (filename, content type,
+    size, created_at). Files are written to a temp name and renamed into place, so
+    every uvicorn worker on the host sees either the whole file or nothing.
+    Attachments older than `ttl` seconds are removed by `purge_expired`.
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 3600, clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self._clock = clock
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, attachment_id: str):
+        base = os.path.join(self.directory, attachment_id)
+        return base + ".bin", base + ".json"
+
+    def save(self, source, filename: str, content_type: str) -> dict:
+        """Copies the readable binary `source` into the store in chunks. Blocking: run in a thread."""
+        attachment_id = uuid.uuid4().hex
+        data_path, meta_path = self._paths(attachment_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(source, f, COPY_CHUNK_BYTES)
+                size = f.tell()
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        meta = {
+            "attachment_id": attachment_id,
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "created_at": self._clock(),
+        }
+        with open(meta_path + ".part", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".part", meta_path)
+        return meta
+
+    def get(self, attachment_id: str) -> Optional[tuple]:
+        """Returns (data_path, meta) for a live attachment, or None."""
+        if not ATTACHMENT_ID_PATTERN.match(attachment_id or ""):
+            return None
+        data_path, meta_path = self._paths(attachment_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl and meta["created_at"] < self._clock() - self.ttl:
+            return None
+        return data_path, meta
+
+    def purge_expired(self) -> int:
+        removed = 0
+        cutoff = self._clock() - self.ttl
+        for entry in os.scandir(self.directory):
+            # Every uvicorn worker purges the same directory, so a file may already be
+            # gone by the time we stat or unlink it (blob and sidecar alike)
+            with contextlib.suppress(FileNotFoundError):
+                # Stale .part files are leftovers from interrupted uploads
+                if self.ttl and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += entry.name.endswith(".bin")
+        return removed
+
+
+async def limited_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """Request body chunks; aborts with 413 as soon as more than `max_bytes` arrive."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Attachment exceeds the {max_bytes // 2**20} MB limit")
+        yield chunk
+
+
+async def receive_upload(request: Request, max_bytes: int) -> UploadFile:
+    """
+    Parses a multipart request with a single file field, streaming the body into a
+    SpooledTemporaryFile (memory up to 1 MB, disk beyond) instead of buffering it.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload")
+    # Reject early when the client announces an oversized body; the stream check catches the rest
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Attachment exceeds the {max_bytes // 2**20} MB limit")
+
+    parser = MultiPartParser(request.headers, limited_stream(request, max_bytes), max_files=1, max_fields=10)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    upload = next((v for _, v in form.multi_items() if isinstance(v, UploadFile)), None)
+    if upload is None:
+        raise HTTPException(status_code=400, detail="No file in the upload")
+    return upload
+
+
+_store = None
+
+
+def get_store() -> AttachmentStore:
+    global _store
+    if _store is None:
+        _store = AttachmentStore(config.UPLOAD_DIR, ttl=config.UPLOAD_TTL)
+    return _store
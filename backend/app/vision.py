@@ -0,0 +1,193 @@
+import io
+import os
+import time
+import base64
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Optional
+
+from PIL import Image, ImageOps
+from langchain_core.messages import HumanMessage
+
+from app import config
+from app.llm_gateway import get_gateway
+
+VISION_PROMPT = "Describe this UI/Screenshot in technical details for a developer."
+
+
+def prepare_image(data: bytes, max_side: int = 1280, quality: int = 85) -> bytes:
+    """
+    Downscales the image so its longer side is at most `max_side` and re-encodes it
+    as JPEG. Screenshots straight from a 4K/retina display shrink 5-20x, and the
+    vision model resizes larger inputs anyway. CPU-bound: run it in a thread.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel: flatten transparent screenshots onto white
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+class VisionCache:
+    """
+    Image descriptions in SQLite, keyed by a hash of the image bytes plus the
+    model/prompt/preprocessing settings that produced them. Least recently used
+    entries are evicted beyond `max_entries`. Thread-safe.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS descriptions ("
+            " key TEXT PRIMARY KEY, description TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS descriptions_last_used ON descriptions (last_used)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT description FROM descriptions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE descriptions SET last_used = ? WHERE key = ?", (self._clock(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, description: str):
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?)", (key, description, now, now))
+            evicted = self._conn.execute(
+                "DELETE FROM descriptions WHERE key IN (SELECT key FROM descriptions "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+            self.evictions += evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class VisionAnalyzer:
+    """
+    Describes uploaded screenshots with the Groq vision model.
+
+    Calls go through the shared LLM gateway; images are downscaled before upload; results
+    are cached by content hash, and concurrent requests for the same image share a
+    single model call.
+    """
+
+    def __init__(self, model_name: str, max_side: int = 1280, quality: int = 85,
+                 cache: Optional[VisionCache] = None, llm=None):
+        self.model_name = model_name
+        self.max_side = max_side
+        self.quality = quality
+        self.cache = cache
+        self._llm = llm
+        self._inflight = {}
+        self.uploaded_bytes = 0
+        self.original_bytes = 0
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = get_gateway().chat_model(self.model_name, temperature=0.1)
+        return self._llm
+
+    def cache_key(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{digest}:{self.model_name}:{self.max_side}:{self.quality}:{hashlib.sha1(VISION_PROMPT.encode()).hexdigest()[:8]}"
+
+    async def describe(self, data: bytes) -> str:
+        key = self.cache_key(data)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+        task = asyncio.ensure_future(self._analyze(key, data))
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _analyze(self, key: str, data: bytes) -> str:
+        prepared = await asyncio.to_thread(prepare_image, data, self.max_side, self.quality)
+        self.original_bytes += len(data)
+        self.uploaded_bytes += len(prepared)
+        msg = HumanMessage(content=[
+            {"type": "text", "text": VISION_PROMPT},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64.b64encode(prepared).decode('ascii')}"}},
+        ])
+        # Without the content-hash cache, fall back to the gateway's response cache
+        llm = self.llm if self.cache is not None else self.llm.bind(response_cache=True)
+        response = await llm.ainvoke([msg])
+        description = response.content
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, description)
+        return description
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "max_side": self.max_side,
+            "original_bytes": self.original_bytes,
+            "uploaded_bytes": self.uploaded_bytes,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+
+_analyzer = None
+
+
+def get_analyzer() -> VisionAnalyzer:
+    global _analyzer
+    if _analyzer is None:
+        cache = None
+        if config.VISION_CACHE_ENABLED:
+            cache = VisionCache(config.VISION_CACHE_PATH, max_entries=config.VISION_CACHE_MAX_ENTRIES)
+        _analyzer = VisionAnalyzer(
+            config.VISION_MODEL,
+            max_side=config.VISION_MAX_SIDE,
+            quality=config.VISION_JPEG_QUALITY,
+            cache=cache,
+        )
+    return _analyzer
@@ -0,0 +1,63 @@
+"""
+Benchmark: /chat throughput under concurrent conversations.
+
+Runs the real FastAPI app and LangGraph graph in-process (httpx ASGI transport)
+with the Groq model swapped for a fake that waits `--latency` seconds per call.
+
+  blocking : the fake sleeps with time.sleep inside the async call, which is what
+             the old endpoint did by calling sync invoke/llm.invoke on the event loop.
+  async    : the fake awaits asyncio.sleep, i.e. the current ainvoke pipeline.
+
+Usage (from backend/):
+    python scripts/bench_chat_concurrency.py --requests 50 --concurrency 10
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+import httpx
+
+from app import agent, server
+from fake_llm import SlowFakeChatModel
+
+
+async def run(mode: str, total: int, concurrency: int, latency: float) -> float:
+    agent.llm = SlowFakeChatModel(latency=latency, blocking=(mode == "blocking"))
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=server.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post("/chat", json={
+                    "message": "I need an e-commerce website",
+                    "thread_id": f"bench-{mode}-{i}",
+                })
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, LLM latency {args.latency}s")
+    for mode in ("blocking", "async"):
+        elapsed = asyncio.run(run(mode, args.requests, args.concurrency, args.latency))
+        print(f"{mode:<9} {elapsed:6.2f} s  {args.requests / elapsed:7.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
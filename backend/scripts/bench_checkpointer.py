@@ -0,0 +1,94 @@
+"""
+Load test: process memory while many conversation threads accumulate.
+
+Drives `--threads` synthetic conversations (default 10k, `--turns` each) through the
+real graph with a zero-latency fake model and samples the process RSS as it goes.
+
+  memory : MemorySaver, every checkpoint of every thread stays in the process
+  sqlite : SqliteCheckpointer (app/checkpoint.py), compacted every 1000 threads
+           with a --max-threads cap, so the database file stays bounded too
+
+Each backend runs in its own subprocess so the RSS numbers don't mix.
+
+Usage (from backend/):
+    python scripts/bench_checkpointer.py --threads 10000
+    python scripts/bench_checkpointer.py --backend sqlite --threads 2000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource   # peak RSS (KB on Linux, bytes on macOS) where /proc is missing
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+async def run(backend: str, threads: int, turns: int, max_threads: int):
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from app import agent
+    from app.checkpoint import SqliteCheckpointer
+    from fake_llm import SlowFakeChatModel
+
+    agent.llm = SlowFakeChatModel(
+        replies=["Thanks! What platform and how many users do you expect?"], latency=0.0)
+    if backend == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(prefix="bench_ckpt_"), "checkpoints.sqlite")
+        saver = SqliteCheckpointer(path, max_threads=max_threads)
+    else:
+        saver = MemorySaver()
+    graph = agent.workflow.compile(checkpointer=saver)
+
+    message = "We need a food delivery app with live tracking, payments and an admin panel. " * 5
+    baseline = rss_mb()
+    start = time.perf_counter()
+    print(f"[{backend}] {'threads':>7} {'rss MB':>8} {'db MB':>7}")
+    for n in range(1, threads + 1):
+        config = {"configurable": {"thread_id": f"load-{n}"}}
+        for _ in range(turns):
+            await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config=config)
+        if n % 1000 == 0 or n == threads:
+            db_mb = ""
+            if backend == "sqlite":
+                saver.compact()
+                db_mb = f"{saver.stats()['db_bytes'] / 2**20:7.1f}"
+            print(f"[{backend}] {n:>7} {rss_mb():>8.1f} {db_mb:>7}", flush=True)
+    elapsed = time.perf_counter() - start
+    print(f"[{backend}] rss growth: {rss_mb() - baseline:.1f} MB over {threads} threads "
+          f"({threads * turns / elapsed:.0f} turns/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default=None, help="default: both")
+    parser.add_argument("--threads", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--max-threads", type=int, default=2_000, help="sqlite thread cap")
+    args = parser.parse_args()
+
+    if args.backend:
+        asyncio.run(run(args.backend, args.threads, args.turns, args.max_threads))
+        return
+    for backend in ("memory", "sqlite"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--backend", backend,
+                        "--threads", str(args.threads), "--turns", str(args.turns),
+                        "--max-threads", str(args.max_threads)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: prompt size and LLM latency over a long conversation.
+
+Plays a scripted 40-turn conversation through the real graph (MemorySaver
+checkpointer, one thread) with fake models whose latency grows with prompt size
+(`--ms-per-1k-tokens`, a stand-in for prefill cost). Turn 3 attaches a 10k-char
+project document and every fifth turn triggers a knowledge-base lookup, like the
+conversations that made the history balloon.
+
+  full     : CONTEXT_TOKEN_BUDGET=0, the whole history on every call (old behaviour)
+  budgeted : the default budget with pinned facts, rolling summary and recent turns
+
+Usage (from backend/):
+    python scripts/bench_context.py --turns 40
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app import agent, config
+from fake_llm import SlowFakeChatModel
+
+DOCUMENT = "<ATTACHED_PROJECT_DOCUMENT>\n" + (
+    "Module: customer portal with login, catalog browsing, cart, checkout and order history. " * 120
+)[:10000] + "\n</ATTACHED_PROJECT_DOCUMENT>"
+
+
+async def fake_lookup(query, filters=None):
+    return ("--- Snippet from catalog.pdf, page 3 ---\n"
+            "ShopEasy: e-commerce storefront, payments, inventory. Cost: ₹8–12 lakh. " * 20)
+
+
+def user_message(turn: int) -> str:
+    if turn == 3:
+        return "Here is our spec, please read it." + DOCUMENT
+    if turn == 30:
+        return "Sounds good, please send the proposal to client@example.com"
+    return f"Turn {turn}: we also want feature #{turn} (notifications, reports, admin roles)."
+
+
+async def run(budget: int, turns: int, ms_per_1k: float) -> list:
+    config.CONTEXT_TOKEN_BUDGET = budget
+    replies = ["Noted. Anything else about features, traffic or platform?",
+               AIMessage(content="", tool_calls=[{"name": "lookup_projects", "id": "",
+                                                  "args": {"query": "e-commerce portal", "type": "catalog"}}]),
+               "Similar projects cost ₹8–12 lakh; that fits your scope.",
+               "Got it, I have added that to the scope.",
+               "Understood. Shall I prepare an estimate?"]
+    agent.llm = SlowFakeChatModel(replies=replies, latency=0.05, latency_per_1k_tokens=ms_per_1k / 1000)
+    agent.summary_llm = SlowFakeChatModel(
+        replies=["Client wants an e-commerce portal (web), spec attached; discussed notifications, "
+                 "reports and admin roles; similar projects cost ₹8–12 lakh."],
+        latency=0.05, latency_per_1k_tokens=ms_per_1k / 1000,
+    )
+    agent.aretrieve_similar_projects = fake_lookup
+    agent.prefetcher.enabled = False
+    graph = agent.workflow.compile(checkpointer=MemorySaver())
+    thread = {"configurable": {"thread_id": f"bench-{budget}"}}
+
+    rows = []
+    for turn in range(1, turns + 1):
+        calls_before = len(agent.llm.prompt_tokens)
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=user_message(turn))]}, config=thread)
+        elapsed = (time.perf_counter() - start) * 1000
+        rows.append((turn, max(agent.llm.prompt_tokens[calls_before:]), elapsed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=40.0)
+    args = parser.parse_args()
+
+    default_budget = config.CONTEXT_TOKEN_BUDGET
+    full = asyncio.run(run(0, args.turns, args.ms_per_1k_tokens))
+    budgeted = asyncio.run(run(default_budget, args.turns, args.ms_per_1k_tokens))
+
+    print(f"\n{'turn':>4} | {'full: tokens':>12} {'ms':>7} | {'budgeted: tokens':>16} {'ms':>7}")
+    for (turn, f_tokens, f_ms), (_, b_tokens, b_ms) in zip(full, budgeted):
+        if turn in (1, 3, 5) or turn % 5 == 0:
+            print(f"{turn:>4} | {f_tokens:>12} {f_ms:>7.0f} | {b_tokens:>16} {b_ms:>7.0f}")
+    print(f"\nbudget={default_budget} tokens, recent turns={config.CONTEXT_RECENT_TURNS}")
+    print(f"total prompt tokens: full={sum(r[1] for r in full)}  budgeted={sum(r[1] for r in budgeted)}")
+    print(f"total latency (s):   full={sum(r[2] for r in full) / 1000:.1f}  "
+          f"budgeted={sum(r[2] for r in budgeted) / 1000:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: sending proposal emails directly vs through the durable outbox.
+
+Starts scripts/fake_brevo_server.py in-process with a requests-per-second limit
+and random 503s. It then delivers `--proposals` proposal PDFs. Every 5th one
+also goes to a second address, and every 4th one is submitted twice, as a
+retried job would do.
+
+  direct : the old send_proposal_email path. It builds a new SDK client per email,
+           calls from 4 threads and fails permanently on any API error.
+  outbox : app/outbox.py. Emails are deduped by proposal id, then drained by one
+           dispatcher with a shared client, one API call per email;
+           429/5xx responses are retried with backoff.
+
+Each run gets a fresh fake server.
+
+Usage (from backend/):
+    python scripts/bench_email_outbox.py --proposals 60 --rps 5 --error-rate 0.1
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from app.outbox import EmailDispatcher, EmailOutbox
+from app.tools.emailer import BrevoClient, EmailSendError
+from fake_brevo_server import start_in_thread
+
+
+def make_workload(directory: str, proposals: int):
+    """[(dedupe key, recipients, pdf path)] including cc copies and duplicate submissions."""
+    sends = []
+    for i in range(proposals):
+        path = os.path.join(directory, f"proposal_{i:04d}.pdf")
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 " + os.urandom(20_000))
+        sends.append((f"p{i}", [f"client{i}@example.com"], path))
+        if i % 5 == 0:
+            sends.append((f"p{i}-cc", [f"manager{i}@example.com"], path))
+        if i % 4 == 0:
+            sends.append((f"p{i}", [f"client{i}@example.com"], path))
+    return sends
+
+
+def run_direct(host: str, sends, fake):
+    def send(item):
+        _, recipients, path = item
+        try:
+            BrevoClient(api_key="fake", sender_email="bot@example.com", host=host).send([recipients], path)
+            return True
+        except EmailSendError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(send, sends))
+    wall = time.perf_counter() - start
+    print(f"direct  delivered={results.count(True):>4} lost={results.count(False):>4} {fake.stats()} wall={wall:.1f}s")
+
+
+async def run_outbox(host: str, sends, fake, args):
+    outbox = EmailOutbox(os.path.join(tempfile.mkdtemp(), "outbox.sqlite"))
+    client = BrevoClient(api_key="fake", sender_email="bot@example.com", host=host)
+    dispatcher = EmailDispatcher(outbox, client, batch_size=args.batch_size, concurrency=4,
+                                 retry_base=0.5, retry_max=5.0, poll_interval=0.1)
+    start = time.perf_counter()
+    dispatcher.start()
+    duplicates = 0
+    for key, recipients, path in sends:
+        if not await asyncio.to_thread(outbox.enqueue, key, recipients, path):
+            duplicates += 1
+        dispatcher.notify()
+    while True:
+        stats = outbox.stats()
+        if stats["pending"] + stats["sending"] == 0:
+            break
+        await asyncio.sleep(0.1)
+    wall = time.perf_counter() - start
+    await dispatcher.stop()
+    stats = dispatcher.stats()
+    print(f"outbox  delivered={stats['sent']:>4} lost={stats['failed']:>4} {fake.stats()} wall={wall:.1f}s")
+    print(f"        deduped={duplicates} api_calls={stats['api_calls']} retried={stats['retried_here']} "
+          f"send latency {stats['send_latency']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--proposals", type=int, default=60)
+    parser.add_argument("--rps", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8120)
+    args = parser.parse_args()
+    sends = make_workload(tempfile.mkdtemp(), args.proposals)
+    print(f"{len(sends)} submissions for {args.proposals} proposals, server limit {args.rps} req/s, "
+          f"{args.error_rate:.0%} 503s\n")
+
+    _, fake = start_in_thread(args.port, rps=args.rps, error_rate=args.error_rate)
+    run_direct(f"http://127.0.0.1:{args.port}/v3", sends, fake)
+
+    _, fake = start_in_thread(args.port + 1, rps=args.rps, error_rate=args.error_rate)
+    asyncio.run(run_outbox(f"http://127.0.0.1:{args.port + 1}/v3", sends, fake, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: unfiltered vs payload-filtered knowledge-base search.
+
+Builds a synthetic corpus (default 100k points, 384-d random unit vectors) whose
+payloads follow the layout written by scripts/ingest.py, creates the payload
+indexes, then times the same queries with and without a lookup_projects-style filter.
+
+By default it runs against a local in-memory Qdrant. Local mode ignores payload
+indexes (it scans in Python), so pass --url to measure a real Qdrant server,
+where the indexes let filtered searches touch only the matching candidates.
+
+Usage (from backend/):
+    python scripts/bench_filtered_search.py --points 100000 --queries 50
+    python scripts/bench_filtered_search.py --url http://localhost:6333
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from qdrant_client import QdrantClient, models
+
+from app.tools.rag import (
+    DOC_TYPE_KEYWORDS, DOMAIN_KEYWORDS, build_filter, ensure_payload_indexes,
+)
+
+COLLECTION = "bench_filtered_search"
+DIM = 384
+# As in lookup_projects(query="ecommerce pricing", type="pricing_policy", domain="ecommerce", year=2024)
+FILTERS = {"type": "pricing_policy", "domain": "ecommerce", "year": 2024}
+
+
+def unit_vectors(rng, n: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIM), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_corpus(client: QdrantClient, points: int, batch: int = 2000):
+    rng = np.random.default_rng(7)
+    doc_types = list(DOC_TYPE_KEYWORDS) + ["document"]
+    domains = list(DOMAIN_KEYWORDS) + ["general"]
+
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE),
+    )
+    ensure_payload_indexes(client, COLLECTION)
+
+    for start in range(0, points, batch):
+        n = min(batch, points - start)
+        payloads = [{
+            "page_content": f"synthetic chunk {start + i}",
+            "metadata": {
+                "source": f"doc_{(start + i) // 40}.pdf",
+                "doc_type": doc_types[int(rng.integers(len(doc_types)))],
+                "domain": domains[int(rng.integers(len(domains)))],
+                "year": int(rng.integers(2018, 2026)),
+                "page": int(rng.integers(1, 40)),
+            },
+        } for i in range(n)]
+        client.upsert(
+            collection_name=COLLECTION,
+            points=models.Batch(ids=list(range(start, start + n)), vectors=unit_vectors(rng, n), payloads=payloads),
+            wait=True,
+        )
+        print(f"\r Loaded {start + n}/{points} points", end="", flush=True)
+    print()
+
+
+def time_queries(client: QdrantClient, queries: np.ndarray, query_filter) -> tuple:
+    latencies, returned = [], 0
+    for vector in queries:
+        start = time.perf_counter()
+        hits = client.query_points(
+            collection_name=COLLECTION, query=vector, query_filter=query_filter, limit=3,
+        ).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        returned += len(hits)
+    return latencies, returned / len(queries)
+
+
+def report(label: str, latencies: list, avg_hits: float):
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{label:<10} mean={statistics.mean(latencies):8.2f} ms  p50={statistics.median(latencies):8.2f} ms  "
+          f"p95={p95:8.2f} ms  hits/query={avg_hits:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--url", default=None, help="Qdrant server URL (default: in-memory)")
+    parser.add_argument("--api-key", default=None)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, api_key=args.api_key) if args.url else QdrantClient(":memory:")
+    build_corpus(client, args.points)
+
+    query_filter = build_filter(FILTERS)
+    matching = client.count(COLLECTION, count_filter=query_filter, exact=True).count
+    print(f" Filter {FILTERS} matches {matching}/{args.points} points")
+
+    queries = unit_vectors(np.random.default_rng(11), args.queries)
+    report("unfiltered", *time_queries(client, queries, None))
+    report("filtered", *time_queries(client, queries, query_filter))
+
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: chat latency and LLM calls with and without the LLM response cache.
+
+Plays `--sessions` two-turn conversations through the real graph and the real
+gateway, with the scripted fake model standing in for Groq. Opening messages are
+drawn from a handful of common openers (greetings, "what do you do", pricing FAQs),
+some with different spacing, plus `--unique` percent one-off openers. The second
+turn always depends on the first, so it is never cached.
+
+  off : no response cache, every turn calls the model
+  on  : the gateway's LLMResponseCache (a temporary SQLite file); opening turns
+        with a prompt seen before are answered from it
+
+Usage (from backend/):
+    python scripts/bench_llm_cache.py --sessions 60 --llm-latency 0.6 --unique 30
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app import agent
+from app.llm_cache import LLMResponseCache
+from app.llm_gateway import GatewayChatModel, LLMGateway
+from fake_llm import SlowFakeChatModel
+
+OPENERS = [
+    "Hi",
+    "Hello!",
+    "What kind of software do you build?",
+    "What  kind of software do you build?",
+    "How do you price a project?",
+    "Do you build mobile apps?",
+    "How long does a typical website take?",
+]
+FOLLOW_UP = "We need it for about 200 users. What would that cost?"
+
+
+def openers(sessions: int, unique_percent: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    return [f"We need a custom tool for our team #{i}, can you help?" if rng.randrange(100) < unique_percent
+            else rng.choice(OPENERS) for i in range(sessions)]
+
+
+async def run(cached: bool, first_messages: list, llm_latency: float) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="llm-cache-bench-"), "llm_cache.sqlite")
+    cache = LLMResponseCache(path) if cached else None
+    gateway = LLMGateway(api_key="offline", response_cache=cache)
+    inner = SlowFakeChatModel(replies=["Happy to help. Could you tell me more about what you need?"],
+                              latency=llm_latency)
+    agent.llm = GatewayChatModel(inner=inner, gateway=gateway, model_name="llama-3.3-70b-versatile")
+    agent.prefetcher.enabled = False
+    graph = agent.workflow.compile(checkpointer=MemorySaver())
+
+    turn_ms = [0.0, 0.0]
+    for session, text in enumerate(first_messages):
+        thread = {"configurable": {"thread_id": f"cache-{cached}-{session}"}}
+        for turn, message in enumerate((text, FOLLOW_UP)):
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config=thread)
+            turn_ms[turn] += (time.perf_counter() - start) * 1000
+    stats = gateway.stats()["response_cache"]
+    if cache is not None:
+        cache.close()
+    return {"turn_ms": [ms / len(first_messages) for ms in turn_ms], "calls": inner.calls, "stats": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--llm-latency", type=float, default=0.6, help="seconds per LLM call")
+    parser.add_argument("--unique", type=int, default=30, help="percent of sessions with a one-off opener")
+    args = parser.parse_args()
+
+    first_messages = openers(args.sessions, args.unique)
+    off = asyncio.run(run(False, first_messages, args.llm_latency))
+    on = asyncio.run(run(True, first_messages, args.llm_latency))
+
+    print(f"{args.sessions} sessions x 2 turns, LLM {args.llm_latency}s/call, {args.unique}% one-off openers\n")
+    print(f"{'':<6} {'turn 1 ms':>10} {'turn 2 ms':>10} {'LLM calls':>10}")
+    for name, result in (("off", off), ("on", on)):
+        print(f"{name:<6} {result['turn_ms'][0]:>10.0f} {result['turn_ms'][1]:>10.0f} {result['calls']:>10}")
+    stats = on["stats"]
+    print(f"\nresponse cache: {stats['hits']} hits / {stats['misses']} misses "
+          f"(hit rate {stats['hit_rate']:.0%}), {stats['size']} entries")
+
+
+if __name__ == "__main__":
+    main()
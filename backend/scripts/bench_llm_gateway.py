@@ -0,0 +1,95 @@
+"""
+Benchmark: bursts of LLM calls against a rate-limited fake Groq API.
+
+Starts scripts/fake_openai_server.py in-process with a tokens-per-minute budget
+and random 503s, then fires `--requests` concurrent chat calls two ways:
+
+  direct  : a plain ChatGroq per caller (SDK default: 2 blind retries each)
+  gateway : app/llm_gateway.py (shared pool, concurrency cap, TPM token bucket,
+            Retry-After aware jittered retries)
+
+Each run gets a fresh fake server so both start with a full budget.
+
+Usage (from backend/):
+    python scripts/bench_llm_gateway.py --requests 60 --tpm 6000
+    python scripts/bench_llm_gateway.py --stream
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from langchain_core.messages import HumanMessage
+from langchain_groq import ChatGroq
+
+from app.llm_gateway import LLMGateway
+from fake_openai_server import start_in_thread
+
+MODEL = "llama-3.3-70b-versatile"
+PROMPT = "We need a food delivery app with live tracking, payments, ratings and an admin panel. " * 7
+
+
+async def call(model, stream: bool) -> float:
+    start = time.perf_counter()
+    if stream:
+        async for _ in model.astream([HumanMessage(content=PROMPT)]):
+            pass
+    else:
+        await model.ainvoke([HumanMessage(content=PROMPT)])
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(label: str, make_model, requests: int, stream: bool, fake):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call(make_model(), stream) for _ in range(requests)), return_exceptions=True)
+    wall = time.perf_counter() - start
+    ok = sorted(r for r in results if isinstance(r, float))
+    failed = len(results) - len(ok)
+    p95 = ok[max(0, int(len(ok) * 0.95) - 1)] if ok else 0.0
+    print(f"{label:<8} ok={len(ok):>3} failed={failed:>3} server_429={fake.rate_limited:>4} "
+          f"server_503={fake.errors:>3} max_concurrent={fake.max_concurrent:>3} "
+          f"p50={statistics.median(ok) if ok else 0:>7.0f} ms p95={p95:>7.0f} ms wall={wall:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--tpm", type=int, default=6000, help="fake server tokens-per-minute limit")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8, help="gateway per-model concurrency")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--port", type=int, default=8111)
+    args = parser.parse_args()
+    server_args = dict(tpm=args.tpm, latency=args.latency, error_rate=args.error_rate)
+    print(f"{args.requests} concurrent {'streaming ' if args.stream else ''}calls, "
+          f"~{len(PROMPT) // 4 + 20} tokens each, server limit {args.tpm} TPM\n")
+
+    _, fake = start_in_thread(args.port, **server_args)
+    base_url = f"http://127.0.0.1:{args.port}"
+    asyncio.run(run("direct", lambda: ChatGroq(api_key="fake", base_url=base_url, model_name=MODEL),
+                    args.requests, args.stream, fake))
+
+    _, fake = start_in_thread(args.port + 1, **server_args)
+    gateway = LLMGateway(
+        api_key="fake", base_url=f"http://127.0.0.1:{args.port + 1}",
+        # Stay a little under the server's budget; our estimate is chars/4 + completion_estimate
+        model_limits={MODEL: (args.concurrency, int(args.tpm * 0.95))},
+        completion_estimate=24, backoff_base=0.2,
+    )
+    shared = gateway.chat_model(MODEL, temperature=0.3)
+    asyncio.run(run("gateway", lambda: shared, args.requests, args.stream, fake))
+    lane = gateway.stats()["models"][MODEL]
+    print(f"\ngateway lane: retries={lane['retries']} rate_limited={lane['rate_limited']} errors={lane['errors']} "
+          f"tokens_used={lane['tokens_used']}")
+    print(f"  queue wait: {lane['queue_wait']}")
+    print(f"  latency:    {lane['latency']}")
+
+
+if __name__ == "__main__":
+    main()
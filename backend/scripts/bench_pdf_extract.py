@@ -0,0 +1,127 @@
+"""
+Benchmark: attachment PDF text extraction, old path vs app/pdf_text.py.
+
+Writes synthetic PDFs (text pages of ~3k characters each, optional image-only
+pages with no text layer) and times:
+
+  old    : every page's extract_text() appended with `text +=`, then text[:10000]
+  engine : PdfTextExtractor (worker process, early stop at PDF_TEXT_MAX_CHARS)
+
+It also feeds the engine a pathological single-page PDF (hundreds of thousands of
+text operators) to show the timeout bounding it instead of tying up the server.
+
+Usage (from backend/):
+    python scripts/bench_pdf_extract.py --pages 50 300 1000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from pypdf import PdfReader
+
+from app.pdf_text import PdfExtractionTimeout, PdfTextExtractor
+
+LINE = "The platform needs user accounts, role based access, payments, reporting and a mobile app."
+
+
+def write_pdf(path: str, page_streams: list):
+    """Minimal PDF writer: one Helvetica font, one content stream per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for stream in page_streams:
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def text_page(number: int, lines: int = 34) -> bytes:
+    ops = [b"BT /F1 9 Tf 40 760 Td 11 TL"]
+    ops += [b"(Page %d line %d: %s) '" % (number, i, LINE.encode()) for i in range(lines)]
+    return b"\n".join(ops + [b"ET"])
+
+
+def pathological_page(operators: int) -> bytes:
+    return b"BT /F1 9 Tf 40 760 Td " + b"(x) Tj 1 0 Td " * operators + b"ET"
+
+
+def old_extract(path: str) -> str:
+    reader = PdfReader(path)
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() or ""
+    return text[:10000]
+
+
+async def bench(args):
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    engine = PdfTextExtractor(workers=1, timeout=args.timeout)
+
+    print(f"{'pages':>6} {'kind':<10} {'old ms':>9} {'engine ms':>10} {'pages read':>11} {'chars':>6} image_only")
+    for pages in args.pages:
+        for kind in ("text", "scanned"):
+            path = os.path.join(workdir, f"{kind}_{pages}.pdf")
+            if kind == "text":
+                streams = [text_page(n) for n in range(1, pages + 1)]
+            else:
+                streams = [b"q Q"] * pages   # no text layer, like a scan
+            write_pdf(path, streams)
+
+            start = time.perf_counter()
+            old_extract(path)
+            old_ms = (time.perf_counter() - start) * 1000
+
+            await engine.extract(path)   # first call also spawns the worker; time a warm call
+            start = time.perf_counter()
+            result = await engine.extract(path)
+            new_ms = (time.perf_counter() - start) * 1000
+            print(f"{pages:>6} {kind:<10} {old_ms:>9.0f} {new_ms:>10.0f} "
+                  f"{result['pages_read']:>5}/{result['total_pages']:<5} {len(result['text']):>6} {result['image_only']}")
+
+    path = os.path.join(workdir, "pathological.pdf")
+    write_pdf(path, [pathological_page(args.operators)])
+    start = time.perf_counter()
+    try:
+        await engine.extract(path)
+        outcome = "finished"
+    except PdfExtractionTimeout:
+        outcome = "timed out"
+    print(f"\npathological page ({args.operators} operators): {outcome} after "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms (timeout {args.timeout:.0f}s)")
+
+    start = time.perf_counter()
+    await engine.extract(os.path.join(workdir, f"text_{args.pages[0]}.pdf"))
+    print(f"next extraction on a fresh worker: {(time.perf_counter() - start) * 1000:.0f} ms")
+    engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 300, 1000])
+    parser.add_argument("--operators", type=int, default=400_000)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: proposal PDF rendering throughput and latency.
+
+Renders the same proposal `--renders` times, `--concurrency` at a time:
+
+  inline : create_pdf in a thread of this process (the old path; WeasyPrint holds the GIL)
+  pool N : app/pdf_renderer.py with N warm worker processes, for each N in --sizes
+
+While each run is going, a probe task measures how late this process's event loop
+wakes up. For the server, that lateness is the delay every other request on the
+worker would see.
+
+Usage (from backend/):
+    python scripts/bench_pdf_render.py --renders 40 --sizes 1,2,4
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from app.pdf_renderer import PdfRenderer
+
+PROPOSAL_HTML = """
+<div class="header-container"><div class="company-name">ProCode Bot</div></div>
+<h1>Project Proposal</h1>
+<p>Dear Customer,</p>
+""" + "".join(
+    f"<h2>Phase {i}: Scope</h2><p>{'Screens, APIs, payments integration, admin panel and QA for this phase. ' * 12}</p>"
+    f"<ul>{''.join(f'<li>Deliverable {i}.{j}: build, review and deploy</li>' for j in range(8))}</ul>"
+    for i in range(1, 7)
+) + """
+<h2>Commercials</h2>
+<div class="price-box">Total Estimated Cost: ₹4,00,000</div>
+<div class="footer"><b>ProCodeHub Pvt Ltd</b><br>Contact: +91 98765 43210</div>
+"""
+
+
+def pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def loop_lag_probe(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run(label: str, render, renders: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, lags, stop = [], [], asyncio.Event()
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            await render(PROPOSAL_HTML, f"bench_{label.replace(' ', '')}_{i}.pdf")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(loop_lag_probe(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(renders)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await probe
+    print(f"{label:<8} {renders / wall:>7.1f} renders/s  p50={statistics.median(latencies):>6.0f} ms  "
+          f"p95={pct(latencies, 0.95):>6.0f} ms  loop lag p95={pct(lags, 0.95):>6.1f} ms max={max(lags):>6.1f} ms")
+
+
+async def bench(args):
+    output_dir = tempfile.mkdtemp(prefix="bench_pdf_")
+
+    if not args.skip_inline:
+        from app.tools import pdf_gen
+        pdf_gen.OUTPUT_FOLDER = output_dir
+        await run("inline", lambda html, name: asyncio.to_thread(pdf_gen.create_pdf, html, name),
+                  args.renders, args.concurrency)
+
+    for size in args.sizes:
+        renderer = PdfRenderer(workers=size, timeout=120, output_dir=output_dir)
+        start = time.perf_counter()
+        await renderer.start()
+        warm = time.perf_counter() - start
+        await run(f"pool {size}", renderer.render, args.renders, args.concurrency)
+        stats = renderer.stats()
+        print(f"         warm-up {warm:.1f}s, worker RSS {stats['worker_rss_mb']} MB, queue wait {stats['queue_wait']}")
+        await renderer.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="renders requested at once")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--skip-inline", action="store_true")
+    args = parser.parse_args()
+    print(f"{args.renders} renders of a {len(PROPOSAL_HTML) // 1024} KB proposal, {args.concurrency} at a time "
+          f"({os.cpu_count()} CPUs)\n")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: per-turn latency with and without the speculative knowledge-base prefetch.
+
+Plays a scripted 6-turn conversation through the real graph with the scripted
+fake model. Four turns make a lookup_projects call, as most pricing conversations
+do. Retrieval is faked with `--lookup-latency` seconds (embedding + search). The
+embedding is a bag-of-words hash, so the similarity numbers are only illustrative.
+
+  turn 1  plain answer                                    prefetch unused, cancelled
+  turn 2  lookup close to the user's message              served by the prefetch
+  turn 3  lookup close to the user's message              served by the prefetch
+  turn 4  lookup with a type filter                       not served (filtered)
+  turn 5  calculate_price only                            prefetch unused
+  turn 6  lookup about something else than the message    not served (dissimilar)
+
+  off : KB_PREFETCH_ENABLED=0, every lookup searches after the model asked for it
+  on  : the prefetch starts with each user message, alongside the LLM call
+
+Usage (from backend/):
+    python scripts/bench_prefetch.py --sessions 5 --llm-latency 0.8 --lookup-latency 0.35
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import zlib
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app import agent
+from fake_llm import SlowFakeChatModel
+
+STOPWORDS = {"a", "an", "and", "any", "are", "did", "do", "for", "have", "it", "of", "on", "please",
+             "the", "to", "us", "we", "what", "with", "you", "your"}
+
+
+def lookup(query: str, **filters) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "lookup_projects", "args": {"query": query, **filters}, "id": ""}])
+
+
+# (user message, the model's tool-calling response or None)
+TURNS = [
+    ("We need a hospital appointment booking app for web and mobile.", None),
+    ("What did similar hospital booking apps cost you?", lookup("hospital booking apps cost")),
+    ("Do you have an online store case study?", lookup("online store case study")),
+    ("What are your payment terms?", lookup("payment terms", type="pricing_policy")),
+    ("Please estimate it at 300 hours with a senior team.",
+     AIMessage(content="", tool_calls=[{"name": "calculate_price", "args": {"hours": 300, "level": "senior"}, "id": ""}])),
+    ("Sounds fine. Anything else we should know?", lookup("maintenance and support plans")),
+]
+
+
+async def fake_embed(text: str):
+    await asyncio.sleep(0.02)
+    vector = np.zeros(256, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word not in STOPWORDS:
+            vector[zlib.crc32(word.encode()) % 256] += 1.0
+    return vector
+
+
+def script() -> list:
+    replies = []
+    for _, response in TURNS:
+        if response is not None:
+            replies.append(response)
+        replies.append("Here is what I can tell you. Anything else?")
+    return replies
+
+
+async def run(enabled: bool, sessions: int, llm_latency: float, lookup_latency: float) -> dict:
+    async def fake_lookup(query, filters=None):
+        await fake_embed(query)
+        await asyncio.sleep(lookup_latency - 0.02)
+        return f"--- Snippet for '{query}' {filters or ''} ---\nSimilar project cost ₹8–12 lakh."
+
+    agent.llm = SlowFakeChatModel(replies=script(), latency=llm_latency)
+    agent.aretrieve_similar_projects = fake_lookup
+    agent.prefetcher = prefetcher = agent.KnowledgePrefetcher(
+        retrieve=fake_lookup, embed=fake_embed, min_similarity=agent.config.KB_PREFETCH_MIN_SIMILARITY,
+        enabled=enabled)
+    graph = agent.workflow.compile(checkpointer=MemorySaver())
+
+    turn_ms = [0.0] * len(TURNS)
+    for session in range(sessions):
+        thread = {"configurable": {"thread_id": f"prefetch-{enabled}-{session}"}}
+        for turn, (text, _) in enumerate(TURNS):
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config=thread)
+            turn_ms[turn] += (time.perf_counter() - start) * 1000
+    return {"turn_ms": [ms / sessions for ms in turn_ms], "stats": prefetcher.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per LLM call")
+    parser.add_argument("--lookup-latency", type=float, default=0.35, help="seconds per knowledge-base lookup")
+    args = parser.parse_args()
+
+    off = asyncio.run(run(False, args.sessions, args.llm_latency, args.lookup_latency))
+    on = asyncio.run(run(True, args.sessions, args.llm_latency, args.lookup_latency))
+    print(f"{args.sessions} sessions, LLM {args.llm_latency}s/call, lookup {args.lookup_latency}s\n")
+    print(f"{'turn':>4} | {'off ms':>7} | {'on ms':>7} | {'saved ms':>8}")
+    for turn, (a, b) in enumerate(zip(off["turn_ms"], on["turn_ms"]), 1):
+        print(f"{turn:>4} | {a:>7.0f} | {b:>7.0f} | {a - b:>8.0f}")
+    print(f"total   {sum(off['turn_ms']) / 1000:.2f}s -> {sum(on['turn_ms']) / 1000:.2f}s\n")
+    stats = on["stats"]
+    print(f"lookups served by prefetch: {stats['served_by_prefetch']}/{stats['lookups']} "
+          f"({stats['served_fraction']:.0%}), unused prefetches: {stats['unused']}/{stats['started']}")
+    print(f"saved per served lookup: {stats['saved_per_lookup']}")
+    print(f"saved per turn:          {stats['saved_per_turn']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: proposal PDF bytes moved per chat session, before and after GET /proposals/{id}.
+
+Simulates one Streamlit session of `--turns` chat turns (`--reruns` script reruns
+each) in which `--proposals` proposals get generated along the way. The user
+downloads each proposal once and later clicks it again.
+
+  before : every rerun re-opened every PDF in the history and handed its bytes
+           to st.download_button (the old frontend, which also needed the backend's
+           filesystem)
+  after  : the frontend fetches a PDF by id only when its button is clicked,
+           through st.cache_data. A client holding a copy revalidates with
+           If-None-Match (304) and an interrupted download resumes with Range.
+
+The "after" numbers are real HTTP responses from the app's endpoint (TestClient).
+
+Usage (from backend/):
+    python scripts/bench_proposal_downloads.py --turns 30 --proposals 3
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "offline")
+os.environ["PDF_OUTPUT_DIR"] = tempfile.mkdtemp(prefix="bench_proposals_")
+
+from fastapi.testclient import TestClient
+
+from app import proposals
+from app.server import app
+
+
+def make_proposals(count: int, size: int):
+    ids = []
+    for i in range(count):
+        proposal_id = f"{i:032x}"
+        with open(proposals.proposal_file(proposal_id), "wb") as f:
+            f.write(b"%PDF-1.7\n" + os.urandom(size))
+        ids.append(proposal_id)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--reruns", type=int, default=2, help="Streamlit script runs per chat turn")
+    parser.add_argument("--proposals", type=int, default=3)
+    parser.add_argument("--size-kb", type=int, default=120, help="size of each proposal PDF")
+    args = parser.parse_args()
+    ids = make_proposals(args.proposals, args.size_kb * 1024)
+    size = os.path.getsize(proposals.proposal_file(ids[0]))
+    # Proposals appear evenly through the session
+    created_at_turn = [int((i + 1) * args.turns / (args.proposals + 1)) for i in range(args.proposals)]
+
+    # before: each rerun reads every proposal already in the history
+    before = 0
+    for turn in range(args.turns):
+        in_history = [pid for pid, t in zip(ids, created_at_turn) if t <= turn]
+        for _ in range(args.reruns):
+            for pid in in_history:
+                with open(proposals.proposal_file(pid), "rb") as f:
+                    before += len(f.read())
+
+    # after: HTTP downloads on click only, cached by id; a later re-check is a conditional request
+    client = TestClient(app)
+    after = downloads = 0
+    cache = {}
+    for pid in ids:
+        for _ in range(2):                       # first click, then a later click
+            if pid not in cache:
+                response = client.get(f"/proposals/{pid}")
+                assert response.status_code == 200
+                cache[pid] = (response.headers["etag"], response.content)
+                after += len(response.content)
+                downloads += 1
+    revalidated = 0
+    for pid in ids:                              # a client that kept its copy, e.g. the browser
+        response = client.get(f"/proposals/{pid}", headers={"If-None-Match": cache[pid][0]})
+        assert response.status_code == 304
+        revalidated += len(response.content)
+    # a download interrupted halfway resumes from the byte it stopped at
+    response = client.get(f"/proposals/{ids[0]}", headers={"Range": f"bytes={size // 2}-"})
+    assert response.status_code == 206 and len(response.content) == size - size // 2
+    assert client.get("/proposals/not-a-valid-id").status_code == 404
+
+    print(f"{args.turns} turns x {args.reruns} reruns, {args.proposals} proposals of {size / 1024:.0f} KB\n")
+    print(f"before  {before / 2**20:>8.2f} MB  (PDF reads on every rerun)")
+    print(f"after   {after / 2**20:>8.2f} MB  ({downloads} downloads; {len(ids)} revalidations -> 304, "
+          f"{revalidated} body bytes)")
+    print(f"resume  Range request returned 206 with {len(response.content) / 1024:.0f} KB instead of {size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: proposal drafting, full-HTML generation vs JSON sections + template.
+
+  html : the previous draft step. The 70B model writes the whole HTML document
+         (header, logo tag, price box, footer) and the code strips ```html fences.
+  json : app/proposals.py. The model returns ProposalContent JSON (scope, milestones,
+         assumptions), which is validated with Pydantic and filled into the template.
+
+Offline (default) the model is scripts/fake_llm.py with a decode cost per output
+token, so latency follows reply length the way it does on the real API. The canned
+HTML reply is the same document the template produces, which is what the model
+had to write out token by token before. With --live and a GROQ_API_KEY, both
+prompts go to the real model and the token counts come from the API's usage data.
+
+Usage (from backend/):
+    python scripts/bench_proposal_draft.py --runs 10
+    python scripts/bench_proposal_draft.py --live --runs 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "offline")
+
+from langchain_core.messages import HumanMessage
+
+from app import proposals
+from app.context import estimate_tokens
+from app.proposal_template import ProposalContent, render_proposal_html
+from fake_llm import SlowFakeChatModel
+
+PAYLOAD = {
+    "price": 240000,
+    "requirements": "Food delivery app for Android and iOS with live order tracking, online payments, "
+                    "restaurant ratings and an admin panel for menus and payouts. About 5,000 users at launch.",
+    "recipient": "client@example.com",
+    "notes": "50% advance, 50% on delivery. 3 months of free maintenance. Source code handed over on final payment.",
+}
+
+SAMPLE_CONTENT = ProposalContent(
+    overview="You want a food delivery platform for Android and iOS with live tracking and online payments. "
+             "We will build two Flutter apps, a restaurant dashboard and an admin panel on a shared backend.",
+    scope=["Customer app: browsing, cart, checkout and live order tracking",
+           "Restaurant dashboard for menus, availability and incoming orders",
+           "Admin panel for restaurants, payouts and support",
+           "Payment gateway integration with refunds",
+           "Ratings and reviews", "Push notifications for order status"],
+    milestones=[{"title": "Discovery and UI design", "weeks": 2, "deliverables": ["Clickable prototype", "API contract"]},
+                {"title": "Backend and admin panel", "weeks": 4, "deliverables": ["Order, menu and payout APIs", "Admin panel"]},
+                {"title": "Mobile apps", "weeks": 5, "deliverables": ["Android and iOS builds", "Live tracking"]},
+                {"title": "Testing and launch", "weeks": 2, "deliverables": ["QA sign-off", "Store submission"]}],
+    assumptions=["Client provides restaurant data and brand assets", "Payment gateway account is in the client's name",
+                 "Hosting costs are billed separately"],
+)
+
+
+# The draft prompt as it was before the JSON sections (kept here only for comparison)
+def legacy_prompt(payload: dict) -> str:
+    price = payload["price"]
+    return f"""
+    Write a clean HTML proposal.
+    - Requirements Summary: {payload["requirements"]}
+    - Total Price: INR {price:,}
+    - Notes: {payload["notes"]}
+
+    REQUIRED HTML STRUCTURE (Do strictly):
+
+    <div class="header-container">
+        <div class="company-name">ProCode Bot</div>
+        <img src="file:///D:/ML%20Projects/Procode_Prod_Projects/procode_bot/backend/knowledge_base/procode_image.png" class="logo" alt="Company Logo">
+    </div>
+
+    <h1>Project Proposal</h1>
+    <p>Dear Customer,</p>
+
+    [...Insert specific project details, timeline, and scope here based on requirements...]
+
+    <h2>Commercials</h2>
+    <div class="price-box">
+        Total Estimated Cost: ₹{price:,}
+    </div>
+
+    <div class="footer">
+        <b>ProCodeHub Pvt Ltd</b><br>
+        123 Kalikaparameshwari complex,Durgigudi,Shivamogga, Karnataka - 577201<br>
+        Contact: +91 98765 43210 | Email:procodehub@gmail.com
+    </div>
+    """
+
+
+async def draft_html(llm, payload: dict):
+    response = await llm.ainvoke([HumanMessage(content=legacy_prompt(payload))])
+    html_content = response.content
+    if "```html" in html_content:
+        html_content = html_content.split("```html")[1].split("```")[0]
+    return response, html_content
+
+
+async def draft_json(llm, payload: dict):
+    response = await llm.ainvoke([HumanMessage(content=proposals.build_prompt(payload))])
+    content = ProposalContent.model_validate_json(response.content)
+    return response, render_proposal_html(content, payload["price"])
+
+
+def output_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    return usage["output_tokens"] if usage else estimate_tokens(response.content)
+
+
+async def run(label: str, draft, llm, runs: int):
+    tokens, latencies = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response, html_doc = await draft(llm, PAYLOAD)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens.append(output_tokens(response))
+    print(f"{label:<5} output tokens mean={statistics.mean(tokens):>6.0f}  "
+          f"latency p50={statistics.median(latencies):>6.0f} ms  max={max(latencies):>6.0f} ms  "
+          f"(html document {len(html_doc):,} chars)")
+    return statistics.mean(tokens), statistics.median(latencies)
+
+
+async def bench(args):
+    if args.live:
+        from app.llm_gateway import get_gateway
+        html_llm = get_gateway().chat_model("llama-3.3-70b-versatile", temperature=0.3)
+        json_llm = proposals.draft_llm
+    else:
+        html_reply = f"Here is your proposal:\n```html\n{render_proposal_html(SAMPLE_CONTENT, PAYLOAD['price'])}\n```"
+        json_reply = json.dumps(SAMPLE_CONTENT.model_dump(), separators=(",", ":"))
+        fake = dict(latency=args.ttft, latency_per_output_token=args.per_token)
+        html_llm = SlowFakeChatModel(replies=[html_reply], **fake)
+        json_llm = SlowFakeChatModel(replies=[json_reply], **fake)
+
+    html_tokens, html_ms = await run("html", draft_html, html_llm, args.runs)
+    json_tokens, json_ms = await run("json", draft_json, json_llm, args.runs)
+    print(f"\noutput tokens -{(1 - json_tokens / html_tokens) * 100:.0f}%, "
+          f"draft latency -{(1 - json_ms / html_ms) * 100:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="call the real Groq API (needs GROQ_API_KEY)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="offline: seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.004, help="offline: seconds per output token")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: pricing throughput, one calculate_project_price call per line vs vectorized batches.
+
+Builds `--scenarios` what-if scenarios of `--modules` line items each. Each scenario
+has a random seniority mix, hours, contingency, discount and GST choice, and is priced
+three ways:
+
+  scalar     : a Python loop calling calculate_project_price per line item, then the
+               same contingency/discount/GST arithmetic per scenario (the only way
+               before the pricing engine)
+  vectorized : pricing.quote_scenarios, the engine's NumPy path
+  http       : POST /quote/batch (JSON + validation + engine), in chunks of at most
+               QUOTE_BATCH_MAX_ITEMS line items, through the app's TestClient
+
+All three must agree on every scenario total.
+
+Usage (from backend/):
+    python scripts/bench_quote_batch.py --scenarios 500 --modules 20
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "offline")
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import config
+from app.server import app
+from app.tools import pricing
+
+
+def make_scenarios(count: int, modules: int, levels: list, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [{
+        "name": f"scenario-{i}",
+        "items": [{"module": f"module-{m}", "hours": rng.randint(8, 400), "level": rng.choice(levels)}
+                  for m in range(modules)],
+        "contingency": rng.choice([0.0, 0.1, 0.15, 0.2]),
+        "discount": rng.choice([0.0, 0.05, 0.1]),
+        "include_gst": rng.random() < 0.8,
+    } for i in range(count)]
+
+
+def price_scalar(scenarios: list, gst_rate: float) -> list:
+    totals = []
+    for scenario in scenarios:
+        subtotal = sum(pricing.calculate_project_price(item["hours"], item["level"]) for item in scenario["items"])
+        contingency = round(subtotal * scenario["contingency"])
+        discount = round((subtotal + contingency) * scenario["discount"])
+        taxable = subtotal + contingency - discount
+        gst = round(taxable * gst_rate) if scenario["include_gst"] else 0
+        totals.append(taxable + gst)
+    return totals
+
+
+def price_vectorized(scenarios: list, card) -> list:
+    counts = [len(s["items"]) for s in scenarios]
+    quote = pricing.quote_scenarios(
+        card,
+        hours=[item["hours"] for s in scenarios for item in s["items"]],
+        levels=[item["level"] for s in scenarios for item in s["items"]],
+        scenario_ids=np.repeat(np.arange(len(scenarios)), counts),
+        scenarios=len(scenarios),
+        contingency=[s["contingency"] for s in scenarios],
+        discount=[s["discount"] for s in scenarios],
+        include_gst=[s["include_gst"] for s in scenarios],
+    )
+    return quote["total"].astype(np.int64).tolist()
+
+
+def price_http(client: TestClient, scenarios: list, max_items: int) -> list:
+    totals, chunk = [], []
+    per_scenario = len(scenarios[0]["items"])
+    step = max(1, max_items // per_scenario)
+    for start in range(0, len(scenarios), step):
+        chunk = scenarios[start:start + step]
+        response = client.post("/quote/batch", json={"scenarios": chunk})
+        assert response.status_code == 200, response.text
+        totals += [s["total"] for s in response.json()["scenarios"]]
+    return totals
+
+
+def timed(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=500)
+    parser.add_argument("--modules", type=int, default=20, help="line items per scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    card = pricing.get_store().get()
+    scenarios = make_scenarios(args.scenarios, args.modules, card.levels)
+    items = args.scenarios * args.modules
+    client = TestClient(app)
+
+    runs = {
+        "scalar": timed(lambda: price_scalar(scenarios, card.gst_rate), args.repeat),
+        "vectorized": timed(lambda: price_vectorized(scenarios, card), args.repeat),
+        "http": timed(lambda: price_http(client, scenarios, config.QUOTE_BATCH_MAX_ITEMS), args.repeat),
+    }
+    reference = runs["scalar"][1]
+    for name, (_, totals) in runs.items():
+        assert totals == reference, f"{name} totals differ from the scalar loop"
+
+    print(f"rate card {card.version}: {args.scenarios} scenarios x {args.modules} line items = {items} lines\n")
+    print(f"{'mode':<11} {'ms':>9} {'line items/s':>14} {'scenarios/s':>12}")
+    for name, (seconds, _) in runs.items():
+        print(f"{name:<11} {seconds * 1000:>9.1f} {items / seconds:>14,.0f} {args.scenarios / seconds:>12,.0f}")
+    print(f"\nall modes agree on {len(reference)} scenario totals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: cold vs warm knowledge-base lookups.
+
+"Cold" reproduces the old behaviour of retrieve_similar_projects: a fresh embedding
+model is loaded for every lookup. "Warm" reuses the shared RetrievalRuntime.
+Both run against a local in-memory Qdrant, so no network or API keys are needed
+(with :memory: the connection cost itself is not captured, only the model load).
+
+Usage (from backend/):
+    python scripts/bench_rag.py --lookups 20
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from qdrant_client import QdrantClient, models
+
+from app.tools import rag
+from app.tools.rag import RetrievalRuntime
+
+SAMPLE_DOCS = [
+    "E-commerce platform with payment gateway, product catalog and order tracking.",
+    "Pricing policy: junior 100 INR/h, mid 250 INR/h, senior 500 INR/h, expert 1000 INR/h.",
+    "Hospital management system with appointment booking and billing modules.",
+    "Mobile food delivery app with live rider tracking and push notifications.",
+    "Learning management system with video courses, quizzes and certificates.",
+    "Inventory dashboard for a retail chain with barcode scanning and reports.",
+]
+
+QUERIES = [
+    "past e-commerce projects",
+    "pricing policy",
+    "healthcare software",
+    "delivery app with tracking",
+]
+
+
+def seed_collection(runtime: RetrievalRuntime):
+    client = runtime.client
+    client.create_collection(
+        collection_name=runtime.collection_name,
+        vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE),
+    )
+    vectors = runtime.embeddings.embed_documents(SAMPLE_DOCS)
+    client.upsert(
+        collection_name=runtime.collection_name,
+        points=[
+            models.PointStruct(
+                id=i,
+                vector=vector,
+                payload={"page_content": doc, "metadata": {"source": "bench.pdf"}},
+            )
+            for i, (doc, vector) in enumerate(zip(SAMPLE_DOCS, vectors))
+        ],
+    )
+
+
+def timed_lookups(n: int, make_runtime) -> list:
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        rag.set_runtime(make_runtime())
+        result = rag.retrieve_similar_projects(QUERIES[i % len(QUERIES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert not result.startswith("Error"), result
+    return latencies
+
+
+def report(label: str, latencies: list):
+    ordered = sorted(latencies)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    print(f"{label:<6} mean={statistics.mean(latencies):8.1f} ms  "
+          f"p50={statistics.median(latencies):8.1f} ms  p95={p95:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    client = QdrantClient(":memory:")
+    shared = RetrievalRuntime(client=client)
+    seed_collection(shared)
+
+    # Cold: new runtime (and so a new ONNX model load) on every lookup
+    cold = timed_lookups(args.lookups, lambda: RetrievalRuntime(client=client))
+
+    # Warm: one runtime, warmed once up front like the FastAPI startup hook does
+    shared.warm_up()
+    warm = timed_lookups(args.lookups, lambda: shared)
+
+    print(f"\n{args.lookups} lookups against in-memory Qdrant")
+    report("cold", cold)
+    report("warm", warm)
+    print(f"speed-up (mean): {statistics.mean(cold) / statistics.mean(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
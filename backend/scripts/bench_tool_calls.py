@@ -0,0 +1,109 @@
+"""
+Benchmark: LLM round trips per conversation, one tool per call vs parallel tool calls.
+
+Plays a scripted 4-turn sales conversation through the real graph with a
+scripted fake model (scripts/fake_llm.py). Knowledge-base lookups are faked with
+`--lookup-latency`, and proposals are not really queued. The turns are:
+
+  1. the client describes the project                      -> plain answer
+  2. "what did similar apps cost, what is your policy,
+     and what would ours cost?"                             -> 2 lookups + a price
+  3. "and an e-commerce version?"                           -> 1 lookup + a price
+  4. "accepted, send it to client@example.com"              -> generate_proposal
+
+  sequential : the model makes one tool call per response, as the old
+               [LOOKUP:]/[CALCULATE:] tags did (only the first tag ran). Every
+               tool result costs another LLM call.
+  parallel   : the model makes all of a turn's calls in one response. They run
+               concurrently and their results come back in a single follow-up call.
+
+Usage (from backend/):
+    python scripts/bench_tool_calls.py --sessions 5 --llm-latency 0.8 --lookup-latency 0.3
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("GROQ_API_KEY", "bench-not-used")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app import agent
+from fake_llm import SlowFakeChatModel
+
+TURNS = [
+    "We need a hospital appointment booking app, web and mobile, about 5,000 patients.",
+    "What did similar apps cost you, what is your pricing policy, and what would ours cost?",
+    "And what would an e-commerce version of the same app cost?",
+    "Accepted, please send the proposal to client@example.com",
+]
+
+HEALTHCARE = {"name": "lookup_projects", "args": {"query": "hospital booking app", "domain": "healthcare"}}
+POLICY = {"name": "lookup_projects", "args": {"query": "pricing and payment terms", "type": "pricing_policy"}}
+PRICE = {"name": "calculate_price", "args": {"hours": 300, "level": "senior"}}
+ECOMMERCE = {"name": "lookup_projects", "args": {"query": "online store", "domain": "ecommerce"}}
+ECOMMERCE_PRICE = {"name": "calculate_price", "args": {"hours": 200, "level": "mid"}}
+PROPOSAL = {"name": "generate_proposal", "args": {"email": "client@example.com"}}
+
+# Tool calls the model makes in each turn, grouped by response
+STEPS = {
+    "sequential": [[], [[HEALTHCARE], [POLICY], [PRICE]], [[ECOMMERCE], [ECOMMERCE_PRICE]], [[PROPOSAL]]],
+    "parallel": [[], [[HEALTHCARE, POLICY, PRICE]], [[ECOMMERCE, ECOMMERCE_PRICE]], [[PROPOSAL]]],
+}
+
+
+def script(mode: str) -> list:
+    replies = []
+    for turn, responses in enumerate(STEPS[mode]):
+        replies += [AIMessage(content="", tool_calls=[{**call, "id": ""} for call in calls]) for calls in responses]
+        if turn < len(TURNS) - 1:    # the proposal turn ends with the tool node's confirmation
+            replies.append("Here is what I found; shall I go ahead?")
+    return replies
+
+
+async def run(mode: str, sessions: int, llm_latency: float, lookup_latency: float) -> dict:
+    async def fake_lookup(query, filters=None):
+        await asyncio.sleep(lookup_latency)
+        return f"--- Snippet for '{query}' {filters} ---\nSimilar project cost ₹8–12 lakh."
+
+    agent.llm = SlowFakeChatModel(replies=script(mode), latency=llm_latency)
+    agent.aretrieve_similar_projects = fake_lookup
+    agent.prefetcher.enabled = False
+    agent.enqueue_proposal = lambda price, reqs, recipient, rag: "bench-job"
+    graph = agent.workflow.compile(checkpointer=MemorySaver())
+
+    turn_ms = [0.0] * len(TURNS)
+    for session in range(sessions):
+        thread = {"configurable": {"thread_id": f"{mode}-{session}"}}
+        for turn, text in enumerate(TURNS):
+            start = time.perf_counter()
+            result = await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config=thread)
+            turn_ms[turn] += (time.perf_counter() - start) * 1000
+        assert result.get("proposal_job_id") == "bench-job", result["messages"][-1].content
+    return {"llm_calls": agent.llm.calls / sessions, "turn_ms": [ms / sessions for ms in turn_ms]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per LLM call")
+    parser.add_argument("--lookup-latency", type=float, default=0.3, help="seconds per knowledge-base lookup")
+    args = parser.parse_args()
+
+    results = {mode: asyncio.run(run(mode, args.sessions, args.llm_latency, args.lookup_latency))
+               for mode in STEPS}
+    print(f"{args.sessions} sessions, LLM {args.llm_latency}s/call, lookup {args.lookup_latency}s\n")
+    print(f"{'mode':<11} {'LLM calls':>9} | " + " ".join(f"{f'turn {i + 1} ms':>10}" for i in range(len(TURNS)))
+          + f" | {'total s':>7}")
+    for mode, r in results.items():
+        print(f"{mode:<11} {r['llm_calls']:>9.0f} | " + " ".join(f"{ms:>10.0f}" for ms in r["turn_ms"])
+              + f" | {sum(r['turn_ms']) / 1000:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local fake of Brevo's transactional email API (POST /v3/smtp/email).
+
+Accepts the SDK's payload (single `to` or `messageVersions`), checks the api-key
+header and records every delivered recipient, without sending anything. It
+simulates Brevo's rate limit: past `--rps` requests per second it answers 429 with
+Retry-After. `--error-rate` adds random 503s.
+
+Point the backend at it with BREVO_API_HOST=http://127.0.0.1:8120/v3 (any API key).
+
+Usage (from backend/):
+    python scripts/fake_brevo_server.py --port 8120 --rps 5 --error-rate 0.1
+"""
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeBrevoState:
+    def __init__(self, rps: float, latency: float, error_rate: float):
+        self.rps = rps
+        self.latency = latency
+        self.error_rate = error_rate
+        self.window = []
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.delivered = Counter()       # (attachment name, recipients) -> times delivered
+
+    def admit(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            if not self.rps:
+                return True
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            if len(self.window) >= self.rps:
+                self.rate_limited += 1
+                return False
+            self.window.append(now)
+            return True
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "rate_limited": self.rate_limited, "errors": self.errors,
+                "emails": sum(self.delivered.values()), "duplicates": sum(n - 1 for n in self.delivered.values() if n > 1)}
+
+
+def create_app(rps: float = 0, latency: float = 0.05, error_rate: float = 0.0, api_key: str = None) -> FastAPI:
+    app = FastAPI(title="Fake Brevo API")
+    state = FakeBrevoState(rps, latency, error_rate)
+    app.state.fake = state
+
+    @app.post("/v3/smtp/email")
+    async def send_transac_email(request: Request):
+        if api_key and request.headers.get("api-key") != api_key:
+            return JSONResponse({"code": "unauthorized", "message": "Key not found"}, status_code=401)
+        if not state.admit():
+            return JSONResponse({"code": "too_many_requests", "message": "Rate limit exceeded"},
+                                status_code=429, headers={"Retry-After": "1"})
+        if random.random() < state.error_rate:
+            state.errors += 1
+            return JSONResponse({"code": "internal_error", "message": "Service unavailable"}, status_code=503)
+
+        body = await request.json()
+        await asyncio.sleep(state.latency)
+        versions = body.get("messageVersions") or [{"to": body.get("to", [])}]
+        if not versions[0]["to"]:
+            return JSONResponse({"code": "missing_parameter", "message": "to is missing"}, status_code=400)
+        name = (body.get("attachment") or [{}])[0].get("name", "")
+        ids = []
+        for version in versions:
+            state.delivered[(name, tuple(sorted(r["email"] for r in version["to"])))] += 1
+            ids.append(f"<{uuid.uuid4().hex}@smtp-relay.mailin.fr>")
+        if len(ids) == 1:
+            return JSONResponse({"messageId": ids[0]}, status_code=201)
+        return JSONResponse({"messageIds": ids}, status_code=201)
+
+    app.get("/stats")(lambda: state.stats())
+    return app
+
+
+def start_in_thread(port: int, **kwargs):
+    """Starts the fake server in a daemon thread; returns (server, state) once it is accepting."""
+    app = create_app(**kwargs)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, app.state.fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8120)
+    parser.add_argument("--rps", type=float, default=5, help="requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.rps, args.latency, args.error_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Offline stand-in for ChatGroq used by the benchmark scripts.
+
+It answers with canned replies after a simulated network latency, so graph and
+server behaviour can be measured without API keys or rate limits.
+"""
+import json
+import time
+import asyncio
+from typing import List, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolCallChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Replies with `replies` in rotation after `latency` seconds.
+
+    blocking=True makes the async path call time.sleep, which reproduces a
+    synchronous client being called from inside an async endpoint.
+    latency_per_1k_tokens adds prompt-size-dependent latency (prefill cost);
+    the estimated prompt size of every call is kept in `prompt_tokens`.
+    latency_per_output_token adds reply-size-dependent latency (decode cost).
+    A reply can also be an AIMessage with tool_calls (scripted tool use); every
+    call gets a fresh id. Bound tools are accepted and ignored.
+    """
+
+    replies: List[Union[str, AIMessage]] = ["Could you tell me more about the features you need?"]
+    latency: float = 0.2
+    latency_per_1k_tokens: float = 0.0
+    latency_per_output_token: float = 0.0
+    blocking: bool = False
+    max_tokens: Optional[int] = None    # read by the gateway's token budgeting, like ChatGroq's
+    calls: int = 0
+    prompt_tokens: List[int] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=tools, **kwargs)
+
+    def _next_reply(self) -> ChatResult:
+        reply = self.replies[self.calls % len(self.replies)]
+        self.calls += 1
+        if isinstance(reply, str):
+            reply = AIMessage(content=reply)
+        else:
+            reply = AIMessage(content=reply.content, tool_calls=[
+                {**call, "id": f"call_{self.calls}_{i}"} for i, call in enumerate(reply.tool_calls)])
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _delay(self, messages, reply: str = "") -> float:
+        tokens = sum(len(str(m.content)) for m in messages) // 4
+        self.prompt_tokens.append(tokens)
+        return (self.latency + self.latency_per_1k_tokens * tokens / 1000
+                + self.latency_per_output_token * (len(reply) // 4))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result = self._next_reply()
+        time.sleep(self._delay(messages, result.generations[0].message.content))
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        result = self._next_reply()
+        delay = self._delay(messages, result.generations[0].message.content)
+        if self.blocking:
+            time.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Spread the latency over word-sized tokens, like a real streaming response
+        message = self._next_reply().generations[0].message
+        reply = message.content
+        delay = self._delay(messages, reply)
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay / len(words))
+            token = word if i == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                ToolCallChunk(name=call["name"], args=json.dumps(call["args"]), id=call["id"], index=i)
+                for i, call in enumerate(message.tool_calls)]))
@@ -0,0 +1,149 @@
+"""
+Local fake of Groq's OpenAI-compatible chat completions API.
+
+Serves POST /openai/v1/chat/completions (the path the Groq SDK calls; plain
+/v1/chat/completions works too) with canned answers after a simulated latency,
+streaming or not. It enforces a tokens-per-minute budget like the real API:
+over-budget requests get 429 with a Retry-After header. `--error-rate` adds
+random 503s.
+
+Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:8100 (any API key).
+
+Usage (from backend/):
+    python scripts/fake_openai_server.py --port 8100 --tpm 6000 --latency 0.3
+"""
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = "Thanks! Could you tell me which platforms you need and how many users you expect?"
+
+
+class FakeServerState:
+    def __init__(self, tpm: int, latency: float, error_rate: float):
+        self.tpm = tpm
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.completed = 0
+        self.max_concurrent = 0
+        self.concurrent = 0
+
+    def admit(self, tokens: int):
+        """Returns None if the request fits the TPM budget, else seconds until it would."""
+        with self.lock:
+            self.requests += 1
+            if not self.tpm:
+                return None
+            now = time.monotonic()
+            self.tokens = min(self.tpm, self.tokens + (now - self.updated) * self.tpm / 60.0)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return None
+            self.rate_limited += 1
+            return (tokens - self.tokens) / (self.tpm / 60.0)
+
+    def stats(self) -> dict:
+        return {k: getattr(self, k) for k in ("requests", "completed", "rate_limited", "errors", "max_concurrent")}
+
+
+def create_app(tpm: int = 0, latency: float = 0.3, error_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI-compatible API")
+    state = FakeServerState(tpm, latency, error_rate)
+    app.state.fake = state
+
+    async def completions(request: Request):
+        body = await request.json()
+        prompt_chars = sum(len(m["content"]) if isinstance(m.get("content"), str)
+                           else sum(len(p.get("text", "")) for p in m.get("content") or [])
+                           for m in body["messages"])
+        prompt_tokens = prompt_chars // 4 + 1
+        completion_tokens = len(REPLY) // 4
+        retry_after = state.admit(prompt_tokens + completion_tokens)
+        if retry_after is not None:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (tokens per minute)", "type": "tokens", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": str(math.ceil(retry_after))},
+            )
+        if random.random() < state.error_rate:
+            state.errors += 1
+            return JSONResponse({"error": {"message": "Service unavailable", "type": "internal_server_error"}}, status_code=503)
+
+        state.concurrent += 1
+        state.max_concurrent = max(state.max_concurrent, state.concurrent)
+        created, model = int(time.time()), body.get("model", "fake")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(state.latency)
+            finally:
+                state.concurrent -= 1
+            state.completed += 1
+            return {
+                "id": f"chatcmpl-{random.getrandbits(48):x}", "object": "chat.completion", "created": created,
+                "model": model, "usage": usage,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}}],
+            }
+
+        async def stream():
+            try:
+                words = REPLY.split(" ")
+                for i, word in enumerate(words):
+                    await asyncio.sleep(state.latency / len(words))
+                    chunk = {"id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                final = {"id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+                state.completed += 1
+            finally:
+                state.concurrent -= 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.post("/openai/v1/chat/completions")(completions)
+    app.post("/v1/chat/completions")(completions)
+    app.get("/stats")(lambda: state.stats())
+    return app
+
+
+def start_in_thread(port: int, **kwargs):
+    """Starts the fake server in a daemon thread; returns (server, state) once it is accepting."""
+    app = create_app(**kwargs)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, app.state.fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tpm", type=int, default=6000, help="tokens per minute before 429s (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.tpm, args.latency, args.error_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,24 @@
 import os
+import sys
+import json
+import time
+import uuid
+import re
+import hashlib
+import unicodedata
+import queue
 import asyncio
+import argparse
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
 from dotenv import load_dotenv
+from pypdf import PdfReader
 from llama_parse import LlamaParse
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Qdrant
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from fastembed import TextEmbedding
 from qdrant_client import QdrantClient, models
 from langchain_core.documents import Document
 
@@ -17,6 +31,14 @@ current_script = os.path.abspath(__file__)
 backend_dir = os.path.dirname(os.path.dirname(current_script))
 project_root = os.path.dirname(backend_dir)
 
+# Make the 'app' package importable when run as `python scripts/ingest.py`
+sys.path.insert(0, backend_dir)
+from app.config import env_int, env_float
+from app.tools.rag import (
+    EMBEDDING_MODEL, DOC_TYPE_KEYWORDS, DOMAIN_KEYWORDS,
+    bump_collection_version, ensure_payload_indexes,
+)
+
 # 3. Define the path to .env
 env_path = os.path.join(project_root, ".env")
 
@@ -36,53 +58,440 @@ LLAMA_CLOUD_API_KEY = os.getenv("LLAMA_CLOUD_API_KEY")
 DATA_DIR = os.path.join(backend_dir, "knowledge_base")
 COLLECTION_NAME = "procode_knowledge"
 
-async def ingest_data():
-    print(f" Loading documents from {DATA_DIR}...")
-
-    # 1. Initialize Parser
-    parser = LlamaParse(
-        api_key=LLAMA_CLOUD_API_KEY,
-        result_type="markdown",
-        verbose=True,
-    )
-
-    # 2. Find Files
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith(".pdf")]
-    if not files:
-        print(" No PDF files found.")
-        return
-
-    documents = []
-    
-    # 3. Parse Files
-    for file in files:
-        file_path = os.path.join(DATA_DIR, file)
-        print(f" Parsing {file}...")
-        try:
-            parsed = await parser.aload_data(file_path) # efficient async loading
-            text = "\n".join([doc.text for doc in parsed])
-            documents.append(Document(page_content=text, metadata={"source": file}))
-            print(f" Successfully parsed {file}")
-        except Exception as e:
-            print(f" Error reading {file}: {e}")
+# Parsing backend: "local" (pypdf only), "llamaparse" (cloud only) or "hybrid"
+# (pypdf, with LlamaParse only for pages where local extraction finds too little text)
+PARSER_BACKEND = os.getenv("INGEST_PARSER", "hybrid")
+PDF_WORKERS = env_int("INGEST_PDF_WORKERS", os.cpu_count() or 2)    # process pool for local extraction
+PAGES_PER_TASK = env_int("INGEST_PAGES_PER_TASK", 8)
+MIN_PAGE_CHARS = env_int("INGEST_MIN_PAGE_CHARS", 100)             # below this a page goes to the fallback
 
-    if not documents:
-        print("No documents to process.")
-        return
+# Parsing: how many files are in flight at once, and how hard to retry each one
+PARSE_CONCURRENCY = env_int("INGEST_PARSE_CONCURRENCY", 4)
+PARSE_RETRIES = env_int("INGEST_PARSE_RETRIES", 3)
+PARSE_RETRY_BASE_DELAY = env_float("INGEST_PARSE_RETRY_BASE_DELAY", 2.0)   # seconds, doubles per attempt
 
-    # 4. Split Text
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    final_docs = splitter.split_documents(documents)
-    print(f" Total text chunks created: {len(final_docs)}")
+# Embed + upsert stage: batch sizes and parallelism (memory is bounded by these, not the corpus)
+EMBED_BATCH_SIZE = env_int("INGEST_EMBED_BATCH_SIZE", 64)
+EMBED_THREADS = env_int("INGEST_EMBED_THREADS", 0)                 # 0 = let onnxruntime decide
+UPSERT_BATCH_SIZE = env_int("INGEST_UPSERT_BATCH_SIZE", 256)
+UPSERT_PARALLELISM = env_int("INGEST_UPSERT_PARALLELISM", 4)
+
+# Manifest of what is already in Qdrant: file content hashes -> point ids
+MANIFEST_NAME = ".ingest_manifest.json"
+# Bump when the stored payload layout changes: an older manifest triggers a full re-upsert
+MANIFEST_VERSION = 2
+# Fixed namespace so the same (file, chunk) always maps to the same point id
+POINT_ID_NAMESPACE = uuid.UUID("6f1c9a52-3f0e-4d2b-9a59-0c7e2f4d8b11")
+
+
+# -----------------------
+# MANIFEST HELPERS
+# -----------------------
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id(source: str, chunk_hash: str) -> str:
+    """Deterministic Qdrant id: re-ingesting an unchanged chunk overwrites, never duplicates."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source}:{chunk_hash}"))
+
+
+def load_manifest(data_dir: str) -> dict:
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "collection": COLLECTION_NAME, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(data_dir: str, manifest: dict):
+    # Write-then-rename so an interrupted run never leaves a half-written manifest
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_ingest(data_dir: str, manifest: dict, force: bool = False) -> dict:
+    """Compares the PDFs on disk with the manifest and decides what needs work."""
+    if manifest.get("version") != MANIFEST_VERSION:
+        force = True
+    on_disk = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith(".pdf"):
+            on_disk[name] = file_sha256(os.path.join(data_dir, name))
+
+    known = manifest.get("files", {})
+    plan = {"new": [], "changed": [], "unchanged": [], "removed": [], "hashes": on_disk}
+    for name, digest in on_disk.items():
+        if name not in known:
+            plan["new"].append(name)
+        elif force or known[name].get("sha256") != digest:
+            plan["changed"].append(name)
+        else:
+            plan["unchanged"].append(name)
+    plan["removed"] = sorted(set(known) - set(on_disk))
+    plan["force"] = force
+    # Points from before the manifest have random ids and would sit next to the
+    # deterministic ones forever: clear them out once (and on every forced run)
+    plan["purge_legacy"] = force or not manifest.get("legacy_purged")
+    return plan
+
+
+# Points written before chunk hashes and deterministic ids existed
+LEGACY_POINTS = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="metadata.chunk_hash"))])
+
+
+def purge_legacy_points(client, collection_name: str) -> int:
+    """Deletes points without a metadata.chunk_hash; returns how many there were."""
+    legacy = client.count(collection_name=collection_name, count_filter=LEGACY_POINTS, exact=True).count
+    if legacy:
+        client.delete(collection_name=collection_name, points_selector=models.FilterSelector(filter=LEGACY_POINTS))
+    return legacy
+
+
+# -----------------------
+# PAYLOAD METADATA
+# -----------------------
+YEAR_PATTERN = re.compile(r"\b(19[89]\d|20\d\d)\b")
+
+
+def classify_doc_type(source: str, text: str) -> str:
+    # The file name is the strongest signal; fall back to the opening text
+    for haystack in (source.lower(), text[:2000].lower()):
+        for doc_type, keywords in DOC_TYPE_KEYWORDS.items():
+            if any(keyword in haystack for keyword in keywords):
+                return doc_type
+    return "document"
+
+
+def detect_domain(text: str) -> str:
+    text = text.lower()
+    scores = {domain: sum(text.count(k) for k in keywords) for domain, keywords in DOMAIN_KEYWORDS.items()}
+    domain, score = max(scores.items(), key=lambda item: item[1])
+    return domain if score else "general"
+
+
+def detect_year(source: str, text: str):
+    match = YEAR_PATTERN.search(source) or YEAR_PATTERN.search(text[:2000])
+    return int(match.group()) if match else None
+
+
+def enrich_metadata(source: str, pages: List[Document], chunks: List[Document]):
+    """Adds doc_type/year (per file) and domain (per chunk) next to source/page."""
+    opening = "\n".join(page.page_content for page in pages[:2])
+    doc_type = classify_doc_type(source, opening)
+    year = detect_year(source, opening)
+    for chunk in chunks:
+        chunk.metadata["doc_type"] = doc_type
+        chunk.metadata["domain"] = detect_domain(chunk.page_content)
+        if year is not None:
+            chunk.metadata["year"] = year
+
+
+# -----------------------
+# PARSERS
+# -----------------------
+# Every backend turns one PDF into a list of page Documents with
+# metadata {"source": <file name>, "page": <1-based page number>}.
+class DocumentParser(ABC):
+    @abstractmethod
+    async def parse(self, file_path: str, pages: Optional[List[int]] = None) -> List[Document]:
+        """Parses `file_path` (only `pages`, 1-based, if given) into page Documents."""
+
+    def close(self):
+        pass
+
+
+def page_to_markdown(text: str) -> str:
+    """Tidies raw pypdf output into markdown-ish text: bullets as '- ', no blank-line runs."""
+    lines = []
+    for line in unicodedata.normalize("NFKC", text).splitlines():   # NFKC also undoes ligatures like 'ﬁ'
+        line = line.strip()
+        if not line:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        if line[0] in "•●▪◦·":
+            line = "- " + line[1:].strip()
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def count_pdf_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_pdf_pages(file_path: str, page_numbers: List[int]) -> List[str]:
+    """Worker-process job: extracts the given 1-based pages from one PDF."""
+    reader = PdfReader(file_path)
+    return [page_to_markdown(reader.pages[n - 1].extract_text() or "") for n in page_numbers]
+
+
+class LocalPdfParser(DocumentParser):
+    """Network-free pypdf backend; pages are extracted in parallel across a process pool."""
+
+    def __init__(self, workers: int = PDF_WORKERS, pages_per_task: int = PAGES_PER_TASK):
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def parse(self, file_path: str, pages: Optional[List[int]] = None) -> List[Document]:
+        loop = asyncio.get_running_loop()
+        if pages is None:
+            total = await loop.run_in_executor(self.pool, count_pdf_pages, file_path)
+            pages = list(range(1, total + 1))
+
+        groups = [pages[i:i + self.pages_per_task] for i in range(0, len(pages), self.pages_per_task)]
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, extract_pdf_pages, file_path, group) for group in groups
+        ))
+        source = os.path.basename(file_path)
+        texts = [text for group_texts in results for text in group_texts]
+        return [
+            Document(page_content=text, metadata={"source": source, "page": number})
+            for number, text in zip(pages, texts)
+        ]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class LlamaParseParser(DocumentParser):
+    """
+    LlamaParse cloud backend (markdown output, one Document per page).
+
+    LlamaParse's markdown result carries no page numbers, and it can skip pages (blank
+    ones, for instance), so its Documents are only numbered when there is exactly one
+    per requested page. Otherwise the file goes to `local` instead, or, without a local
+    parser, yields no pages (HybridParser then keeps its own local text).
+    """
 
-    # 5. Initialize Embeddings & Client
+    def __init__(self, api_key: str = LLAMA_CLOUD_API_KEY, local: Optional[DocumentParser] = None):
+        self.api_key = api_key
+        self.local = local
+        self.mismatched_files = 0
+
+    async def parse(self, file_path: str, pages: Optional[List[int]] = None) -> List[Document]:
+        parser = LlamaParse(
+            api_key=self.api_key,
+            result_type="markdown",
+            verbose=True,
+            # LlamaParse counts pages from 0
+            target_pages=",".join(str(n - 1) for n in pages) if pages else None,
+        )
+        parsed = await parser.aload_data(file_path) # efficient async loading
+        numbers = pages or list(range(1, await asyncio.to_thread(count_pdf_pages, file_path) + 1))
+        source = os.path.basename(file_path)
+        if len(parsed) != len(numbers):
+            self.mismatched_files += 1
+            print(f" {source}: LlamaParse returned {len(parsed)} page(s) for {len(numbers)}, "
+                  f"{'using the local parser' if self.local else 'ignoring its output'}")
+            return await self.local.parse(file_path, pages) if self.local else []
+        return [
+            Document(page_content=doc.text, metadata={"source": source, "page": number})
+            for number, doc in zip(numbers, parsed)
+        ]
+
+    def close(self):
+        if self.local is not None:
+            self.local.close()
+
+
+class HybridParser(DocumentParser):
+    """Local extraction first; only pages with fewer than `min_chars` characters go to the fallback."""
+
+    def __init__(self, local: DocumentParser, fallback: Optional[DocumentParser],
+                 min_chars: int = MIN_PAGE_CHARS):
+        self.local = local
+        self.fallback = fallback
+        self.min_chars = min_chars
+        self.fallback_pages = 0
+
+    async def parse(self, file_path: str, pages: Optional[List[int]] = None) -> List[Document]:
+        documents = await self.local.parse(file_path, pages)
+        sparse = [doc.metadata["page"] for doc in documents if len(doc.page_content) < self.min_chars]
+        if not sparse or self.fallback is None:
+            return documents
+
+        print(f" {os.path.basename(file_path)}: {len(sparse)} page(s) with little text, using fallback parser...")
+        replacements = {doc.metadata["page"]: doc for doc in await self.fallback.parse(file_path, sparse)}
+        self.fallback_pages += len(replacements)
+        return [replacements.get(doc.metadata["page"], doc) for doc in documents]
+
+    def close(self):
+        self.local.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+def build_parser(backend: str = PARSER_BACKEND) -> DocumentParser:
+    if backend == "local":
+        return LocalPdfParser()
+    if backend == "llamaparse":
+        return LlamaParseParser(local=LocalPdfParser())
+    if backend == "hybrid":
+        if not LLAMA_CLOUD_API_KEY:
+            print(" No LLAMA_CLOUD_API_KEY: hybrid parser will run without the LlamaParse fallback.")
+        return HybridParser(LocalPdfParser(), LlamaParseParser() if LLAMA_CLOUD_API_KEY else None)
+    raise ValueError(f"Unknown parser backend '{backend}' (expected local, llamaparse or hybrid)")
+
+
+async def parse_file(parser: DocumentParser, file_path: str, semaphore: asyncio.Semaphore,
+                     retries: int = PARSE_RETRIES, base_delay: float = PARSE_RETRY_BASE_DELAY) -> List[Document]:
+    """Parses one file under the concurrency limit, retrying with exponential backoff."""
+    source = os.path.basename(file_path)
+    async with semaphore:
+        for attempt in range(1, retries + 1):
+            try:
+                return await parser.parse(file_path)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = base_delay * 2 ** (attempt - 1)
+                print(f" Error reading {source} (attempt {attempt}/{retries}): {e}. Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+
+
+# -----------------------
+# EMBED + UPSERT STAGE
+# -----------------------
+def iter_batches(items, size: int):
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class EmbedUpsertStage:
+    """
+    Streams (point_id, chunk) pairs through fastembed and into Qdrant.
+
+    Chunks are pulled from the input iterator one upsert batch at a time, embedded
+    with `passage_embed` in `embed_batch_size` sub-batches, and sent as numpy-backed
+    `upsert(wait=False)` calls from a small thread pool. At most `parallelism`
+    batches are in flight, so peak memory is about (parallelism + 2) upsert batches
+    whatever the corpus size.
+
+    The last batch is held back until every other one was accepted and then sent
+    with wait=True. Qdrant applies updates in order, so when `run` returns all points
+    are searchable, and the manifest and version bump can follow safely.
+    """
+
+    def __init__(self, client, collection_name: str, model, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 upsert_batch_size: int = UPSERT_BATCH_SIZE, parallelism: int = UPSERT_PARALLELISM):
+        self.client = client
+        self.collection_name = collection_name
+        self.model = model
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.parallelism = max(1, parallelism)
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def _upsert(self, ids, vectors, payloads, wait_applied: bool = False):
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=models.Batch(ids=ids, vectors=vectors, payloads=payloads),
+            wait=wait_applied,
+        )
+
+    def run(self, items) -> int:
+        started = time.perf_counter()
+        pending = set()
+        held = None                   # the latest batch, sent once we know whether it's the last
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            for batch in iter_batches(items, self.upsert_batch_size):
+                texts = [chunk.page_content for _, chunk in batch]
+                vectors = np.vstack(list(
+                    self.model.passage_embed(texts, batch_size=self.embed_batch_size)
+                )).astype(np.float32)
+                payloads = [{"page_content": chunk.page_content, "metadata": chunk.metadata}
+                            for _, chunk in batch]
+
+                if held is not None:
+                    # Back-pressure: don't embed further ahead than the upload pool can absorb
+                    if len(pending) >= self.parallelism:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(pool.submit(self._upsert, *held))
+                held = ([pid for pid, _ in batch], vectors, payloads)
+
+                self.chunks += len(batch)
+                self.elapsed = time.perf_counter() - started
+                print(f" Embedded {self.chunks} chunks ({self.chunks_per_second:.1f} chunks/s)")
+            for future in pending:
+                future.result()
+        # Barrier: only sent after every earlier batch was accepted, and waits until applied
+        if held is not None:
+            self._upsert(*held, wait_applied=True)
+        self.elapsed = time.perf_counter() - started
+        return self.chunks
+
+
+async def ingest_data(data_dir: str = DATA_DIR, client=None, embedding_model=None, parser=None,
+                      parser_backend: str = PARSER_BACKEND, force: bool = False, concurrency: int = PARSE_CONCURRENCY,
+                      retries: int = PARSE_RETRIES, retry_base_delay: float = PARSE_RETRY_BASE_DELAY,
+                      embed_batch_size: int = EMBED_BATCH_SIZE, upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                      upsert_parallelism: int = UPSERT_PARALLELISM):
+    """
+    Brings the collection in line with the PDFs in `data_dir`.
+
+    Files are parsed concurrently (at most `concurrency` at a time). Each parsed file
+    is handed to the embed + upsert stage straight away, so chunking, embedding and
+    upserting overlap with parsing of the remaining files. `client`, `embedding_model`
+    and `parser` can be injected (e.g. an in-memory Qdrant and a stub parser) to run
+    offline.
+    """
+    print(f" Loading documents from {data_dir}...")
+    started = time.perf_counter()
+
+    # 1. Work out what changed since the last run
+    manifest = load_manifest(data_dir)
+    plan = plan_ingest(data_dir, manifest, force=force)
+    force = plan["force"]
+    to_parse = plan["new"] + plan["changed"]
+    print(f" Files: {len(plan['new'])} new, {len(plan['changed'])} changed, "
+          f"{len(plan['unchanged'])} unchanged, {len(plan['removed'])} removed")
+
+    if not to_parse and not plan["removed"] and not plan["purge_legacy"]:
+        print(" Knowledge base is up to date. Nothing to do.")
+        return plan
+
+    # 2. Initialize Parser
+    owns_parser = parser is None
+    if owns_parser and to_parse:
+        parser = build_parser(parser_backend)
+
+    # 3. Initialize Embeddings & Client
     # BAAI/bge-small-en-v1.5 produces vectors of size 384
-    embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5") 
-    
-    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    if embedding_model is None:
+        embedding_model = TextEmbedding(model_name=EMBEDDING_MODEL, threads=EMBED_THREADS or None)
+    if client is None:
+        client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
 
-    # 6. Check/Create Collection Explicitly (The Fix)
-    # We do this manually to avoid the 'init_from' error in LangChain
+    # 4. Check/Create Collection Explicitly (The Fix)
     if not client.collection_exists(COLLECTION_NAME):
         print(f" Collection '{COLLECTION_NAME}' does not exist. Creating it...")
         client.create_collection(
@@ -94,29 +503,160 @@ async def ingest_data():
         )
         print(" Collection created.")
     else:
-        print(f" Collection '{COLLECTION_NAME}' already exists. Appending data...")
+        print(f" Collection '{COLLECTION_NAME}' already exists. Upserting changes...")
+    ensure_payload_indexes(client, COLLECTION_NAME)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    stage = EmbedUpsertStage(client, COLLECTION_NAME, embedding_model,
+                             embed_batch_size=embed_batch_size,
+                             upsert_batch_size=upsert_batch_size,
+                             parallelism=upsert_parallelism)
+    stats = {"reused": 0, "deleted": 0, "failed": []}
+    ingested = {}                     # file -> chunk ids now stored in Qdrant
+    # Bounded hand-off: parsing pauses if the embed stage falls behind
+    documents = queue.Queue(maxsize=max(2, concurrency))
+
+    def chunk_stream():
+        # Runs in the stage thread: split each parsed file, give every chunk its
+        # deterministic id and yield only the ones Qdrant doesn't have yet
+        while (item := documents.get()) is not None:
+            source, pages = item
+            chunks = {}
+            split = splitter.split_documents(pages)
+            enrich_metadata(source, pages, split)
+            for chunk in split:
+                chunk_hash = chunk_sha256(chunk.page_content)
+                chunk.metadata["chunk_hash"] = chunk_hash
+                chunks[point_id(source, chunk_hash)] = chunk   # identical chunks collapse
+
+            old_ids = set(manifest["files"].get(source, {}).get("chunks", []))
+            stale_ids = list(old_ids - set(chunks))
+            if stale_ids:
+                client.delete(
+                    collection_name=COLLECTION_NAME,
+                    points_selector=models.PointIdsList(points=stale_ids),
+                )
+            stats["deleted"] += len(stale_ids)
+            for pid, chunk in chunks.items():
+                if force or pid not in old_ids:
+                    yield pid, chunk
+                else:
+                    stats["reused"] += 1
+            ingested[source] = sorted(chunks)
+
+    stage_task = asyncio.create_task(asyncio.to_thread(stage.run, chunk_stream()))
+
+    async def hand_off(item):
+        while not stage_task.done():
+            try:
+                documents.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.05)
+
+    # 5. Parse concurrently; each finished file is embedded while the rest are still parsing
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def parse_one(file: str):
+        try:
+            pages = await parse_file(parser, os.path.join(data_dir, file), semaphore,
+                                     retries=retries, base_delay=retry_base_delay)
+            return file, pages, None
+        except Exception as e:
+            return file, None, e
+
+    tasks = [asyncio.create_task(parse_one(file)) for file in to_parse]
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        file, pages, error = await task
+        if error is not None:
+            print(f" [{done}/{len(tasks)}] Giving up on {file}: {error}")
+            stats["failed"].append(file)
+            continue
+        await hand_off((file, pages))
+        print(f" [{done}/{len(tasks)}] Parsed {file}: {len(pages)} pages "
+              f"({time.perf_counter() - started:.1f}s elapsed)")
+    await hand_off(None)
+    if owns_parser and parser is not None:
+        parser.close()
 
-    # 7. Upload to Qdrant
     try:
-        # We use the instance wrapper instead of class method 'from_documents'
-        vector_store = Qdrant(
-            client=client,
-            collection_name=COLLECTION_NAME,
-            embeddings=embeddings,
-        )
-        
-        vector_store.add_documents(final_docs)
-        print(f" SUCCESS: Uploaded {len(final_docs)} vectors to Qdrant!")
+        await stage_task
     except Exception as e:
+        # Point ids are deterministic, so the next run simply redoes this work
         print(f" ERROR uploading to Qdrant: {e}")
+        return plan
+
+    # 6. Delete points of removed files (and pre-manifest leftovers), then record the new state
+    try:
+        # Not while a file failed: its old points are all the collection has of it
+        if plan["purge_legacy"] and not stats["failed"]:
+            legacy = purge_legacy_points(client, COLLECTION_NAME)
+            if legacy:
+                print(f" Deleted {legacy} points left over from before the ingest manifest")
+            stats["deleted"] += legacy
+            manifest["legacy_purged"] = True
+        removed_ids = [pid for file in plan["removed"] for pid in manifest["files"][file].get("chunks", [])]
+        if removed_ids:
+            client.delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=models.PointIdsList(points=removed_ids),
+            )
+        stats["deleted"] += len(removed_ids)
+
+        for file, chunk_ids in ingested.items():
+            manifest["files"][file] = {"sha256": plan["hashes"][file], "chunks": chunk_ids}
+        for file in plan["removed"]:
+            del manifest["files"][file]
+        if not stats["failed"]:
+            # A file that failed keeps its old entry, so only upgrade once everything was rewritten
+            manifest["version"] = MANIFEST_VERSION
+        save_manifest(data_dir, manifest)
+
+        # Tell running servers their cached lookups are stale
+        if stage.chunks or stats["deleted"]:
+            version = bump_collection_version(client, COLLECTION_NAME)
+            print(f" Knowledge base version is now {version}")
+    except Exception as e:
+        print(f" ERROR updating Qdrant: {e}")
+        return plan
+
+    # 7. Run summary
+    failed = len(stats["failed"])
+    print("\n --- Ingest summary ---")
+    print(f" Files skipped (unchanged): {len(plan['unchanged'])}")
+    print(f" Files ingested:            {len(ingested)}" + (f" ({failed} failed)" if failed else ""))
+    print(f" Files removed:             {len(plan['removed'])}")
+    print(f" Chunks embedded:           {stage.chunks} ({stage.chunks_per_second:.1f} chunks/s)")
+    print(f" Chunks skipped (reused):   {stats['reused']}")
+    print(f" Chunks deleted:            {stats['deleted']}")
+    print(f" Elapsed:                   {time.perf_counter() - started:.1f}s")
+    return plan
 
 # -----------------------
 # RUN THE SCRIPT
 # -----------------------
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Ingest knowledge_base PDFs into Qdrant.")
+    arg_parser.add_argument("--force", action="store_true", help="re-parse and re-embed every file")
+    arg_parser.add_argument("--parser", choices=["local", "llamaparse", "hybrid"], default=PARSER_BACKEND)
+    arg_parser.add_argument("--concurrency", type=int, default=PARSE_CONCURRENCY, help="files parsed at once")
+    arg_parser.add_argument("--retries", type=int, default=PARSE_RETRIES, help="parse attempts per file")
+    arg_parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    arg_parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    arg_parser.add_argument("--upsert-parallelism", type=int, default=UPSERT_PARALLELISM)
+    args = arg_parser.parse_args()
+
     if not QDRANT_API_KEY:
         print(" Missing QDRANT_API_KEY in .env")
-    elif not LLAMA_CLOUD_API_KEY:
+    elif args.parser == "llamaparse" and not LLAMA_CLOUD_API_KEY:
         print(" Missing LLAMA_CLOUD_API_KEY in .env")
     else:
-        asyncio.run(ingest_data())
\ No newline at end of file
+        asyncio.run(ingest_data(
+            parser_backend=args.parser,
+            force=args.force,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            embed_batch_size=args.embed_batch_size,
+            upsert_batch_size=args.upsert_batch_size,
+            upsert_parallelism=args.upsert_parallelism,
+        ))
@@ -1,11 +1,16 @@
 import streamlit as st
 import requests
-import os
 import uuid
-import base64
+import json
+import time
 
 # CONFIGURATION
 API_URL = "http://127.0.0.1:8000/chat"
+STREAM_URL = f"{API_URL}/stream"      # server-sent events variant of /chat
+UPLOAD_URL = "http://127.0.0.1:8000/attachments"
+JOBS_URL = "http://127.0.0.1:8000/jobs"
+PROPOSALS_URL = "http://127.0.0.1:8000/proposals"
+JOB_STAGE_LABELS = {"draft": "Drafting proposal...", "render": "Rendering PDF...", "email": "Emailing proposal..."}
 st.set_page_config(page_title="ProCode Bot", page_icon="🤖", layout="wide")
 
 # SESSION STATE INITIALIZATION
@@ -15,6 +20,21 @@ if "messages" not in st.session_state:
 if "thread_id" not in st.session_state:
     st.session_state.thread_id = str(uuid.uuid4())
 
+if "attachments" not in st.session_state:
+    st.session_state.attachments = {}     # uploader file_id -> backend attachment_id
+
+
+def upload_attachment(uploaded_file) -> str:
+    """Uploads the file once (multipart, no base64) and returns its backend attachment id."""
+    if uploaded_file.file_id not in st.session_state.attachments:
+        uploaded_file.seek(0)
+        response = requests.post(
+            UPLOAD_URL, files={"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
+        )
+        response.raise_for_status()
+        st.session_state.attachments[uploaded_file.file_id] = response.json()["attachment_id"]
+    return st.session_state.attachments[uploaded_file.file_id]
+
 with st.sidebar:
     st.header(" Projects Controls")
     st.markdown(" Attachments")
@@ -34,6 +54,54 @@ with st.sidebar:
         st.rerun()
 
 
+def iter_sse(response):
+    """Yields (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def wait_for_job(job_id: str, status_box, timeout: float = 180.0) -> dict:
+    """Polls the background proposal job until it finishes; shows the current stage meanwhile."""
+    deadline = time.time() + timeout
+    job = {"status": "queued"}
+    while time.time() < deadline:
+        job = requests.get(f"{JOBS_URL}/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        status_box.caption(JOB_STAGE_LABELS.get(job.get("stage"), "Preparing proposal..."))
+        time.sleep(1.0)
+    return job
+
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def fetch_proposal(proposal_id: str) -> bytes:
+    """Downloads a proposal PDF once; proposals never change, so reruns and later clicks reuse it."""
+    response = requests.get(f"{PROPOSALS_URL}/{proposal_id}")
+    response.raise_for_status()
+    return response.content
+
+
+def proposal_download_button(proposal_id: str, key: str):
+    # The PDF is only fetched when the button is clicked, not on every rerun
+    st.download_button(
+        label="Download Proposal PDF",
+        data=lambda: fetch_proposal(proposal_id),
+        file_name="ProCode_Proposal.pdf",
+        mime="application/pdf",
+        key=key,
+    )
+
+
 # --- MAIN CHAT INTERFACE ---
 
 st.title("ProCode Project Consultant")
@@ -47,18 +115,8 @@ for i, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
         # If a past message had a PDF, show the button again
-        if message.get("pdf_path"):
-             if os.path.exists(message["pdf_path"]):
-                 with open(message["pdf_path"], "rb") as f:
-                    st.download_button(
-                        label="Download Proposal PDF",
-                        data=f,
-                        file_name="ProCode_Proposal.pdf",
-                        mime="application/pdf",
-                        key=f"history_btn_{i}" # <--- FIX: Unique Key based on Index
-                    )
-             else:
-                 st.warning("PDF file no longer exists locally.")
+        if message.get("proposal_id"):
+            proposal_download_button(message["proposal_id"], key=f"history_btn_{i}") # <--- FIX: Unique Key based on Index
 
 #Handle user input
 if prompt := st.chat_input("Type your requirements here..."):
@@ -69,53 +127,67 @@ if prompt := st.chat_input("Type your requirements here..."):
 
     #Api integration
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                # NEW: Handle file upload
-                file_payload =  None
-                file_type = None
-
-                # Check if a file sits in sidebar uploader
-                if uploaded_file is not None:
-                    uploaded_file.seek(0)
-                    bytes_data = uploaded_file.getvalue()
-                    file_payload = base64.b64encode(bytes_data).decode('utf-8')
-                    file_type = uploaded_file.type
-
-                payload = {
-                    "message": prompt,
-                    "thread_id": st.session_state.thread_id,
-                    "file_data": file_payload,
-                    "file_type": file_type
-                }
-                #send POST request to API
-                response = requests.post(API_URL, json=payload)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    bot_text = data.get("response", "No response received.")
-                    pdf_path = data.get("pdf_path")  #Extract PDF path if exists
-                    st.markdown(bot_text)
-
-                    #Display results and download button
-                    if pdf_path and os.path.exists(pdf_path):
-                        st.success("Proposal generated successfully!")
-                        with open(pdf_path, 'rb') as f:
-                            st.download_button(
-                                label="Download Proposal PDF",
-                                data=f,
-                                file_name="Procode_Proposal.pdf",
-                                mime='application/pdf',
-                        )
-                        #add to history with the pdf path
-                        st.session_state.messages.append({"role": "assistant", "content": bot_text, "pdf_path": pdf_path})
-                    else:
-                        st.session_state.messages.append({"role": "assistant", "content": bot_text})
-                else:
+        status_box = st.empty()
+        answer_box = st.empty()
+        status_box.caption("Thinking...")
+        try:
+            # Check if a file sits in sidebar uploader: upload it once, then reference it by id
+            attachment_id = None
+            if uploaded_file is not None:
+                attachment_id = upload_attachment(uploaded_file)
+
+            payload = {
+                "message": prompt,
+                "thread_id": st.session_state.thread_id,
+                "attachment_id": attachment_id,
+            }
+            #send POST request to the streaming API and render tokens as they arrive
+            bot_text = ""
+            proposal_id = None
+            job_id = None
+            with requests.post(STREAM_URL, json=payload, stream=True) as response:
+                if response.status_code != 200:
                     st.error(f"API Error: {response.status_code}")
-            except requests.exceptions.ConnectionError:
-                st.error("Failed to connect to the server.")
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
+                else:
+                    draft = ""
+                    for event, data in iter_sse(response):
+                        if event == "token":
+                            draft += data["text"]
+                            answer_box.markdown(draft + "▌")
+                        elif event == "progress":
+                            # A tool is running: the streamed text so far was the tool call itself
+                            status_box.caption(data["message"])
+                            draft = ""
+                            answer_box.empty()
+                        elif event == "done":
+                            bot_text = data.get("response", "No response received.")
+                            job_id = data.get("job_id")      #Proposal queued in the background
+                        elif event == "error":
+                            st.error(f"API Error: {data.get('detail')}")
+
+            if bot_text:
+                answer_box.markdown(bot_text)
+            if job_id:
+                job = wait_for_job(job_id, status_box)
+                if job["status"] == "succeeded":
+                    proposal_id = job["result"].get("proposal_id")  #Fetched from the backend by id
+                elif job["status"] == "failed":
+                    st.error(f"Proposal generation failed: {job.get('error')}")
+                else:
+                    st.info("The proposal is still being prepared; it will arrive by email.")
+            status_box.empty()
+            if bot_text:
+                #Display results and download button
+                if proposal_id:
+                    st.success("Proposal generated successfully!")
+                    proposal_download_button(proposal_id, key=f"new_btn_{proposal_id}")
+                    #add to history with the proposal id
+                    st.session_state.messages.append({"role": "assistant", "content": bot_text, "proposal_id": proposal_id})
+                else:
+                    st.session_state.messages.append({"role": "assistant", "content": bot_text})
+        except requests.exceptions.ConnectionError:
+            st.error("Failed to connect to the server.")
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
                 
         